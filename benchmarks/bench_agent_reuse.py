@@ -0,0 +1,152 @@
+"""Warm-invocation latency of the agent Lambdas' handlers, rebuilding agents per request vs reusing them.
+
+Each agent's lambda_handler is called repeatedly with a request that reaches the agent (receipt lines
+the parser cannot read, items missing from the shelf-life cache, a consumed item that is not in the
+inventory, recipes to rerank). "before" clears the module's cached agent (and search tool) ahead of
+every call, reproducing the old behaviour of constructing them inside lambda_handler; "after" keeps
+them, as warm invocations now do.
+
+crewai and crewai_tools are replaced with stubs: building an Agent sleeps for --agent-build-ms, a
+WebsiteSearchTool for --tool-build-ms, and a Crew answers in JSON after --llm-latency-ms. The LLM
+cache is turned off so every call runs the crew. No crewai, network or API key is needed.
+
+    python benchmarks/bench_agent_reuse.py --invocations 20 --agent-build-ms 30 --tool-build-ms 200
+"""
+import argparse
+import importlib
+import itertools
+import json
+import os
+import re
+import statistics
+import sys
+import tempfile
+import time
+from types import ModuleType
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "lambda_functions"))
+
+# Every warm call runs the (stub) crew, and shelf-life estimates stay out of the real /tmp cache
+os.environ["LLM_CACHE_BACKEND"] = "off"
+os.environ["SHELF_LIFE_CACHE_PATH"] = os.path.join(tempfile.mkdtemp(), "shelf_life_cache.json")
+os.environ.pop("SHELF_LIFE_CACHE_TABLE_NAME", None)
+
+# Numbers every request, so no two requests in a run repeat their item names
+request_numbers = itertools.count()
+
+PANTRY = ["eggs", "milk", "butter", "flour", "spinach", "chicken breast", "rice", "onion", "garlic", "tomato"]
+
+
+def stub_answer(description):
+    """A well-formed answer to each agent's task: shelf lives for the names asked, otherwise no matches."""
+    asked = re.search(r"typically lasts when [^:]*: (\[.*?\])\. Answer", description)
+    if asked:
+        return json.dumps({name: 7 for name in json.loads(asked.group(1))})
+    return "{}" if "JSON object" in description else "[]"
+
+
+def install_agent_stubs(agent_build_ms, tool_build_ms, llm_latency_ms):
+    """Registers stub crewai and crewai_tools modules with the given construction and LLM latencies."""
+    crewai = ModuleType("crewai")
+    crewai_tools = ModuleType("crewai_tools")
+
+    class Agent:
+        def __init__(self, **fields):
+            time.sleep(agent_build_ms / 1000)
+            self.__dict__.update(fields)
+            self.tools = fields.get("tools", [])
+            self.llm = "stub"
+
+    class Task:
+        def __init__(self, **fields):
+            self.__dict__.update(fields)
+            self.tools = fields.get("tools")
+
+    class Crew:
+        def __init__(self, agents, tasks, verbose=False):
+            self.task = tasks[0]
+
+        def kickoff(self):
+            time.sleep(llm_latency_ms / 1000)
+            return stub_answer(self.task.description)
+
+    class WebsiteSearchTool:
+        def __init__(self, website):
+            time.sleep(tool_build_ms / 1000)
+            self.name = f"Search {website}"
+
+    crewai.Agent, crewai.Task, crewai.Crew = Agent, Task, Crew
+    crewai_tools.WebsiteSearchTool = WebsiteSearchTool
+    sys.modules["crewai"] = crewai
+    sys.modules["crewai_tools"] = crewai_tools
+
+
+def receipt_event(number):
+    return {"receipt_markdown": "MILK  2 x 1.50\nORG BANANAS BUNCH\nSTORE COUPON APPLIED", "today": "2026-01-01"}
+
+
+def expiration_event(number):
+    # New names on every call, so the shelf-life cache never answers for the agent
+    return {"items": [{"item_name": f"pantry item {number} {i}", "count": 1, "unit": "pcs"} for i in range(3)],
+            "date_of_purchase": "2026-01-01"}
+
+
+def tracker_event(number):
+    return {"items": [{"item_name": name, "count": 2, "unit": "pcs", "expiration_date": "2026-01-05"} for name in PANTRY],
+            "consumed_items": [{"item_name": "leftover stir fry", "count": 1, "unit": "pcs"}],
+            "today": "2026-01-01"}
+
+
+def recipe_event(number):
+    return {"items": [{"item_name": name, "count": 2, "unit": "pcs", "expiration_date": "2026-01-03"} for name in PANTRY],
+            "today": "2026-01-01"}
+
+
+# (module, module attributes caching the agent stack, request factory)
+AGENTS = [
+    ("receipt_interpreter_agent", ["receipt_interpreter_agent"], receipt_event),
+    ("expiration_date_estimation_agent", ["expiration_date_search_agent"], expiration_event),
+    ("grocery_tracker_agent", ["grocery_tracker_agent"], tracker_event),
+    ("recipe_recommendation_agent", ["recipe_recommendation_agent", "recipe_web_tool"], recipe_event),
+]
+
+
+def time_invocations(module, attributes, make_event, invocations, reuse):
+    timings = []
+    for _ in range(invocations):
+        if not reuse:
+            for attribute in attributes:
+                setattr(module, attribute, None)
+            if module.__name__ == "expiration_date_estimation_agent":
+                module.extra_expiration_date_search_agents.clear()
+        event = make_event(next(request_numbers))
+        start = time.perf_counter()
+        response = module.lambda_handler(event, None)
+        timings.append((time.perf_counter() - start) * 1000)
+        if "error" in response:
+            raise RuntimeError(f"{module.__name__} rejected the benchmark request: {response['error']}")
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--invocations", type=int, default=20)
+    parser.add_argument("--agent-build-ms", type=float, default=30.0)
+    parser.add_argument("--tool-build-ms", type=float, default=200.0)
+    parser.add_argument("--llm-latency-ms", type=float, default=0.0)
+    args = parser.parse_args()
+
+    install_agent_stubs(args.agent_build_ms, args.tool_build_ms, args.llm_latency_ms)
+
+    print(f"{'agent':<36}{'before p50 ms':>15}{'after p50 ms':>15}{'speedup':>10}")
+    for module_name, attributes, make_event in AGENTS:
+        module = importlib.import_module(module_name)
+        # Prime the container as the first (cold) invocation would
+        module.lambda_handler(make_event(next(request_numbers)), None)
+        before = statistics.median(time_invocations(module, attributes, make_event, args.invocations, reuse=False))
+        after = statistics.median(time_invocations(module, attributes, make_event, args.invocations, reuse=True))
+        print(f"{module_name:<36}{before:>15.3f}{after:>15.3f}{before / max(after, 1e-6):>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Agent calls and wall time of shelf-life estimation, one item per call vs token-budgeted batches.
+
+A stub LLM stands in for the agent: each call sleeps for --llm-latency-ms plus --per-item-ms per item
+and answers in JSON, leaving out about --drop-ratio of the items so that retries are exercised.
+"per item" asks for one item at a time, as the Lambda used to; "batched" runs estimate_shelf_lives
+with the Lambda's token budget and concurrency (set EXPIRATION_BATCH_* to try others). No crewai,
+network or API key is needed.
+
+    python benchmarks/bench_expiration_batching.py --sizes 10 50 200 --llm-latency-ms 200
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "lambda_functions"))
+
+import expiration_date_estimation_agent as agent_module
+
+PRODUCE = ["milk", "eggs", "spinach", "chicken breast", "greek yogurt", "cheddar cheese", "strawberries",
+           "ground beef", "butter", "romaine lettuce", "salmon fillet", "orange juice", "tofu", "bell peppers"]
+
+
+class StubLLM:
+    """Answers shelf-life batches after a delay; drops items at random, but never on a retry."""
+
+    def __init__(self, latency_ms, per_item_ms, drop_ratio, seed):
+        self.latency_ms = latency_ms
+        self.per_item_ms = per_item_ms
+        self.drop_ratio = drop_ratio
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.calls = 0
+
+    def ask(self, agent, names, storage, retry=False):
+        with self.lock:
+            self.calls += 1
+            answered = [name for name in names if retry or self.rng.random() >= self.drop_ratio]
+        time.sleep((self.latency_ms + self.per_item_ms * len(names)) / 1000)
+        return "Here you go: " + json.dumps({name: 3 + len(name) % 10 for name in answered})
+
+
+def item_names(size):
+    return [f"{PRODUCE[number % len(PRODUCE)]} #{number}" for number in range(size)]
+
+
+def per_item(names, llm):
+    estimated = {}
+    for name in names:
+        for attempt in range(1 + agent_module.EXPIRATION_BATCH_RETRIES):
+            answer = agent_module.parse_shelf_lives(llm.ask(None, [name], "refrigerated", attempt > 0), [name])
+            if answer:
+                estimated.update(answer)
+                break
+    return estimated
+
+
+def batched(names, llm):
+    agents = [None] * agent_module.EXPIRATION_BATCH_CONCURRENCY
+    return agent_module.estimate_shelf_lives(names, "refrigerated", agents, ask=llm.ask)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 50, 200])
+    parser.add_argument("--llm-latency-ms", type=float, default=200)
+    parser.add_argument("--per-item-ms", type=float, default=2)
+    parser.add_argument("--drop-ratio", type=float, default=0.05)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    print(f"budget {agent_module.EXPIRATION_BATCH_TOKEN_BUDGET} tokens, at most {agent_module.EXPIRATION_BATCH_MAX_ITEMS} "
+          f"items per batch, {agent_module.EXPIRATION_BATCH_CONCURRENCY} concurrent, {agent_module.EXPIRATION_BATCH_RETRIES} retries")
+    print(f"{'items':>6}{'mode':>10}{'calls':>8}{'estimated':>11}{'wall s':>9}")
+    for size in args.sizes:
+        names = item_names(size)
+        for mode, estimate in (("per item", per_item), ("batched", batched)):
+            llm = StubLLM(args.llm_latency_ms, args.per_item_ms, args.drop_ratio, args.seed)
+            start = time.perf_counter()
+            estimated = estimate(names, llm)
+            wall = time.perf_counter() - start
+            print(f"{size:>6}{mode:>10}{llm.calls:>8}{len(estimated):>11}{wall:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
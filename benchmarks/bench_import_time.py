@@ -0,0 +1,71 @@
+"""Cold-start import cost of the Lambda modules, measured with ``python -X importtime``.
+
+Each module is imported in a fresh interpreter, as on a cold start, and its cumulative import
+time is compared with the budget in import_time_budget.json (milliseconds). A first, untimed
+import compiles the bytecode, and the median of the timed runs is compared, so one slow run does
+not fail the check. The agent stack (crewai, crewai_tools) is loaded on first use, so it must not
+show up here. Exits non-zero when a module is over budget, so it can gate CI:
+
+    python benchmarks/bench_import_time.py --runs 9
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+LAMBDA_DIR = os.path.join(BENCHMARKS_DIR, "..", "lambda_functions")
+BUDGET_PATH = os.path.join(BENCHMARKS_DIR, "import_time_budget.json")
+
+
+def import_time_ms(module_name):
+    """Imports a module in a fresh interpreter; returns its cumulative import time and the packages it pulled in."""
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module_name}"],
+        cwd=LAMBDA_DIR, capture_output=True, text=True
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(completed.stderr.strip().splitlines()[-1])
+
+    cumulative_us = None
+    imported = set()
+    for line in completed.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, package = line.split("|")
+        imported.add(package.strip().split(".")[0])
+        if package.strip() == module_name:
+            cumulative_us = int(cumulative)
+    return cumulative_us / 1000, imported
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=9)
+    args = parser.parse_args()
+
+    with open(BUDGET_PATH) as f:
+        budget = json.load(f)
+
+    over_budget = False
+    print(f"{'module':<36}{'p50 ms':>10}{'budget ms':>11}  status")
+    for module_name, budget_ms in budget.items():
+        # Warm-up: writes the .pyc files a deployed package would already contain
+        import_time_ms(module_name)
+        runs = [import_time_ms(module_name) for _ in range(args.runs)]
+        median_ms = statistics.median(ms for ms, _ in runs)
+        eager = {"crewai", "crewai_tools", "langchain"} & runs[0][1]
+        status = "ok" if median_ms <= budget_ms and not eager else "OVER BUDGET"
+        if eager:
+            status += f" (eagerly imports {', '.join(sorted(eager))})"
+        over_budget = over_budget or status != "ok"
+        print(f"{module_name:<36}{median_ms:>10.1f}{budget_ms:>11}  {status}")
+
+    sys.exit(1 if over_budget else 0)
+
+
+if __name__ == "__main__":
+    main()
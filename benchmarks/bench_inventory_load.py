@@ -0,0 +1,302 @@
+"""Load test of the inventory Lambdas against a local table, per action and inventory size.
+
+Seeds a table shaped like terraform's grocery-items (category-index, sparse expiration-index) with a
+synthetic inventory, then replays a weighted mix of actions through dynamodb_lambda.lambda_handler
+(and database_tools_lambda.lambda_handler when langchain is installed), so every measurement covers
+dispatch, DynamoDB calls and response serialization. Reports p50/p99 latency, operations per second
+and the peak memory allocated by a call (sampled separately with tracemalloc) for every action.
+
+The table is in-memory moto by default (pip install moto), so no AWS account is needed. moto keeps
+every item as Python objects and copies the table for each transaction (adjust_inventory_quantities),
+so compare runs on the same backend, and for the largest inventories point --endpoint-url at DynamoDB Local:
+
+    python benchmarks/bench_inventory_load.py --items 1000,10000,100000 --operations 2000 --workload mixed
+    python benchmarks/bench_inventory_load.py --items 1000000 --endpoint-url http://localhost:8000
+"""
+import argparse
+import os
+import random
+import resource
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import date, timedelta
+from decimal import Decimal
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "lambda_functions"))
+
+TABLE_NAME = "grocery-items-load-test"
+CATEGORIES = ["dairy", "produce", "bakery", "meat", "pantry", "frozen", "beverages", "snacks"]
+TODAY = date(2026, 1, 1)
+
+# Relative weights of the actions replayed by each workload
+WORKLOADS = {
+    "read-heavy": {
+        "get_grocery_item_details": 50, "get_grocery_items": 10, "list_all_grocery_items": 10,
+        "list_expiring_grocery_items": 10, "items_expiring_within": 10, "adjust_inventory_quantity": 5,
+        "update_grocery_item": 5,
+    },
+    "write-heavy": {
+        "add_grocery_item": 15, "update_grocery_item": 20, "adjust_inventory_quantity": 25,
+        "remove_grocery_item": 5, "add_grocery_items": 5, "adjust_inventory_quantities": 10,
+        "remove_grocery_items": 2, "get_grocery_item_details": 18,
+    },
+    "mixed": {
+        "get_grocery_item_details": 25, "get_grocery_items": 5, "list_all_grocery_items": 8,
+        "list_expiring_grocery_items": 8, "items_expiring_within": 6, "add_grocery_item": 10,
+        "update_grocery_item": 10, "adjust_inventory_quantity": 12, "remove_grocery_item": 4,
+        "add_grocery_items": 4, "adjust_inventory_quantities": 4, "remove_grocery_items": 4,
+    },
+}
+
+
+def synthetic_item(rng, item_id):
+    return {
+        'item_id': item_id,
+        'name': f"product {rng.randrange(2000)}",
+        'category': rng.choice(CATEGORIES),
+        'quantity': rng.randint(0, 12),
+        'unit_price': Decimal(f"{rng.uniform(0.5, 20):.2f}"),
+        'expiration_date': (TODAY + timedelta(days=rng.randint(-10, 120))).isoformat(),
+        'unit': rng.choice(["pcs", "g", "ml", "lb"]),
+    }
+
+
+class Inventory:
+    """The item_ids known to exist, so generated requests mostly hit live items as the workload adds and removes them."""
+
+    def __init__(self, rng, count):
+        self.rng = rng
+        self.ids = [f"item-{i:07d}" for i in range(count)]
+        self.positions = {item_id: i for i, item_id in enumerate(self.ids)}
+        self.next_id = count
+
+    def pick(self):
+        return self.rng.choice(self.ids)
+
+    def sample(self, count):
+        return self.rng.sample(self.ids, min(count, len(self.ids)))
+
+    def new_id(self):
+        item_id = f"item-{self.next_id:07d}"
+        self.next_id += 1
+        self.positions[item_id] = len(self.ids)
+        self.ids.append(item_id)
+        return item_id
+
+    def discard(self, item_ids):
+        # Swap-remove keeps this O(1) per id at a million items
+        for item_id in item_ids:
+            index = self.positions.pop(item_id, None)
+            if index is None:
+                continue
+            last = self.ids.pop()
+            if last != item_id:
+                self.ids[index] = last
+                self.positions[last] = index
+
+
+def make_event(action, rng, inventory):
+    """A Lambda event for one request of the given action."""
+    if action == "get_grocery_item_details" or action == "remove_grocery_item":
+        item_id = inventory.pick()
+        if action == "remove_grocery_item":
+            inventory.discard([item_id])
+        return {'action': action, 'item_id': item_id}
+    if action == "get_grocery_items":
+        return {'action': action, 'item_ids': inventory.sample(25)}
+    if action == "remove_grocery_items":
+        item_ids = inventory.sample(10)
+        inventory.discard(item_ids)
+        return {'action': action, 'item_ids': item_ids}
+    if action == "list_all_grocery_items":
+        return {'action': action, 'category': rng.choice(CATEGORIES + [None]), 'limit': 50}
+    if action == "list_expiring_grocery_items":
+        return {'action': action, 'expiring_before': (TODAY + timedelta(days=rng.randint(0, 14))).isoformat(), 'limit': 50}
+    if action == "items_expiring_within":
+        return {'action': action, 'days': rng.randint(1, 7), 'limit': 10, 'today': TODAY.isoformat()}
+    if action == "add_grocery_item":
+        return {'action': action, 'item_details': synthetic_item(rng, inventory.new_id())}
+    if action == "add_grocery_items":
+        return {'action': action, 'items_details': [synthetic_item(rng, inventory.new_id()) for _ in range(10)]}
+    if action == "update_grocery_item":
+        return {'action': action, 'item_update': {
+            'item_id': inventory.pick(), 'name': f"product {rng.randrange(2000)}",
+            '$add': {'quantity': rng.randint(1, 3)}}}
+    if action == "adjust_inventory_quantity":
+        return {'action': action, 'item_id': inventory.pick(), 'quantity_change': rng.choice([-1, 1, 2])}
+    if action == "adjust_inventory_quantities":
+        return {'action': action, 'adjustments': [
+            {'item_id': item_id, 'delta': rng.choice([-1, 1])} for item_id in inventory.sample(5)]}
+    raise ValueError(f"No request generator for {action}")
+
+
+def create_table(dynamodb):
+    """Creates the table fresh, shaped like terraform's grocery-items."""
+    try:
+        dynamodb.Table(TABLE_NAME).delete()
+        dynamodb.meta.client.get_waiter('table_not_exists').wait(TableName=TABLE_NAME)
+    except dynamodb.meta.client.exceptions.ResourceNotFoundException:
+        pass
+    table = dynamodb.create_table(
+        TableName=TABLE_NAME,
+        BillingMode="PAY_PER_REQUEST",
+        KeySchema=[{'AttributeName': 'item_id', 'KeyType': 'HASH'}],
+        AttributeDefinitions=[
+            {'AttributeName': name, 'AttributeType': 'S'}
+            for name in ('item_id', 'category', 'expiry_partition', 'expiration_date')
+        ],
+        GlobalSecondaryIndexes=[
+            {'IndexName': 'category-index', 'Projection': {'ProjectionType': 'ALL'},
+             'KeySchema': [{'AttributeName': 'category', 'KeyType': 'HASH'}]},
+            {'IndexName': 'expiration-index', 'Projection': {'ProjectionType': 'ALL'},
+             'KeySchema': [{'AttributeName': 'expiry_partition', 'KeyType': 'HASH'},
+                           {'AttributeName': 'expiration_date', 'KeyType': 'RANGE'}]},
+        ],
+    )
+    table.wait_until_exists()
+    return table
+
+
+def seed(table, rng, count):
+    from inventory_repository import GroceryItem
+
+    with table.batch_writer() as batch:
+        for i in range(count):
+            record = GroceryItem.from_dict(synthetic_item(rng, f"item-{i:07d}")).to_record()
+            record['version'] = 1
+            batch.put_item(Item=record)
+
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+def run_workload(handler, actions, weights, rng, inventory, operations):
+    """Replays operations requests; returns {action: [latency seconds]} and the count of non-200 answers."""
+    timings = {action: [] for action in actions}
+    errors = 0
+    for action in rng.choices(actions, weights, k=operations):
+        event = make_event(action, rng, inventory)
+        start = time.perf_counter()
+        response = handler(event, None)
+        timings[action].append(time.perf_counter() - start)
+        errors += response['statusCode'] != 200
+    return timings, errors
+
+
+def measure_memory(handler, actions, rng, inventory, samples):
+    """Peak bytes allocated during one call of each action, the highest over samples calls."""
+    peaks = {}
+    tracemalloc.start()
+    try:
+        for action in actions:
+            peak = 0
+            for _ in range(samples):
+                event = make_event(action, rng, inventory)
+                tracemalloc.reset_peak()
+                baseline = tracemalloc.get_traced_memory()[0]
+                handler(event, None)
+                peak = max(peak, tracemalloc.get_traced_memory()[1] - baseline)
+            peaks[action] = peak
+    finally:
+        tracemalloc.stop()
+    return peaks
+
+
+def time_full_scan(handler, repeat):
+    """Unpaged list_all_grocery_items: the whole table is scanned and serialized in one response."""
+    timings = []
+    size = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        size = len(handler({'action': 'list_all_grocery_items'}, None)['body'])
+        timings.append(time.perf_counter() - start)
+    return timings, size
+
+
+def report(label, timings, peaks):
+    print(f"  {label}")
+    print(f"  {'action':<30}{'calls':>7}{'p50 ms':>10}{'p99 ms':>10}{'ops/s':>10}{'peak KiB':>11}")
+    for action, values in timings.items():
+        if not values:
+            continue
+        ordered = sorted(values)
+        peak = f"{peaks[action] / 1024:.1f}" if action in peaks else "-"
+        print(f"  {action:<30}{len(values):>7}{statistics.median(ordered) * 1000:>10.2f}"
+              f"{percentile(ordered, 0.99) * 1000:>10.2f}{len(values) / sum(values):>10.0f}{peak:>11}")
+
+
+def load_handlers():
+    import dynamodb_lambda
+
+    handlers = [("dynamodb_lambda", dynamodb_lambda.lambda_handler)]
+    try:
+        import database_tools_lambda
+    except ImportError as e:
+        print(f"database_tools_lambda skipped ({e})")
+    else:
+        handlers.append(("database_tools_lambda", database_tools_lambda.lambda_handler))
+    return handlers
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", default="1000,10000", help="comma-separated inventory sizes")
+    parser.add_argument("--operations", type=int, default=2000, help="requests replayed per size and handler")
+    parser.add_argument("--workload", choices=sorted(WORKLOADS), default="mixed")
+    parser.add_argument("--memory-samples", type=int, default=5, help="tracemalloc-traced calls per action (0 to skip)")
+    parser.add_argument("--full-scans", type=int, default=1, help="unpaged listings timed per size (0 to skip)")
+    parser.add_argument("--endpoint-url", help="DynamoDB Local endpoint to use instead of moto")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    # inventory_repository reads its settings at import time
+    os.environ["DYNAMODB_TABLE_NAME"] = TABLE_NAME
+    os.environ.setdefault("AWS_REGION", "us-east-1")
+    os.environ.setdefault("AWS_DEFAULT_REGION", os.environ["AWS_REGION"])
+    os.environ.setdefault("AWS_ACCESS_KEY_ID", "local")
+    os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "local")
+    if args.endpoint_url:
+        os.environ["AWS_ENDPOINT_URL_DYNAMODB"] = args.endpoint_url
+        backend = args.endpoint_url
+    else:
+        try:
+            from moto import mock_aws
+        except ImportError:
+            parser.error("moto is not installed; pip install moto or pass --endpoint-url")
+        mock_aws().start()
+        backend = "moto"
+
+    import boto3
+
+    dynamodb = boto3.resource('dynamodb', region_name=os.environ["AWS_REGION"])
+    handlers = load_handlers()
+    weights = WORKLOADS[args.workload]
+    actions = list(weights)
+
+    for count in (int(size) for size in args.items.split(",")):
+        print(f"\n{count} items, {args.workload} workload, {args.operations} requests per handler ({backend})")
+        for label, handler in handlers:
+            rng = random.Random(args.seed)
+            table = create_table(dynamodb)
+            start = time.perf_counter()
+            seed(table, rng, count)
+            print(f"  seeded in {time.perf_counter() - start:.1f} s")
+            inventory = Inventory(rng, count)
+
+            start = time.perf_counter()
+            timings, errors = run_workload(handler, actions, [weights[action] for action in actions], rng, inventory, args.operations)
+            elapsed = time.perf_counter() - start
+            peaks = measure_memory(handler, actions, rng, inventory, args.memory_samples) if args.memory_samples else {}
+            if args.full_scans:
+                timings['list_all (full scan)'], size = time_full_scan(handler, args.full_scans)
+                print(f"  full scan response: {size / 1e6:.2f} MB")
+            report(f"{label}: {args.operations / elapsed:.0f} ops/s overall, {errors} non-200 responses", timings, peaks)
+            # ru_maxrss is in KiB on Linux (bytes on macOS)
+            print(f"  process peak RSS: {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f} MiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Serialization cost of inventory listings, before and after the single-pass Decimal-aware encoder.
+
+"before" reproduces the old read path: a recursive replace_decimals pass over the result, then
+json.dumps(..., indent=2), then json.dumps of that string again in lambda_handler. "after" encodes
+the result once with json_encoding.dumps, compact by default and indented with --pretty.
+Items are shaped like DynamoDB records, with Decimal numbers:
+
+    python benchmarks/bench_json_encoding.py --items 10000 --repeat 20
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from decimal import Decimal
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "lambda_functions"))
+
+from json_encoding import dumps  # noqa: E402
+
+CATEGORIES = ["dairy", "produce", "bakery", "meat", "pantry", "frozen"]
+
+
+def replace_decimals(obj):
+    # The recursive conversion the read path used before json_encoding
+    if isinstance(obj, list):
+        for i in range(len(obj)):
+            obj[i] = replace_decimals(obj[i])
+        return obj
+    elif isinstance(obj, dict):
+        for k, v in obj.items():
+            obj[k] = replace_decimals(v)
+        return obj
+    elif isinstance(obj, Decimal):
+        if obj % 1 == 0:
+            return int(obj)
+        else:
+            return float(obj)
+    else:
+        return obj
+
+
+def synthetic_items(rng, count):
+    return [{
+        'item_id': f"item-{i:06d}",
+        'name': f"product {rng.randrange(500)}",
+        'category': rng.choice(CATEGORIES),
+        'quantity': Decimal(rng.randint(0, 12)),
+        'unit_price': Decimal(f"{rng.uniform(0.5, 20):.2f}"),
+        'expiration_date': f"2026-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+        'unit': rng.choice(["pcs", "g", "ml", "lb"]),
+    } for i in range(count)]
+
+
+def before(items):
+    return json.dumps(json.dumps(replace_decimals(items), indent=2))
+
+
+def time_runs(encode, make_items, repeat):
+    timings = []
+    size = 0
+    for _ in range(repeat):
+        # replace_decimals converts in place, so every run gets a fresh copy outside the timed region
+        items = make_items()
+        start = time.perf_counter()
+        size = len(encode(items))
+        timings.append(time.perf_counter() - start)
+    return timings, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    template = synthetic_items(random.Random(args.seed), args.items)
+    make_items = lambda: [dict(item) for item in template]  # noqa: E731
+
+    cases = [
+        ("before (replace_decimals + indent=2 + re-encode)", before),
+        ("after (compact)", dumps),
+        ("after (pretty)", lambda items: dumps(items, pretty=True)),
+    ]
+    print(f"{args.items} items, {args.repeat} runs each")
+    baseline = None
+    for label, encode in cases:
+        timings, size = time_runs(encode, make_items, args.repeat)
+        median = statistics.median(timings)
+        baseline = baseline or median
+        print(f"{label:50} median {median * 1000:7.1f} ms  p95 {sorted(timings)[int(0.95 * (len(timings) - 1))] * 1000:7.1f} ms  "
+              f"{size / 1e6:5.2f} MB  x{baseline / median:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""Latency and hit rate of the LLM response cache in front of a stubbed LLM.
+
+Each request picks a prompt from a pool; with --repeat-ratio 0.6, 60% of requests reuse a prompt that
+was already asked (the same receipt resubmitted, the same pantry), and the rest ask a new one. The
+stub LLM sleeps for --llm-latency-ms and answers in JSON, so no crewai, network or API key is needed.
+"off" calls the stub every time; "memory" and "file" go through LLMCache with that backend.
+
+    python benchmarks/bench_llm_cache.py --requests 200 --repeat-ratio 0.6 --llm-latency-ms 50
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "lambda_functions"))
+
+from llm_cache import LLM_CACHE_SIZE, LLMCache
+from ttl_cache import FileStore
+
+AGENT = SimpleNamespace(
+    role="Receipt Interpreter",
+    goal="Extract grocery items from receipts.",
+    backstory="A meticulous reader of grocery receipts.",
+    tools=[],
+    llm="stub"
+)
+
+
+def stub_llm(latency_ms):
+    def run(agent, task):
+        time.sleep(latency_ms / 1000)
+        return json.dumps([{"item_name": task.description[-12:], "quantity": 1}])
+
+    return run
+
+
+def prompts(requests, repeat_ratio, seed):
+    rng = random.Random(seed)
+    asked = []
+    for number in range(requests):
+        if asked and rng.random() < repeat_ratio:
+            # Resubmissions differ in layout only, which normalization must see through
+            yield "  ".join(rng.choice(asked).split())
+        else:
+            description = f"Interpret this receipt: MILK 2.49 EGGS 3.99 receipt-{number:05d}"
+            asked.append(description)
+            yield description
+
+
+def run_workload(cache, requests, repeat_ratio, latency_ms, seed):
+    run = stub_llm(latency_ms)
+    hits, misses = [], []
+    for description in prompts(requests, repeat_ratio, seed):
+        task = SimpleNamespace(description=description, expected_output="A JSON array.", tools=None)
+        llm_calls = cache.misses if cache is not None else None
+        start = time.perf_counter()
+        if cache is None:
+            run(AGENT, task)
+        else:
+            cache.kickoff("bench", AGENT, task, run=run)
+        elapsed = (time.perf_counter() - start) * 1000
+        (misses if cache is None or cache.misses != llm_calls else hits).append(elapsed)
+    return hits, misses
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--repeat-ratio", type=float, default=0.6)
+    parser.add_argument("--llm-latency-ms", type=float, default=50)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        backends = {
+            "off": None,
+            "memory": LLMCache(opt_out=()),
+            "file": LLMCache(FileStore(os.path.join(directory, "llm_cache.json"), LLM_CACHE_SIZE * 4), opt_out=()),
+        }
+        print(f"{'backend':<10}{'hit rate':>10}{'hit p50 ms':>12}{'miss p50 ms':>13}{'total s':>10}")
+        for name, cache in backends.items():
+            start = time.perf_counter()
+            hits, misses = run_workload(cache, args.requests, args.repeat_ratio, args.llm_latency_ms, args.seed)
+            total = time.perf_counter() - start
+            hit_p50 = statistics.median(hits) if hits else 0.0
+            miss_p50 = statistics.median(misses) if misses else 0.0
+            print(f"{name:<10}{len(hits) / args.requests:>10.2f}{hit_p50:>12.3f}{miss_p50:>13.3f}{total:>10.2f}")
+
+        # A new container with an empty LRU still answers from the file written above
+        cold = LLMCache(FileStore(os.path.join(directory, "llm_cache.json"), LLM_CACHE_SIZE * 4), opt_out=())
+        run_workload(cold, args.requests, args.repeat_ratio, args.llm_latency_ms, args.seed)
+        print(f"file store after a cold start: {cold.stats()}")
+
+
+if __name__ == "__main__":
+    main()
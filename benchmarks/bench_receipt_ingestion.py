@@ -0,0 +1,150 @@
+"""Receipt ingestion throughput and write savings, one write per receipt line vs coalesced batches.
+
+Producers enqueue a burst of receipts drawn from a catalog where a few staples (milk, eggs, bread)
+appear on most receipts. "per line" writes every line as it arrives, as one add per line would.
+"batched" runs the ingestion path: producers enqueue into the bounded in-process queue (retrying when
+it is full) while a worker drains it in batches coalesced by item_id. Reports lines per second, write
+requests, the write capacity units the table reported and how often producers were pushed back.
+
+The table is in-memory moto by default (pip install moto); point --endpoint-url at DynamoDB Local
+for capacity units closer to the service's:
+
+    python benchmarks/bench_receipt_ingestion.py --receipts 2000 --lines 12 --catalog 300
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "lambda_functions"))
+
+TABLE_NAME = "grocery-items-ingestion-test"
+CATEGORIES = ["dairy", "produce", "bakery", "meat", "pantry", "frozen", "beverages", "snacks"]
+
+
+def receipts(rng, count, lines, catalog):
+    # Popularity falls off with catalog position, so coalescing has repeats to merge as on real receipts
+    weights = [1 / (rank + 1) for rank in range(catalog)]
+    for number in range(count):
+        products = set(rng.choices(range(catalog), weights=weights, k=lines))
+        yield {
+            'receipt_id': f"receipt-{number:06d}",
+            'items': [{
+                'item_id': f"product-{product:05d}",
+                'name': f"product {product}",
+                'category': CATEGORIES[product % len(CATEGORIES)],
+                'quantity': rng.randint(1, 3),
+                'unit_price': round(rng.uniform(0.5, 20), 2),
+                'expiration_date': f"2026-02-{rng.randint(1, 28):02d}",
+            } for product in sorted(products)]
+        }
+
+
+def create_table(dynamodb):
+    try:
+        dynamodb.Table(TABLE_NAME).delete()
+    except dynamodb.meta.client.exceptions.ResourceNotFoundException:
+        pass
+    dynamodb.create_table(
+        TableName=TABLE_NAME,
+        KeySchema=[{'AttributeName': 'item_id', 'KeyType': 'HASH'}],
+        AttributeDefinitions=[{'AttributeName': 'item_id', 'AttributeType': 'S'}],
+        BillingMode='PAY_PER_REQUEST'
+    ).wait_until_exists()
+
+
+def per_line(batch, ingestion):
+    from inventory_repository import GroceryItem
+
+    start = time.perf_counter()
+    lines = units = 0
+    for receipt in batch:
+        for details in receipt['items']:
+            units += ingestion.write_restock(GroceryItem.from_dict(details))
+            lines += 1
+    elapsed = time.perf_counter() - start
+    return {'lines': lines, 'writes': lines, 'write_units': units, 'pushed_back': 0, 'seconds': elapsed}
+
+
+def batched(batch, ingestion, producers, max_depth, max_items, window_seconds):
+    queue = ingestion.LocalQueue(max_depth=max_depth)
+    worker = ingestion.IngestionWorker(queue)
+    pushed_back = [0]
+    lock = threading.Lock()
+
+    def produce(share):
+        for receipt in share:
+            body = json.dumps(receipt)
+            while True:
+                try:
+                    queue.send(body)
+                    break
+                except ingestion.QueueFull:
+                    with lock:
+                        pushed_back[0] += 1
+                    time.sleep(0.005)
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=produce, args=(batch[number::producers],)) for number in range(producers)]
+    for thread in threads:
+        thread.start()
+    while any(thread.is_alive() for thread in threads) or queue.depth():
+        ingestion.drain_local_queue(worker, queue, max_items, window_seconds)
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    stats = worker.stats()
+    return {'lines': stats['lines'], 'writes': stats['writes'], 'write_units': stats['write_units'],
+            'pushed_back': pushed_back[0], 'seconds': elapsed}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--receipts", type=int, default=2000)
+    parser.add_argument("--lines", type=int, default=12, help="items drawn per receipt (repeats collapse)")
+    parser.add_argument("--catalog", type=int, default=300, help="distinct products receipts draw from")
+    parser.add_argument("--producers", type=int, default=4)
+    parser.add_argument("--max-depth", type=int, default=200, help="in-process queue bound")
+    parser.add_argument("--max-items", type=int, default=100, help="distinct items per batch")
+    parser.add_argument("--window-seconds", type=float, default=0.05)
+    parser.add_argument("--endpoint-url", help="DynamoDB Local endpoint to use instead of moto")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    os.environ["DYNAMODB_TABLE_NAME"] = TABLE_NAME
+    os.environ.setdefault("AWS_REGION", "us-east-1")
+    os.environ.setdefault("AWS_DEFAULT_REGION", os.environ["AWS_REGION"])
+    os.environ.setdefault("AWS_ACCESS_KEY_ID", "local")
+    os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "local")
+    os.environ.pop("INGESTION_QUEUE_URL", None)
+    if args.endpoint_url:
+        os.environ["AWS_ENDPOINT_URL_DYNAMODB"] = args.endpoint_url
+    else:
+        try:
+            from moto import mock_aws
+        except ImportError:
+            parser.error("moto is not installed; pip install moto or pass --endpoint-url")
+        mock_aws().start()
+
+    import boto3
+    import receipt_ingestion
+
+    dynamodb = boto3.resource('dynamodb', region_name=os.environ["AWS_REGION"])
+    batch = list(receipts(random.Random(args.seed), args.receipts, args.lines, args.catalog))
+
+    print(f"{'mode':<10}{'lines':>8}{'writes':>8}{'write units':>13}{'pushed back':>13}{'lines/s':>10}")
+    for mode in ("per line", "batched"):
+        create_table(dynamodb)
+        if mode == "per line":
+            result = per_line(batch, receipt_ingestion)
+        else:
+            result = batched(batch, receipt_ingestion, args.producers, args.max_depth, args.max_items, args.window_seconds)
+        print(f"{mode:<10}{result['lines']:>8}{result['writes']:>8}{result['write_units']:>13.1f}"
+              f"{result['pushed_back']:>13}{result['lines'] / result['seconds']:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
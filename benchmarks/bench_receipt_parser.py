@@ -0,0 +1,86 @@
+"""Parse rate and throughput of the deterministic receipt parser ahead of the receipt agent.
+
+Runs over a directory of receipt markdown files, or a synthetic corpus mixing free-text lines,
+weighed items, "QTY x PRICE" lines and markdown tables. Reports the share of candidate lines
+(i.e. not blank, heading or total lines) that never need to reach the LLM, and lines/s and MB/s:
+
+    python benchmarks/bench_receipt_parser.py --receipts 2000
+    python benchmarks/bench_receipt_parser.py --corpus path/to/receipts/
+"""
+import argparse
+import io
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "lambda_functions"))
+
+from receipt_parser import parse_receipt_lines  # noqa: E402
+
+PRODUCTS = ["WHOLE MILK", "BANANAS", "SPINACH", "GREEK YOGURT", "CHEDDAR CHEESE", "EGGS LARGE 12CT",
+            "SOURDOUGH BREAD", "CHICKEN BREAST", "ROMA TOMATOES", "AVOCADO", "OLIVE OIL", "BASMATI RICE"]
+WEIGHED_UNITS = ["lb", "kg", "oz"]
+
+
+def synthetic_receipt(rng, lines_per_receipt):
+    lines = ["# FRESH MART #0412", "123 Main St, Springfield", ""]
+    table = rng.random() < 0.3
+    if table:
+        lines += ["| Item | Qty | Unit | Price |", "|------|----:|------|------:|"]
+    for _ in range(lines_per_receipt):
+        name = rng.choice(PRODUCTS)
+        price = rng.uniform(0.5, 15)
+        if table:
+            lines.append(f"| {name.title()} | {rng.randint(1, 4)} | pcs | {price:.2f} |")
+        elif rng.random() < 0.45:
+            lines.append(f"{name}  {rng.randint(1, 6)} x {price:.2f}")
+        elif rng.random() < 0.7:
+            lines.append(f"{name}  {rng.uniform(0.2, 3):.2f} {rng.choice(WEIGHED_UNITS)} @ {price:.2f}/lb  {price * 2:.2f}")
+        else:
+            # Free-form lines the parser must leave to the agent
+            lines.append(f"{name.lower()} promo bundle {price:.2f}")
+    lines += ["", f"SUBTOTAL  {rng.uniform(20, 200):.2f}", "TAX  1.23", "VISA ****1234", "THANK YOU FOR SHOPPING"]
+    return "\n".join(lines)
+
+
+def load_corpus(args):
+    if args.corpus:
+        receipts = []
+        for file_name in sorted(os.listdir(args.corpus)):
+            if file_name.endswith((".md", ".txt")):
+                with open(os.path.join(args.corpus, file_name)) as f:
+                    receipts.append(f.read())
+        return receipts
+    rng = random.Random(args.seed)
+    return [synthetic_receipt(rng, args.lines) for _ in range(args.receipts)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--corpus", help="directory of .md/.txt receipts (defaults to a synthetic corpus)")
+    parser.add_argument("--receipts", type=int, default=2000)
+    parser.add_argument("--lines", type=int, default=40, help="item lines per synthetic receipt")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    receipts = load_corpus(args)
+    counts = {'item': 0, 'unparsed': 0, 'ignored': 0}
+    total_bytes = sum(len(receipt.encode("utf-8")) for receipt in receipts)
+
+    start = time.perf_counter()
+    for receipt in receipts:
+        for kind, _ in parse_receipt_lines(io.StringIO(receipt)):
+            counts[kind] += 1
+    elapsed = time.perf_counter() - start
+
+    total_lines = sum(counts.values())
+    candidates = counts['item'] + counts['unparsed']
+    print(f"receipts:        {len(receipts)}")
+    print(f"lines:           {total_lines} ({counts['ignored']} structural, {candidates} candidate)")
+    print(f"parse rate:      {counts['item'] / candidates:.1%} of candidate lines parsed without the agent" if candidates else "parse rate:      n/a")
+    print(f"throughput:      {total_lines / elapsed:,.0f} lines/s, {total_bytes / elapsed / 1e6:.1f} MB/s")
+
+
+if __name__ == "__main__":
+    main()
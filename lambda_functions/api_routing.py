@@ -0,0 +1,169 @@
+import base64
+import gzip
+import hashlib
+import json
+import os
+import metrics
+from inventory_repository import InvalidRequest, RepositoryError, dispatch, error_response
+from json_encoding import dumps
+
+# Responses at least this large are gzipped for clients that accept it; smaller ones gain too little
+GZIP_MIN_BYTES = int(os.environ.get("GZIP_MIN_BYTES", "1024"))
+GZIP_LEVEL = int(os.environ.get("GZIP_LEVEL", "5"))
+
+
+class RouteNotFound(RepositoryError):
+    status_code = 404
+
+
+class MethodNotAllowed(RepositoryError):
+    status_code = 405
+
+
+class Route:
+    """An API path served by an inventory action.
+
+    Query string parameters and the fields of a JSON object body become the action's fields. With
+    body_field, a body that does not name that field is taken as its value, so an item can be POSTed as is.
+    """
+
+    def __init__(self, action, methods, body_field=None):
+        self.action = action
+        self.methods = methods
+        self.body_field = body_field
+
+
+# The resources terraform wires to this Lambda (see terraform/main.tf)
+ROUTES = {
+    '/add-item': Route('add_grocery_item', ('POST',), body_field='item_details'),
+    '/get-item': Route('get_grocery_item_details', ('GET', 'POST')),
+    '/update-item': Route('update_grocery_item', ('POST',), body_field='item_update'),
+    '/remove-item': Route('remove_grocery_item', ('POST', 'DELETE')),
+    '/list-items': Route('list_all_grocery_items', ('GET', 'POST')),
+}
+
+
+def is_proxy_event(event):
+    """True for API Gateway proxy integration events (REST or HTTP API), as opposed to direct invocations."""
+    return isinstance(event, dict) and ('httpMethod' in event or 'routeKey' in event)
+
+
+class ProxyRequest:
+    """The parts of a proxy event the router needs; the body is decoded and parsed once, here."""
+
+    def __init__(self, event):
+        http = (event.get('requestContext') or {}).get('http') or {}
+        self.method = (event.get('httpMethod') or http.get('method') or '').upper()
+        self.path = event.get('resource') or event.get('rawPath') or event.get('path') or ''
+        # Header names are case-insensitive; REST APIs keep the client's casing
+        self.headers = {name.lower(): value for name, value in (event.get('headers') or {}).items()}
+        self.query = dict(event.get('queryStringParameters') or {})
+        self.raw_body = event.get('body')
+        self.is_base64 = bool(event.get('isBase64Encoded'))
+
+    def json_body(self):
+        """The body as a JSON object ({} when empty); raises InvalidRequest otherwise."""
+        body = self.raw_body
+        if not body:
+            return {}
+        try:
+            if self.is_base64:
+                body = base64.b64decode(body)
+            parsed = json.loads(body)
+        except (ValueError, TypeError):
+            raise InvalidRequest("The request body must be valid JSON.")
+        if not isinstance(parsed, dict):
+            raise InvalidRequest("The request body must be a JSON object.")
+        return parsed
+
+
+def route_event(request):
+    """Maps a proxy request onto the Lambda event dispatch expects; raises before any data access when it cannot."""
+    route = ROUTES.get(request.path)
+    if route is None:
+        raise RouteNotFound(f"No route for {request.path}")
+    if request.method not in route.methods:
+        raise MethodNotAllowed(f"{request.method} is not allowed on {request.path}; use {', '.join(route.methods)}.")
+
+    body = request.json_body()
+    event = dict(request.query)
+    if route.body_field and body and route.body_field not in body:
+        event[route.body_field] = body
+    else:
+        event.update(body)
+    event['action'] = route.action
+    return event
+
+
+def accepts_gzip(accept_encoding):
+    """Whether an Accept-Encoding header allows gzip (explicitly or through *), honouring q=0."""
+    for coding in (accept_encoding or '').split(','):
+        name, _, parameters = coding.partition(';')
+        if name.strip().lower() not in ('gzip', '*'):
+            continue
+        quality = parameters.strip()
+        if quality.startswith('q='):
+            try:
+                return float(quality[2:]) > 0
+            except ValueError:
+                return False
+        return True
+    return False
+
+
+def etag_matches(if_none_match, etag):
+    if not if_none_match:
+        return False
+    # Weak comparison, as conditional GETs use: W/"x" matches "x"
+    candidates = {candidate.strip().replace('W/', '', 1) for candidate in if_none_match.split(',')}
+    return '*' in candidates or etag in candidates
+
+
+def http_response(request, status_code, body):
+    """A proxy response for an encoded body: ETag/304 for successful GETs, gzip when large and accepted.
+
+    The ETag hashes the uncompressed body, so it is computed after the read and the serialization: a 304
+    saves the compression and the transfer, not the DynamoDB read. Items carry no change timestamp, and
+    a listing's freshness cannot be known without reading it, so there is no cheaper validator to use.
+    """
+    # Every response says the body depends on Accept-Encoding, so caches keep gzip and identity apart
+    headers = {'Content-Type': 'application/json', 'Vary': 'Accept-Encoding'}
+    if request.method == 'GET' and status_code == 200:
+        etag = '"' + hashlib.sha256(body.encode('utf-8')).hexdigest()[:32] + '"'
+        headers['ETag'] = etag
+        if etag_matches(request.headers.get('if-none-match'), etag):
+            # The client's copy is current: nothing to compress or send
+            return {'statusCode': 304, 'headers': headers, 'body': ''}
+
+    if len(body) >= GZIP_MIN_BYTES and accepts_gzip(request.headers.get('accept-encoding')):
+        with metrics.span('Compress'):
+            compressed = gzip.compress(body.encode('utf-8'), compresslevel=GZIP_LEVEL)
+        headers['Content-Encoding'] = 'gzip'
+        # API Gateway decodes base64 bodies to binary for the binary media types of the API
+        return {
+            'statusCode': status_code,
+            'headers': headers,
+            'body': base64.b64encode(compressed).decode('ascii'),
+            'isBase64Encoded': True
+        }
+    return {'statusCode': status_code, 'headers': headers, 'body': body}
+
+
+def handle_proxy_event(event):
+    """Serves an API Gateway proxy event: route, dispatch, then encode, compress and tag the response."""
+    request = ProxyRequest(event)
+    try:
+        action_event = route_event(request)
+        metrics.set_action(action_event['action'])
+        with metrics.span('Dispatch'):
+            result = dispatch(action_event)
+    except RepositoryError as e:
+        response = error_response(e)
+        return http_response(request, response['statusCode'], response['body'])
+    except Exception as e:
+        response = error_response(RepositoryError(str(e)))
+        return http_response(request, response['statusCode'], response['body'])
+
+    with metrics.span('Serialize'):
+        body = dumps(result, pretty=str(request.query.get('pretty', '')).lower() in ('1', 'true'))
+    return http_response(request, 200, body)
@@ -0,0 +1,111 @@
+import json
+import os
+import threading
+from boto3.dynamodb.types import TypeSerializer
+from update_expression import to_dynamodb
+
+# Where item changes come from: "streams" (default) leaves it to the table's DynamoDB stream; "local" has
+# the repository append every change to CHANGE_LOG_PATH, a replayable stand-in for the stream
+CHANGE_FEED = os.environ.get("CHANGE_FEED", "streams").lower()
+CHANGE_LOG_PATH = os.environ.get("CHANGE_LOG_PATH", "/tmp/inventory_changes.jsonl")
+# The attributes inventory aggregates are computed from; local records carry only these
+PROJECTED_ATTRIBUTES = ('item_id', 'category', 'quantity', 'unit_price')
+
+serializer = TypeSerializer()
+
+
+def project(image):
+    """An item image reduced to PROJECTED_ATTRIBUTES, in the low-level wire format stream records use."""
+    return {key: serializer.serialize(to_dynamodb(image[key])) for key in PROJECTED_ATTRIBUTES if image.get(key) is not None}
+
+
+class ChangeLog:
+    """Append-only JSON lines file of records shaped like DynamoDB stream records (NEW_AND_OLD_IMAGES).
+
+    It remembers each item's last logged image, so records carry the old image as the stream's do, and
+    records are numbered so a consumer can replay the log from any position.
+    """
+
+    def __init__(self, path=CHANGE_LOG_PATH, enabled=CHANGE_FEED == "local"):
+        self.path = path
+        self.enabled = enabled
+        self.images = None
+        self.position = 0
+        # File offset just past the position the last read stopped at, so the next read starts there
+        self.offsets = {0: 0}
+        self.lock = threading.Lock()
+
+    def load(self):
+        # Caller holds the lock
+        if self.images is None:
+            self.images = {}
+            for record, _ in self.read_file():
+                self.position = int(record['dynamodb']['SequenceNumber'])
+                self.remember(record)
+
+    def remember(self, record):
+        item_id = record['dynamodb']['Keys']['item_id']['S']
+        if record['eventName'] == 'REMOVE':
+            self.images.pop(item_id, None)
+        else:
+            self.images[item_id] = record['dynamodb']['NewImage']
+
+    def append(self, item_id, new_image):
+        """Logs an item's new image, or its removal when new_image is None. Changes that leave the projected
+        attributes as they were are not logged."""
+        new = project(new_image) if new_image is not None else None
+        with self.lock:
+            self.load()
+            old = self.images.get(str(item_id))
+            if old == new:
+                return
+            self.position += 1
+            change = {'Keys': {'item_id': serializer.serialize(str(item_id))}, 'SequenceNumber': str(self.position)}
+            if old is not None:
+                change['OldImage'] = old
+            if new is not None:
+                change['NewImage'] = new
+            record = {
+                'eventID': f"local-{self.position}",
+                'eventName': 'INSERT' if old is None else 'REMOVE' if new is None else 'MODIFY',
+                'eventSource': 'local:change-log',
+                'dynamodb': change
+            }
+            with open(self.path, 'a') as f:
+                f.write(json.dumps(record, separators=(',', ':')) + "\n")
+            self.remember(record)
+
+    def read_file(self, offset=0):
+        """Yields (record, offset past it) from the given file offset on."""
+        try:
+            with open(self.path, 'rb') as f:
+                f.seek(offset)
+                for line in f:
+                    offset += len(line)
+                    if line.strip():
+                        yield json.loads(line), offset
+        except FileNotFoundError:
+            return
+
+    def last_position(self):
+        with self.lock:
+            self.load()
+            return self.position
+
+    def read(self, after=0):
+        """Returns the records logged after the given position, oldest first."""
+        with self.lock:
+            start = self.offsets.get(after, 0)
+            records = []
+            for record, offset in self.read_file(start):
+                position = int(record['dynamodb']['SequenceNumber'])
+                if position > after:
+                    records.append(record)
+                    last = (position, offset)
+            if records:
+                self.offsets = {0: 0, last[0]: last[1]}
+            return records
+
+
+# Shared by all invocations served by this container
+change_log = ChangeLog()
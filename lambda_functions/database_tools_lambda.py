@@ -1,209 +1,120 @@
-import json
-import boto3
-from decimal import Decimal
-import os
+import metrics
 from langchain.tools import tool
+from json_encoding import dumps
+import inventory_repository
+from inventory_repository import ACTIONS, ConflictError, InvalidRequest, RepositoryError, dispatch, error_response
 
-# Load necessary tools
-dynamodb = boto3.resource('dynamodb', region_name=os.environ.get("AWS_REGION"))
-table_name = os.environ.get("DYNAMODB_TABLE_NAME")
-table = dynamodb.Table(table_name)
-
-
-def replace_decimals(obj):
-    if isinstance(obj, list):
-        for i in range(len(obj)):
-            obj[i] = replace_decimals(obj[i])
-        return obj
-    elif isinstance(obj, dict):
-        for k, v in obj.items():
-            obj[k] = replace_decimals(v)
-        return obj
-    elif isinstance(obj, Decimal):
-        if obj % 1 == 0:
-            return int(obj)
-        else:
-            return float(obj)
-    else:
-        return obj
+
+def run_tool(operation, *args):
+    """Runs a repository operation for an agent, which reads results and failures as text rather than data and exceptions."""
+    try:
+        result = operation(*args)
+        return result if isinstance(result, str) else dumps(result)
+    except (InvalidRequest, ConflictError) as e:
+        return f"Error: {str(e)}"
+    except RepositoryError as e:
+        return str(e)
 
 
 @tool("Add Grocery Item")
 def add_grocery_item(item_details: str) -> str:
-    """Adds a new grocery item to the inventory. Provide the item details in JSON format."""
-    try:
-        item = json.loads(item_details)
-        # Check if required keys exist and have values
-        required_keys = ['item_id', 'name', 'category', 'quantity', 'unit_price']
-        if not all(key in item and item[key] for key in required_keys):
-            return "Error: Required fields ('item_id', 'name', 'category', 'quantity', 'unit_price') cannot be empty."
-
-        # Convert quantity and unit_price to Decimal
-        item['quantity'] = Decimal(str(item['quantity']))
-        item['unit_price'] = Decimal(str(item['unit_price']))
-
-        # Use the item_id as the primary key
-        table.put_item(Item=item)
-
-        return f"Successfully added grocery item: {item['name']}"
-    except json.JSONDecodeError:
-        return "Error: Invalid JSON format. Please provide item details in JSON format."
-    except Exception as e:
-        return f"Error adding grocery item: {str(e)}"
+    """Adds a new grocery item to the inventory. Provide the item details in JSON format.
+    An item_id that already exists is refused; include an idempotency_key to make retries safe."""
+    return run_tool(inventory_repository.add_grocery_item, item_details)
 
 
 @tool("Update Grocery Item")
 def update_grocery_item(item_update: str) -> str:
-    """Updates the details of an existing grocery item in the inventory. Provide the item update in JSON format."""
-    try:
-        update = json.loads(item_update)
-        item_id = update.get('item_id')
-
-        if not item_id:
-            return "Error: item_id is required to update an item."
-
-        # Prepare the update expression and attribute values
-        update_expression = "SET "
-        expression_attribute_values = {}
-        for key, value in update.items():
-            if key != 'item_id':
-                update_expression += f"{key} = :{key}, "
-                expression_attribute_values[f":{key}"] = Decimal(str(value)) if isinstance(value, (int, float)) else value
-
-        # Remove the trailing comma and space
-        update_expression = update_expression.rstrip(", ")
-
-        # Ensure there is something to update
-        if not expression_attribute_values:
-            return "Error: No updates provided for the item."
-
-        # Update the item in DynamoDB
-        table.update_item(
-            Key={'item_id': item_id},
-            UpdateExpression=update_expression,
-            ExpressionAttributeValues=expression_attribute_values
-        )
-
-        return f"Successfully updated grocery item with item_id: {item_id}"
-    except json.JSONDecodeError:
-        return "Error: Invalid JSON format. Please provide the item update in JSON format."
-    except Exception as e:
-        return f"Error updating grocery item: {str(e)}"
+    """Updates the details of an existing grocery item in the inventory in one atomic call. Provide the item update in JSON format.
+    Fields are set (dotted names such as "nutrition.calories" set nested values). Optionally use "$add" (path -> number),
+    "$remove" (list of paths), "$if_not_exists" (path -> value), "$append" (list path -> values), "$conditions"
+    (list of [path, operator, value]) and "$return_values" (e.g. "ALL_NEW"). Include expected_version to apply the update only if nobody changed the item since, and an idempotency_key
+    to make retries safe."""
+    return run_tool(inventory_repository.update_grocery_item, item_update)
 
 
 @tool("Remove Grocery Item")
 def remove_grocery_item(item_id: str) -> str:
     """Removes a grocery item from the inventory based on its item_id."""
-    try:
-        if not item_id:
-            return "Error: item_id is required to remove an item."
-
-        # Delete the item from DynamoDB
-        table.delete_item(Key={'item_id': item_id})
-
-        return f"Successfully removed grocery item with item_id: {item_id}"
-    except Exception as e:
-        return f"Error removing grocery item: {str(e)}"
+    return run_tool(inventory_repository.remove_grocery_item, item_id)
 
 
 @tool("Get Grocery Item Details")
 def get_grocery_item_details(item_id: str) -> str:
     """Retrieves the details of a specific grocery item from the inventory based on its item_id."""
-    try:
-        if not item_id:
-            return "Error: item_id is required to retrieve item details."
-
-        # Retrieve the item from DynamoDB
-        response = table.get_item(Key={'item_id': item_id})
-
-        if 'Item' in response:
-            item = response['Item']
-            # Convert Decimal types to Python native types
-            item = replace_decimals(item)
-            return json.dumps(item, indent=2)
-        else:
-            return f"Grocery item with item_id '{item_id}' not found."
-    except Exception as e:
-        return f"Error retrieving grocery item details: {str(e)}"
+    return run_tool(inventory_repository.get_grocery_item_details, item_id)
 
 
 @tool("List All Grocery Items")
-def list_all_grocery_items(category: str = None) -> str:
-    """Lists all grocery items in the inventory. Optionally, filter by category."""
-    try:
-        if category:
-            response = table.scan(FilterExpression=boto3.dynamodb.conditions.Attr('category').eq(category))
-        else:
-            response = table.scan()
-
-        items = response.get('Items', [])
-        if items:
-            items = replace_decimals(items)
-            return json.dumps(items, indent=2)
-        else:
-            return "No grocery items found."
-    except Exception as e:
-        return f"Error listing grocery items: {str(e)}"
+def list_all_grocery_items(category: str = None, limit: int = None, cursor: str = None) -> str:
+    """Lists all grocery items in the inventory. Optionally, filter by category.
+    Pass a limit and/or the next_cursor of a previous page to list the inventory one page at a time."""
+    return run_tool(inventory_repository.list_all_grocery_items, category, limit, cursor)
+
+
+@tool("List Expiring Grocery Items")
+def list_expiring_grocery_items(expiring_before: str, category: str = None, limit: int = None, cursor: str = None) -> str:
+    """Lists grocery items expiring before a date (YYYY-MM-DD), soonest first. Optionally, filter by category.
+    Pass a limit and/or the next_cursor of a previous page to list the items one page at a time."""
+    return run_tool(inventory_repository.list_expiring_grocery_items, expiring_before, category, limit, cursor)
+
+
+@tool("Items Expiring Within")
+def items_expiring_within(days: int, limit: int = 10, today: str = None) -> str:
+    """Lists up to `limit` in-stock grocery items expiring within the next `days` days (already expired ones included), soonest first."""
+    return run_tool(inventory_repository.items_expiring_within, days, limit, today)
 
 
 @tool("Adjust Inventory Quantity")
-def adjust_inventory_quantity(item_id: str, quantity_change: int) -> str:
-    """Adjusts the inventory quantity of a grocery item. Provide the item_id and the quantity_change (positive or negative)."""
-    try:
-        if not item_id or not isinstance(quantity_change, int):
-            return "Error: item_id and quantity_change (integer) are required."
-
-        # Update the item in DynamoDB
-        response = table.update_item(
-            Key={'item_id': item_id},
-            UpdateExpression="SET quantity = quantity + :quantity_change",
-            ExpressionAttributeValues={':quantity_change': Decimal(str(quantity_change))},
-            ReturnValues="UPDATED_NEW"
-        )
-
-        if response and 'Attributes' in response:
-            return f"Successfully adjusted inventory quantity for item_id: {item_id}. New quantity: {response['Attributes']['quantity']}"
-        else:
-            return "Failed to adjust inventory quantity."
-    except Exception as e:
-        return f"Error adjusting inventory quantity: {str(e)}"
+def adjust_inventory_quantity(item_id: str, quantity_change: int, expected_version: int = None, idempotency_key: str = None) -> str:
+    """Adjusts the inventory quantity of a grocery item. Provide the item_id and the quantity_change (positive or negative).
+    Include expected_version to apply the change only if nobody changed the item since, and an idempotency_key
+    so a retried request is not applied twice."""
+    return run_tool(inventory_repository.adjust_inventory_quantity, item_id, quantity_change, expected_version, idempotency_key)
+
+
+@tool("Add Grocery Items")
+def add_grocery_items(items_details: str) -> str:
+    """Adds several grocery items in batched writes. Provide a JSON array of item details; returns a result per item.
+    Items whose item_id already exists are refused with status 'conflict'."""
+    return run_tool(inventory_repository.add_grocery_items, items_details)
+
 
+@tool("Get Grocery Items")
+def get_grocery_items(item_ids: str) -> str:
+    """Retrieves several grocery items with batched reads. Provide a JSON array of item_ids; returns a result per item."""
+    return run_tool(inventory_repository.get_grocery_items, item_ids)
+
+
+@tool("Remove Grocery Items")
+def remove_grocery_items(item_ids: str) -> str:
+    """Removes several grocery items in batched deletes. Provide a JSON array of item_ids; returns a result per item."""
+    return run_tool(inventory_repository.remove_grocery_items, item_ids)
+
+
+@tool("Adjust Inventory Quantities")
+def adjust_inventory_quantities(adjustments: str) -> str:
+    """Adjusts the quantities of several grocery items transactionally, never letting a quantity drop below 0.
+    Provide a JSON array of {"item_id": ..., "delta": ...} pairs; returns which items were applied or conflicted."""
+    return run_tool(inventory_repository.adjust_inventory_quantities, adjustments)
+
+
+@metrics.instrumented('database_tools_lambda', ACTIONS)
 def lambda_handler(event, context):
     """
     Handles requests to the database tools Lambda function.
     """
-    action = event.get('action')
-    if not action:
-        return {
-            'statusCode': 400,
-            'body': json.dumps({'error': 'Missing action parameter'})
-        }
-
     try:
-        if action == 'add_grocery_item':
-            result = add_grocery_item(event.get('item_details'))
-        elif action == 'update_grocery_item':
-            result = update_grocery_item(event.get('item_update'))
-        elif action == 'remove_grocery_item':
-            result = remove_grocery_item(event.get('item_id'))
-        elif action == 'get_grocery_item_details':
-            result = get_grocery_item_details(event.get('item_id'))
-        elif action == 'list_all_grocery_items':
-            result = list_all_grocery_items(event.get('category'))
-        elif action == 'adjust_inventory_quantity':
-            result = adjust_inventory_quantity(event.get('item_id'), event.get('quantity_change'))
-        else:
-            return {
-                'statusCode': 400,
-                'body': json.dumps({'error': f'Invalid action: {action}'})
-            }
-
-        return {
-            'statusCode': 200,
-            'body': json.dumps({'result': result})
-        }
+        with metrics.span('Dispatch'):
+            result = dispatch(event)
+    except RepositoryError as e:
+        return error_response(e)
     except Exception as e:
-        return {
-            'statusCode': 500,
-            'body': json.dumps({'error': str(e)})
-        }
+        return error_response(RepositoryError(str(e)))
+
+    with metrics.span('Serialize'):
+        body = dumps({'result': result}, pretty=bool(event.get('pretty')))
+    return {
+        'statusCode': 200,
+        'body': body
+    }
@@ -1,15 +1,48 @@
+import metrics
 import os
-from crewai import Agent
-from crewai_tools import WebsiteSearchTool
+import json
+import math
+import queue
+import re
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from shelf_life_cache import normalize_item_name, shelf_life_cache
+from llm_cache import llm_cache
 
-def lambda_handler(event, context):
-    items = event['items']
-    date_of_purchase = event['date_of_purchase']
+DEFAULT_STORAGE = "refrigerated"
+# Tokens of item names plus their answers packed into one agent request; the instructions around them
+# are a fixed overhead per batch. A batch never holds more than EXPIRATION_BATCH_MAX_ITEMS items.
+EXPIRATION_BATCH_TOKEN_BUDGET = int(os.environ.get("EXPIRATION_BATCH_TOKEN_BUDGET", "600"))
+EXPIRATION_BATCH_MAX_ITEMS = int(os.environ.get("EXPIRATION_BATCH_MAX_ITEMS", "25"))
+# Batches in flight at once, and how many more rounds the items a batch failed to estimate get
+EXPIRATION_BATCH_CONCURRENCY = int(os.environ.get("EXPIRATION_BATCH_CONCURRENCY", "4"))
+EXPIRATION_BATCH_RETRIES = int(os.environ.get("EXPIRATION_BATCH_RETRIES", "1"))
+# Rough size of the JSON that answers one item, on top of echoing its name
+ANSWER_TOKENS_PER_ITEM = 6
+
+# Built on first use and reused by every warm invocation served by this container,
+# so the website search tool's index is not rebuilt per request
+expiration_date_search_agent = None
+# Agents for concurrent batches beyond the first, which share its search tool: a crewai Agent runs
+# one task at a time, so each batch in flight needs its own
+extra_expiration_date_search_agents = []
+
+# Shared across warm invocations so threads are not re-created per request
+executor = ThreadPoolExecutor(max_workers=EXPIRATION_BATCH_CONCURRENCY)
+
+
+def build_expiration_date_search_agent(expiration_date_search_web_tool=None):
+    """Creates the Expiration Date Estimation agent, and its shelf-life search tool unless one is given."""
+    # Imported here so cold starts and fully cached requests skip loading crewai
+    from crewai import Agent
 
-    # Use website search tool to search the website "www.stilltasty.com"
-    expiration_date_search_web_tool = WebsiteSearchTool(website='https://www.stilltasty.com/')
+    if expiration_date_search_web_tool is None:
+        from crewai_tools import WebsiteSearchTool
 
-    expiration_date_search_agent = Agent(
+        # Use website search tool to search the website "www.stilltasty.com"
+        expiration_date_search_web_tool = WebsiteSearchTool(website='https://www.stilltasty.com/')
+
+    return Agent(
         role="Expiration Date Estimation Specialist",
         goal=(
             "Accurately estimate the expiration dates of items extracted by the Receipt Markdown Interpreter Agent. "
@@ -27,17 +60,186 @@ def lambda_handler(event, context):
         tools=[expiration_date_search_web_tool]
     )
 
-    # TODO: Implement the logic to estimate expiration dates for each item
-    # This is a placeholder, replace with actual implementation
+
+def get_expiration_date_search_agent():
+    """Returns this container's agent, building it on first use. Per-request state belongs in Tasks, not here."""
+    global expiration_date_search_agent
+    if expiration_date_search_agent is None:
+        with metrics.span('AgentBuild'):
+            expiration_date_search_agent = build_expiration_date_search_agent()
+    return expiration_date_search_agent
+
+
+def get_batch_agents(count):
+    """Returns `count` agents for concurrent batches: this container's agent plus reused extras."""
+    agent = get_expiration_date_search_agent()
+    while len(extra_expiration_date_search_agents) < count - 1:
+        with metrics.span('AgentBuild'):
+            extra_expiration_date_search_agents.append(build_expiration_date_search_agent(agent.tools[0]))
+    return [agent] + extra_expiration_date_search_agents[:count - 1]
+
+
+def estimate_tokens(text):
+    # About four characters per token for English text, which is all the packing needs
+    return math.ceil(len(text) / 4)
+
+
+def pack_batches(names, token_budget=EXPIRATION_BATCH_TOKEN_BUDGET, max_items=EXPIRATION_BATCH_MAX_ITEMS):
+    """Splits item names into consecutive batches whose names and answers fit the token budget.
+
+    A name too long for the budget on its own still gets a batch of its own.
+    """
+    batches = []
+    batch, batch_tokens = [], 0
+    for name in names:
+        # The name is sent once and echoed once as the answer's key
+        tokens = 2 * estimate_tokens(json.dumps(name)) + ANSWER_TOKENS_PER_ITEM
+        if batch and (batch_tokens + tokens > token_budget or len(batch) >= max_items):
+            batches.append(batch)
+            batch, batch_tokens = [], 0
+        batch.append(name)
+        batch_tokens += tokens
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def ask_agent(agent, names, storage, retry=False):
+    """Asks the agent for the shelf life of several items in one request and returns its raw answer."""
+    from crewai import Task
+
+    # A retry is worded differently, so it is not answered from the LLM cache with the answer that failed
+    retry_note = "An earlier answer left these items out or did not give a whole number of days for them. " if retry else ""
+    task = Task(
+        description=(
+            retry_note +
+            f"Find how many days each of these items typically lasts when {storage}: {json.dumps(names)}. "
+            "Answer with only a JSON object that maps every item name, exactly as given, to a whole number of days, "
+            "e.g. {\"milk\": 7}. Use null for an item you cannot estimate."
+        ),
+        expected_output="A JSON object mapping each item name to its shelf life in days.",
+        agent=agent
+    )
+    return llm_cache.kickoff('expiration_date_estimation_agent', agent, task)
+
+
+def parse_shelf_lives(answer, names):
+    """Splits a batch answer back into items: {name: days} for the names it answered validly."""
+    match = re.search(r"\{.*\}", answer or "", re.DOTALL)
+    try:
+        answered = json.loads(match.group(0))
+    except (AttributeError, ValueError):
+        return {}
+    if not isinstance(answered, dict):
+        return {}
+    # The agent may change an item's case or punctuation when it echoes the name
+    by_key = {normalize_item_name(name): value for name, value in answered.items()}
+    shelf_lives = {}
+    for name in names:
+        value = by_key.get(normalize_item_name(name))
+        if isinstance(value, bool):
+            continue
+        try:
+            shelf_life_days = int(value)
+        except (TypeError, ValueError):
+            continue
+        if shelf_life_days >= 0:
+            shelf_lives[name] = shelf_life_days
+    return shelf_lives
+
+
+def estimate_shelf_lives(names, storage, agents, ask=ask_agent):
+    """Estimates shelf lives for item names in token-budgeted batches, at most len(agents) at a time.
+
+    Each agent runs one batch at a time. Items a batch leaves out or answers invalidly (or every item of
+    a batch that fails outright) are packed into new batches, up to EXPIRATION_BATCH_RETRIES more times.
+    Returns {name: days} for the names that were estimated. ask(agent, names, storage, retry) returns the raw
+    answer; the default asks the agent through the LLM cache, and a stub can stand in for the LLM.
+    """
+    idle_agents = queue.Queue()
+    for agent in agents:
+        idle_agents.put(agent)
+
+    def run_batch(batch, retry):
+        agent = idle_agents.get()
+        try:
+            return parse_shelf_lives(ask(agent, batch, storage, retry), batch)
+        except Exception:
+            return {}
+        finally:
+            idle_agents.put(agent)
+
+    shelf_lives = {}
+    pending = list(names)
+    for attempt in range(1 + EXPIRATION_BATCH_RETRIES):
+        if not pending:
+            break
+        batches = pack_batches(pending)
+        metrics.record('AgentBatches', len(batches))
+        if attempt:
+            metrics.record('AgentRetriedItems', len(pending))
+        for answered in executor.map(run_batch, batches, [attempt > 0] * len(batches)):
+            shelf_lives.update(answered)
+        pending = [name for name in pending if name not in shelf_lives]
+    return shelf_lives
+
+
+@metrics.instrumented('expiration_date_estimation_agent')
+def lambda_handler(event, context):
+    # Reject malformed requests before any of the agent stack is loaded
+    if not isinstance(event.get('items'), list):
+        return {"error": "items must be a list of objects with an item_name"}
+    # A malformed item is reported on its own instead of failing the batches it would have joined
+    items, invalid_items = [], []
+    for position, item in enumerate(event['items']):
+        if isinstance(item, dict) and isinstance(item.get('item_name'), str) and item['item_name'].strip():
+            items.append(item)
+        else:
+            invalid_items.append({"index": position, "item": item, "error": "Each item must be an object with an item_name"})
+    try:
+        purchase_date = date.fromisoformat(str(event.get('date_of_purchase')))
+    except ValueError:
+        return {"error": "date_of_purchase must be a date in YYYY-MM-DD format"}
+    storage = event.get('storage', DEFAULT_STORAGE)
+
+    # Recurring items ("milk", "spinach") are answered from the shelf-life cache; only misses reach the agent
+    shelf_lives = {}
+    misses = []
+    for item in items:
+        name = item['item_name']
+        if name in shelf_lives:
+            continue
+        shelf_lives[name] = shelf_life_cache.get(name, storage)
+        if shelf_lives[name] is None:
+            misses.append(name)
+
+    if misses:
+        # Names that differ only in case or punctuation are asked once
+        askers = {}
+        for name in misses:
+            askers.setdefault(normalize_item_name(name), name)
+        names = list(askers.values())
+        agents = get_batch_agents(min(EXPIRATION_BATCH_CONCURRENCY, len(pack_batches(names))))
+        estimated = estimate_shelf_lives(names, storage, agents)
+        for name in misses:
+            shelf_lives[name] = estimated.get(askers[normalize_item_name(name)])
+            if shelf_lives[name] is not None:
+                shelf_life_cache.put(name, storage, shelf_lives[name])
+
     estimated_items = []
     for item in items:
+        shelf_life_days = shelf_lives[item['item_name']]
         estimated_items.append({
             "item_name": item['item_name'],
-            "count": item['count'],
-            "unit": item['unit'],
-            "expiration_date": "2024-11-30" # Placeholder expiration date
+            "count": item.get('count', 1),
+            "unit": item.get('unit') or "pcs",
+            # Items the agent could not estimate are left without a date rather than given a made-up one
+            "expiration_date": (purchase_date + timedelta(days=shelf_life_days)).isoformat() if shelf_life_days is not None else None
         })
 
     return {
-        "items": estimated_items
+        "items": estimated_items,
+        "invalid_items": invalid_items,
+        "shelf_life_cache": shelf_life_cache.stats(),
+        "llm_cache": llm_cache.stats()
     }
@@ -0,0 +1,30 @@
+import heapq
+from datetime import date, timedelta
+
+
+def in_use_soon_window(item, cutoff):
+    """Whether an item has something left and an expiration_date on or before cutoff (YYYY-MM-DD)."""
+    expiration_date = item.get('expiration_date')
+    remaining = item.get('count', item.get('quantity', 1))
+    if not expiration_date or (remaining is not None and remaining <= 0):
+        return False
+    return str(expiration_date)[:10] <= cutoff
+
+
+def by_date(item):
+    return str(item['expiration_date'])
+
+
+def items_expiring_within(items, days, limit=None, today=None):
+    """Returns up to `limit` of the items expiring within `days` days of `today`, soonest (and already
+    expired) first, ties in their original order.
+
+    The lists the agents rank arrive with each request, so a bounded heapq.nsmallest pass over them is
+    O(n log limit) and keeps nothing between invocations. Items without an expiration_date or with
+    nothing left are left out.
+    """
+    cutoff = ((today or date.today()) + timedelta(days=days)).isoformat()
+    candidates = (item for item in items if in_use_soon_window(item, cutoff))
+    if limit is None:
+        return sorted(candidates, key=by_date)
+    return heapq.nsmallest(limit, candidates, key=by_date)
@@ -1,11 +1,26 @@
+import metrics
 import os
-from crewai import Agent
+import json
+import re
+from datetime import date
+from expiry_index import items_expiring_within
+from inventory_reconciliation import reconcile
+from llm_cache import llm_cache
+
+# How far ahead the "use soon" list looks, and how many items it holds
+USE_SOON_DAYS = int(os.environ.get("USE_SOON_DAYS", "3"))
+USE_SOON_LIMIT = int(os.environ.get("USE_SOON_LIMIT", "10"))
+
+# Built on first use and reused by every warm invocation served by this container
+grocery_tracker_agent = None
 
-def lambda_handler(event, context):
-    items = event['items']
-    consumed_items = event['consumed_items']
 
-    grocery_tracker_agent = Agent(
+def build_grocery_tracker_agent():
+    """Creates the Grocery Inventory Tracker agent."""
+    # Imported here so cold starts and requests that never reach the agent skip loading crewai
+    from crewai import Agent
+
+    return Agent(
         role="Grocery Inventory Tracker",
         goal=(
             "Accurately track the remaining groceries based on user consumption input. "
@@ -24,10 +39,74 @@ def lambda_handler(event, context):
         verbose=False # Set to False for Lambda function
     )
 
-    # TODO: Implement the logic to update the grocery list based on user input
-    # This is a placeholder, replace with actual implementation
+
+def get_grocery_tracker_agent():
+    """Returns this container's agent, building it on first use. Per-request state belongs in Tasks, not here."""
+    global grocery_tracker_agent
+    if grocery_tracker_agent is None:
+        with metrics.span('AgentBuild'):
+            grocery_tracker_agent = build_grocery_tracker_agent()
+    return grocery_tracker_agent
+
+
+def match_names_with_agent(agent, consumed_names, inventory_names):
+    """Asks the agent which inventory item each unresolved consumed name refers to (None when there is none)."""
+    from crewai import Task
+
+    task = Task(
+        description=(
+            f"The user reported consuming these items: {json.dumps(consumed_names)}. "
+            f"The inventory contains exactly these items: {json.dumps(inventory_names)}. "
+            "For each consumed item, pick the inventory item it refers to, or null if none does. "
+            "Answer with only a JSON object mapping each consumed item to an inventory item name or null."
+        ),
+        expected_output="A JSON object mapping consumed item names to inventory item names or null.",
+        agent=agent
+    )
+    result = llm_cache.kickoff('grocery_tracker_agent', agent, task)
+    match = re.search(r"\{.*\}", result, re.DOTALL)
+    try:
+        mapping = json.loads(match.group(0))
+    except (AttributeError, ValueError):
+        return {}
+    allowed = set(inventory_names)
+    return {name: target for name, target in mapping.items() if target in allowed} if isinstance(mapping, dict) else {}
+
+
+@metrics.instrumented('grocery_tracker_agent')
+def lambda_handler(event, context):
+    # Reject malformed requests before any of the agent stack is loaded
+    for field in ('items', 'consumed_items'):
+        entries = event.get(field)
+        if not isinstance(entries, list) or not all(
+                isinstance(entry, dict) and entry.get('item_name') and isinstance(entry.get('count'), (int, float))
+                for entry in entries):
+            return {"error": f"{field} must be a list of objects with an item_name and a numeric count"}
+    try:
+        today = date.fromisoformat(str(event['today'])[:10]) if event.get('today') else date.today()
+        use_soon_days = int(event.get('use_soon_days', USE_SOON_DAYS))
+    except (ValueError, TypeError):
+        return {"error": "today must be a date in YYYY-MM-DD format and use_soon_days an integer"}
+
+    items = event['items']
+    consumed_items = event['consumed_items']
+
+    # Consumption is matched deterministically by normalized name and unit (with g/kg, ml/l, ... conversion),
+    # taking from the earliest-expiring lot first; the agent is only consulted for names it cannot resolve
+    reconciliation = reconcile(items, consumed_items)
+    unresolved = reconciliation['unresolved']
+    if unresolved:
+        inventory_names = sorted({item['item_name'] for item in items})
+        mapping = match_names_with_agent(get_grocery_tracker_agent(), sorted({c['item_name'] for c in unresolved}), inventory_names)
+        remapped = [dict(c, item_name=mapping[c['item_name']]) for c in unresolved if c['item_name'] in mapping]
+        if remapped:
+            second_pass = reconcile(reconciliation['items'], remapped)
+            reconciliation['items'] = second_pass['items']
+            reconciliation['shortfalls'] += second_pass['shortfalls']
+            unresolved = [c for c in unresolved if c['item_name'] not in mapping] + second_pass['unresolved']
+
     updated_items = []
-    for item in items:
+    for item in reconciliation['items']:
         updated_items.append({
             "item_name": item['item_name'],
             "count": item['count'],
@@ -36,5 +115,8 @@ def lambda_handler(event, context):
         })
 
     return {
-        "items": updated_items
+        "items": updated_items,
+        "expiring_soon": items_expiring_within(updated_items, use_soon_days, USE_SOON_LIMIT, today),
+        "unresolved_consumed_items": unresolved,
+        "shortfalls": reconciliation['shortfalls']
     }
@@ -0,0 +1,89 @@
+import hashlib
+import json
+import os
+import time
+import metrics
+from json_encoding import dumps
+from ttl_cache import LRUCache
+
+# How long a client-supplied idempotency key is remembered, and where
+IDEMPOTENCY_TTL_SECONDS = int(os.environ.get("IDEMPOTENCY_TTL_SECONDS", str(24 * 3600)))
+IDEMPOTENCY_TABLE_NAME = os.environ.get("IDEMPOTENCY_TABLE_NAME")
+IDEMPOTENCY_MEMORY_SIZE = int(os.environ.get("IDEMPOTENCY_MEMORY_SIZE", "4096"))
+
+
+def request_fingerprint(action, request):
+    """Hashes an action and its arguments, so a key reused for a different request can be told apart from a retry."""
+    raw = json.dumps([action, request], sort_keys=True, default=str, separators=(',', ':'))
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+class MemoryIdempotencyStore:
+    """Dedup records in this container only: retries served by another container are not recognized."""
+
+    transactional = False
+
+    def __init__(self, ttl_seconds=IDEMPOTENCY_TTL_SECONDS, max_size=IDEMPOTENCY_MEMORY_SIZE):
+        self.entries = LRUCache(max_size, ttl_seconds)
+
+    def get(self, key):
+        """Returns the (fingerprint, result) recorded for a key, or None."""
+        return self.entries.get(key)
+
+    def save(self, key, fingerprint, result):
+        self.entries.put(key, (fingerprint, result))
+
+
+class DynamoDBIdempotencyStore:
+    """Dedup records shared by all containers, written in the same transaction as the item they protect.
+    Expired records are removed by the table's TTL on expires_at."""
+
+    transactional = True
+
+    def __init__(self, table_name=IDEMPOTENCY_TABLE_NAME, ttl_seconds=IDEMPOTENCY_TTL_SECONDS):
+        self.table_name = table_name
+        self.ttl_seconds = ttl_seconds
+        self.table = None
+
+    def get_table(self):
+        if self.table is None:
+            import boto3
+
+            dynamodb = boto3.resource('dynamodb', region_name=os.environ.get("AWS_REGION"))
+            metrics.instrument_dynamodb(dynamodb.meta.client)
+            self.table = dynamodb.Table(self.table_name)
+        return self.table
+
+    def get(self, key):
+        item = self.get_table().get_item(Key={'idempotency_key': key}, ConsistentRead=True).get('Item')
+        # TTL deletion can lag, so expiry is checked on read as well
+        if item is None or item['expires_at'] <= time.time():
+            return None
+        return item['fingerprint'], json.loads(item['result'])
+
+    def transact_put(self, key, fingerprint, result):
+        """Returns the TransactWriteItems action recording a key; it fails if the key is already recorded."""
+        return {
+            'Put': {
+                'TableName': self.table_name,
+                'Item': {
+                    'idempotency_key': key,
+                    'fingerprint': fingerprint,
+                    'result': dumps(result),
+                    'expires_at': int(time.time() + self.ttl_seconds)
+                },
+                'ConditionExpression': "attribute_not_exists(idempotency_key) OR expires_at <= :now",
+                'ExpressionAttributeValues': {':now': int(time.time())}
+            }
+        }
+
+
+def default_store():
+    """Picks the DynamoDB store when a table is configured, otherwise the in-memory store."""
+    if IDEMPOTENCY_TABLE_NAME:
+        return DynamoDBIdempotencyStore(IDEMPOTENCY_TABLE_NAME)
+    return MemoryIdempotencyStore()
+
+
+# Shared by all invocations served by this container
+idempotency_store = default_store()
@@ -0,0 +1,278 @@
+import os
+import threading
+import time
+from collections import defaultdict
+from decimal import Decimal
+from boto3.dynamodb.conditions import Key
+from boto3.dynamodb.types import TypeDeserializer
+from botocore.exceptions import ClientError
+import metrics
+from change_log import change_log
+from inventory_repository import dynamodb, iter_grocery_item_pages
+
+# Materialized aggregates, kept up to date by dynamodb_lambda from the inventory table's DynamoDB stream.
+# Without this table they are kept in memory, folded from the local change log (CHANGE_FEED=local) when read.
+AGGREGATES_TABLE_NAME = os.environ.get("AGGREGATES_TABLE_NAME")
+# Items at or below this quantity are in the low-stock set
+LOW_STOCK_THRESHOLD = Decimal(os.environ.get("LOW_STOCK_THRESHOLD", "0"))
+# Aggregate record keys: the inventory totals, one record per category and the low-stock set
+TOTALS_KEY = "totals"
+CATEGORY_KEY_PREFIX = "category#"
+LOW_STOCK_KEY = "low-stock"
+UNCATEGORIZED = "uncategorized"
+# Partitions of the aggregates table: the aggregate records, and each item's last applied stream record
+AGGREGATE_RECORD = "aggregate"
+APPLIED_RECORD = "applied"
+# Stream records are retained for 24 hours, so no redelivery can be older than an applied marker kept this long
+APPLIED_TTL_SECONDS = 48 * 3600
+# Stream sequence numbers are decimal strings of up to 40 digits; padded, they compare as strings
+SEQUENCE_NUMBER_DIGITS = 40
+
+deserializer = TypeDeserializer()
+
+
+def contribution(image):
+    """What an item adds to the aggregates: (category, quantity * unit_price, is low on stock), or None for no item."""
+    if not image:
+        return None
+    fields = {key: deserializer.deserialize(value) for key, value in image.items()}
+    quantity = Decimal(fields.get('quantity') or 0)
+    unit_price = Decimal(fields.get('unit_price') or 0)
+    return fields.get('category') or UNCATEGORIZED, quantity * unit_price, quantity <= LOW_STOCK_THRESHOLD
+
+
+def record_change(record):
+    """The aggregate changes one stream record makes, from its old and new images, in O(1).
+
+    Returns (item_id, {aggregate key: {counter: delta}}, whether the item was low on stock, whether it is).
+    """
+    change = record['dynamodb']
+    item_id = deserializer.deserialize(change['Keys']['item_id'])
+    old = contribution(change.get('OldImage'))
+    new = contribution(change.get('NewImage'))
+    counters = defaultdict(lambda: defaultdict(Decimal))
+    for sign, part in ((-1, old), (1, new)):
+        if part is not None:
+            category, value, _ = part
+            for key in (TOTALS_KEY, CATEGORY_KEY_PREFIX + category):
+                counters[key]['item_count'] += sign
+                counters[key]['total_value'] += sign * value
+    deltas = {}
+    for key, values in counters.items():
+        changed = {name: delta for name, delta in values.items() if delta}
+        if changed:
+            deltas[key] = changed
+    return item_id, deltas, old is not None and old[2], new is not None and new[2]
+
+
+def item_aggregates(items):
+    """Aggregates computed from scratch over full item records: ({key: counters}, low-stock item_ids)."""
+    records = defaultdict(lambda: {'item_count': Decimal(0), 'total_value': Decimal(0)})
+    low_stock = set()
+    for item in items:
+        quantity = Decimal(item.get('quantity') or 0)
+        value = quantity * Decimal(item.get('unit_price') or 0)
+        for key in (TOTALS_KEY, CATEGORY_KEY_PREFIX + (item.get('category') or UNCATEGORIZED)):
+            records[key]['item_count'] += 1
+            records[key]['total_value'] += value
+        if quantity <= LOW_STOCK_THRESHOLD:
+            low_stock.add(item['item_id'])
+    return dict(records), low_stock
+
+
+class MemoryAggregateStore:
+    """Aggregates held by this container, rebuilt by replaying the local change log from the start."""
+
+    def __init__(self):
+        self.records = {}
+        self.low_stock = set()
+
+    def apply(self, sequence_number, item_id, deltas, was_low, is_low):
+        for key, values in deltas.items():
+            record = self.records.setdefault(key, {})
+            for name, delta in values.items():
+                record[name] = record.get(name, 0) + delta
+        if is_low:
+            self.low_stock.add(item_id)
+        else:
+            self.low_stock.discard(item_id)
+
+    def snapshot(self):
+        return {key: dict(values) for key, values in self.records.items()}, set(self.low_stock)
+
+    def replace(self, records, low_stock):
+        self.records = {key: dict(values) for key, values in records.items()}
+        self.low_stock = set(low_stock)
+
+
+class DynamoDBAggregateStore:
+    """Aggregate records in a DynamoDB table: one per category, the totals and the low-stock string set,
+    under record_type "aggregate"; under "applied", the last stream record applied for each item."""
+
+    def __init__(self, table_name=AGGREGATES_TABLE_NAME):
+        self.table_name = table_name
+        self.table = dynamodb.Table(table_name)
+
+    def apply(self, sequence_number, item_id, deltas, was_low, is_low):
+        """Applies one change atomically, exactly once.
+
+        The stream delivers a record at least once, and an item's records in order. The transaction also
+        moves the item's applied marker to this record's sequence number, on condition that it is behind
+        it, so a redelivered record (however late) cancels the transaction instead of counting twice.
+        """
+        transact_items = [{
+            'Update': {
+                'TableName': self.table_name,
+                'Key': {'record_type': AGGREGATE_RECORD, 'aggregate_key': key},
+                'UpdateExpression': "ADD " + ", ".join(f"{name} :{name}" for name in values),
+                'ExpressionAttributeValues': {f":{name}": delta for name, delta in values.items()}
+            }
+        } for key, values in deltas.items()]
+        if is_low != was_low:
+            transact_items.append({
+                'Update': {
+                    'TableName': self.table_name,
+                    'Key': {'record_type': AGGREGATE_RECORD, 'aggregate_key': LOW_STOCK_KEY},
+                    'UpdateExpression': f"{'ADD' if is_low else 'DELETE'} item_ids :item_ids",
+                    'ExpressionAttributeValues': {':item_ids': {item_id}}
+                }
+            })
+        if not transact_items:
+            return
+        transact_items.append({
+            'Update': {
+                'TableName': self.table_name,
+                'Key': {'record_type': APPLIED_RECORD, 'aggregate_key': str(item_id)},
+                'UpdateExpression': "SET sequence_number = :sequence_number, expires_at = :expires_at",
+                'ConditionExpression': "attribute_not_exists(sequence_number) OR sequence_number < :sequence_number",
+                'ExpressionAttributeValues': {
+                    ':sequence_number': str(sequence_number).zfill(SEQUENCE_NUMBER_DIGITS),
+                    ':expires_at': int(time.time() + APPLIED_TTL_SECONDS)
+                }
+            }
+        })
+        try:
+            dynamodb.meta.client.transact_write_items(TransactItems=transact_items)
+        except ClientError as error:
+            reasons = error.response.get('CancellationReasons') or []
+            if len(reasons) == len(transact_items) and reasons[-1].get('Code') == 'ConditionalCheckFailed':
+                # Already applied
+                metrics.record('DuplicateChanges', 1)
+                return
+            raise
+
+    def snapshot(self):
+        records, low_stock = {}, set()
+        request = {'KeyConditionExpression': Key('record_type').eq(AGGREGATE_RECORD)}
+        while True:
+            page = self.table.query(**request)
+            for record in page.get('Items', []):
+                record.pop('record_type')
+                key = record.pop('aggregate_key')
+                if key == LOW_STOCK_KEY:
+                    low_stock = set(record.get('item_ids', ()))
+                else:
+                    records[key] = record
+            if 'LastEvaluatedKey' not in page:
+                return records, low_stock
+            request['ExclusiveStartKey'] = page['LastEvaluatedKey']
+
+    def replace(self, records, low_stock):
+        current, _ = self.snapshot()
+        with self.table.batch_writer() as batch:
+            for key in current.keys() - records.keys():
+                batch.delete_item(Key={'record_type': AGGREGATE_RECORD, 'aggregate_key': key})
+            for key, values in records.items():
+                batch.put_item(Item=dict(values, record_type=AGGREGATE_RECORD, aggregate_key=key))
+            if low_stock:
+                batch.put_item(Item={'record_type': AGGREGATE_RECORD, 'aggregate_key': LOW_STOCK_KEY, 'item_ids': set(low_stock)})
+            else:
+                batch.delete_item(Key={'record_type': AGGREGATE_RECORD, 'aggregate_key': LOW_STOCK_KEY})
+
+
+class InventoryAggregates:
+    """Per-category item counts and values, inventory totals and the low-stock set, maintained from the
+    change feed in O(1) per change instead of aggregating a full scan on every read."""
+
+    def __init__(self, store, log=None):
+        self.store = store
+        self.log = log
+        # Position in the local change log folded in so far
+        self.position = 0
+        self.lock = threading.Lock()
+
+    def apply(self, records):
+        """Applies stream records in order; returns the SequenceNumber of the first one that failed, or None."""
+        for record in records:
+            try:
+                item_id, deltas, was_low, is_low = record_change(record)
+                self.store.apply(record['dynamodb']['SequenceNumber'], item_id, deltas, was_low, is_low)
+            except Exception:
+                return record['dynamodb']['SequenceNumber']
+            metrics.record('AggregatedChanges', 1)
+        return None
+
+    def catch_up(self):
+        """Folds in the local change log records not applied yet."""
+        if self.log is None or not self.log.enabled:
+            return
+        with self.lock:
+            for record in self.log.read(self.position):
+                failed = self.apply([record])
+                if failed is not None:
+                    raise RuntimeError(f"Could not apply change log record {failed}")
+                self.position = int(record['dynamodb']['SequenceNumber'])
+
+    def read(self) -> dict:
+        """Returns the inventory aggregates: total item count and value, the same per category, and the
+        item_ids at or below the low-stock threshold."""
+        self.catch_up()
+        with metrics.span('AggregatesRead'):
+            records, low_stock = self.store.snapshot()
+        totals = records.get(TOTALS_KEY, {})
+        categories = {
+            key[len(CATEGORY_KEY_PREFIX):]: {'item_count': values.get('item_count', 0), 'total_value': values.get('total_value', 0)}
+            for key, values in sorted(records.items())
+            if key.startswith(CATEGORY_KEY_PREFIX) and values.get('item_count')
+        }
+        return {
+            'item_count': totals.get('item_count', 0),
+            'total_value': totals.get('total_value', 0),
+            'categories': categories,
+            'low_stock': sorted(low_stock),
+            'low_stock_threshold': LOW_STOCK_THRESHOLD
+        }
+
+    def rebuild(self) -> dict:
+        """Recomputes the aggregates from a full scan, e.g. after enabling the stream on a populated table.
+        Changes written while it runs may be counted twice or not at all, so run it when writes are quiet."""
+        with self.lock:
+            position = self.log.last_position() if self.log is not None and self.log.enabled else 0
+            records, low_stock = item_aggregates(item for page, _ in iter_grocery_item_pages() for item in page)
+            self.store.replace(records, low_stock)
+            self.position = position
+        return self.read()
+
+
+def is_stream_event(event):
+    return isinstance(event, dict) and bool(event.get('Records')) and event['Records'][0].get('eventSource') == 'aws:dynamodb'
+
+
+def consume_stream(event):
+    """Applies a DynamoDB stream batch; reports the first failed record so Lambda retries from there, in order."""
+    failed = inventory_aggregates.apply(event['Records'])
+    return {'batchItemFailures': [] if failed is None else [{'itemIdentifier': failed}]}
+
+
+# Shared by all invocations served by this container. The local change log only feeds in-memory
+# aggregates: this container replays it from the start, which a shared table must not see twice.
+if AGGREGATES_TABLE_NAME:
+    inventory_aggregates = InventoryAggregates(DynamoDBAggregateStore(AGGREGATES_TABLE_NAME))
+else:
+    inventory_aggregates = InventoryAggregates(MemoryAggregateStore(), change_log)
+
+# Lambda event fields passed to each action, in argument order
+AGGREGATE_ACTIONS = {
+    'get_inventory_aggregates': (inventory_aggregates.read, ()),
+    'rebuild_inventory_aggregates': (inventory_aggregates.rebuild, ()),
+}
@@ -0,0 +1,134 @@
+import re
+from functools import lru_cache
+
+# unit -> (dimension, factor to the dimension's base unit: grams, millilitres or pieces)
+UNITS = {
+    'mg': ('mass', 0.001), 'g': ('mass', 1.0), 'kg': ('mass', 1000.0),
+    'oz': ('mass', 28.349523125), 'lb': ('mass', 453.59237),
+    'ml': ('volume', 1.0), 'cl': ('volume', 10.0), 'dl': ('volume', 100.0), 'l': ('volume', 1000.0),
+    'fl oz': ('volume', 29.5735295625), 'cup': ('volume', 236.5882365), 'gal': ('volume', 3785.411784),
+    'pcs': ('count', 1.0), 'dozen': ('count', 12.0),
+}
+UNIT_ALIASES = {
+    'gram': 'g', 'grams': 'g', 'gr': 'g', 'kilogram': 'kg', 'kilograms': 'kg', 'kgs': 'kg',
+    'milligram': 'mg', 'milligrams': 'mg', 'ounce': 'oz', 'ounces': 'oz',
+    'lbs': 'lb', 'pound': 'lb', 'pounds': 'lb',
+    'millilitre': 'ml', 'millilitres': 'ml', 'milliliter': 'ml', 'milliliters': 'ml',
+    'litre': 'l', 'litres': 'l', 'liter': 'l', 'liters': 'l', 'ltr': 'l',
+    'cups': 'cup', 'gallon': 'gal', 'gallons': 'gal', 'floz': 'fl oz', 'fl. oz': 'fl oz',
+    'pc': 'pcs', 'piece': 'pcs', 'pieces': 'pcs', 'ea': 'pcs', 'each': 'pcs', 'ct': 'pcs', 'count': 'pcs',
+    'unit': 'pcs', 'units': 'pcs', '': 'pcs', 'dz': 'dozen',
+}
+NON_WORD = re.compile(r"[^\w%]+")
+
+
+@lru_cache(maxsize=256)
+def normalize_unit(unit):
+    """Maps a unit spelling onto a key of UNITS, or returns it lower-cased when it is unknown."""
+    unit = (unit or '').strip().lower().rstrip('.')
+    return UNIT_ALIASES.get(unit, unit)
+
+
+@lru_cache(maxsize=65536)
+def normalize_name(item_name):
+    """Lower-cases, drops punctuation and a plural "s", so "Tomatoes," and "tomato" share an index entry."""
+    words = NON_WORD.sub(" ", str(item_name).lower()).split()
+    if words:
+        last = words[-1]
+        if last.endswith('oes') and len(last) > 4:
+            words[-1] = last[:-2]
+        elif last.endswith('s') and not last.endswith('ss') and len(last) > 3:
+            words[-1] = last[:-1]
+    return " ".join(words)
+
+
+def index_key(item_name, unit):
+    """Index key of an item: its normalized name and unit dimension (unknown units only match themselves)."""
+    unit = normalize_unit(unit)
+    dimension = UNITS[unit][0] if unit in UNITS else unit
+    return normalize_name(item_name), dimension
+
+
+def unit_factor(unit):
+    """Size of one unit in its dimension's base unit; unknown units only ever meet themselves, so 1."""
+    unit = normalize_unit(unit)
+    return UNITS[unit][1] if unit in UNITS else 1.0
+
+
+def convert(amount, from_unit, to_unit):
+    """Converts an amount between two units of the same dimension."""
+    return amount * unit_factor(from_unit) / unit_factor(to_unit)
+
+
+def tidy(amount):
+    """Rounds away float noise from unit conversions; integral amounts come back as ints."""
+    amount = round(amount, 6)
+    return int(amount) if amount == int(amount) else amount
+
+
+class InventoryIndex:
+    """Dictionary index over inventory lots for linear-time consumption reconciliation.
+
+    Building the index is O(n) over the items and each consumed entry is resolved with one
+    dictionary lookup. Lots of the same item are ordered by expiration_date (FIFO, undated
+    lots last) only when that item is first consumed from, and each group keeps a pointer to
+    its first non-empty lot so exhausted lots are never revisited.
+    """
+
+    def __init__(self, items):
+        self.items = [dict(item) for item in items]
+        self.groups = {}
+        for item in self.items:
+            self.groups.setdefault(index_key(item['item_name'], item.get('unit')), [[], 0, False])[0].append(item)
+
+    def consume(self, consumed_item):
+        """Subtracts one consumed entry from the matching lots, earliest expiration first.
+
+        Returns None when fully applied, the consumed entry itself when no lot matches its name and
+        unit dimension, or a dict with the unmet 'shortfall' (in the consumed unit) otherwise.
+        """
+        group = self.groups.get(index_key(consumed_item['item_name'], consumed_item.get('unit')))
+        if group is None:
+            return consumed_item
+        lots, head, ordered = group
+        if not ordered:
+            lots.sort(key=lambda lot: (lot.get('expiration_date') is None, lot.get('expiration_date') or ''))
+            group[2] = True
+
+        # Work in the dimension's base unit (g, ml or pieces)
+        consumed_factor = unit_factor(consumed_item.get('unit'))
+        remaining = float(consumed_item['count']) * consumed_factor
+        while remaining > 1e-9 and head < len(lots):
+            lot = lots[head]
+            lot_factor = unit_factor(lot.get('unit'))
+            available = float(lot['count']) * lot_factor
+            if available <= remaining + 1e-9:
+                lot['count'] = 0
+                remaining -= available
+                head += 1
+            else:
+                lot['count'] = tidy((available - remaining) / lot_factor)
+                remaining = 0
+        group[1] = head
+
+        if remaining > 1e-9:
+            return {'item_name': consumed_item['item_name'], 'unit': consumed_item.get('unit'), 'shortfall': tidy(remaining / consumed_factor)}
+        return None
+
+
+def reconcile(items, consumed_items):
+    """Subtracts consumed items from the inventory in O(n + m).
+
+    Returns a dict with the updated 'items' (in their original order), the 'unresolved' consumed
+    entries whose name/unit matched no lot, and 'shortfalls' where more was consumed than was left.
+    """
+    index = InventoryIndex(items)
+    unresolved = []
+    shortfalls = []
+    for consumed_item in consumed_items:
+        outcome = index.consume(consumed_item)
+        if outcome is consumed_item:
+            unresolved.append(consumed_item)
+        elif outcome is not None:
+            shortfalls.append(outcome)
+    return {'items': index.items, 'unresolved': unresolved, 'shortfalls': shortfalls}
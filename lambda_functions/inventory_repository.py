@@ -0,0 +1,990 @@
+import json
+import base64
+import heapq
+import math
+import boto3
+from boto3.dynamodb.conditions import Attr, Key
+from boto3.dynamodb.types import TypeDeserializer
+from botocore.config import Config
+from botocore.exceptions import ClientError
+from datetime import date, timedelta
+from decimal import Decimal
+from functools import partial, wraps
+import os
+import random
+import time
+import metrics
+from json_encoding import dumps
+from change_log import change_log
+from idempotency import idempotency_store, request_fingerprint
+from item_cache import item_cache
+from update_expression import RETURN_VALUES, UpdateExpression
+
+# Connection settings shared by every entry point (the Lambda API and the agent tools)
+DYNAMODB_CONNECT_TIMEOUT_SECONDS = float(os.environ.get("DYNAMODB_CONNECT_TIMEOUT_SECONDS", "2"))
+DYNAMODB_READ_TIMEOUT_SECONDS = float(os.environ.get("DYNAMODB_READ_TIMEOUT_SECONDS", "5"))
+DYNAMODB_MAX_ATTEMPTS = int(os.environ.get("DYNAMODB_MAX_ATTEMPTS", "3"))
+DYNAMODB_MAX_POOL_CONNECTIONS = int(os.environ.get("DYNAMODB_MAX_POOL_CONNECTIONS", "10"))
+
+# Load necessary tools
+dynamodb = boto3.resource(
+    'dynamodb',
+    region_name=os.environ.get("AWS_REGION"),
+    config=Config(
+        connect_timeout=DYNAMODB_CONNECT_TIMEOUT_SECONDS,
+        read_timeout=DYNAMODB_READ_TIMEOUT_SECONDS,
+        retries={'max_attempts': DYNAMODB_MAX_ATTEMPTS, 'mode': 'standard'},
+        max_pool_connections=DYNAMODB_MAX_POOL_CONNECTIONS
+    )
+)
+table_name = os.environ.get("DYNAMODB_TABLE_NAME")
+table = dynamodb.Table(table_name)
+metrics.instrument_dynamodb(dynamodb.meta.client)
+# Cancellation reasons in transaction errors carry items in the low-level wire format
+deserializer = TypeDeserializer()
+
+# Secondary indexes (see terraform/main.tf). Items that carry an expiration_date are also
+# written with expiry_partition so the sparse expiration index can range-query them by date.
+category_index_name = os.environ.get("CATEGORY_INDEX_NAME", "category-index")
+expiration_index_name = os.environ.get("EXPIRATION_INDEX_NAME", "expiration-index")
+EXPIRY_PARTITION = "inventory"
+
+# Indexes found missing on this table; their lookups fall back to scans for the rest of the container's life
+missing_indexes = set()
+
+# DynamoDB service limits per BatchWriteItem / BatchGetItem request
+BATCH_WRITE_SIZE = 25
+BATCH_GET_SIZE = 100
+BATCH_MAX_RETRIES = int(os.environ.get("BATCH_MAX_RETRIES", "5"))
+BACKOFF_BASE_SECONDS = 0.05
+BACKOFF_MAX_SECONDS = 2.0
+# Maximum number of actions in one TransactWriteItems request
+TRANSACT_MAX_ITEMS = int(os.environ.get("TRANSACT_MAX_ITEMS", "100"))
+# Cancellation reasons that are safe to retry as-is
+RETRYABLE_CANCELLATION_CODES = {'TransactionConflict', 'ThrottlingError', 'ProvisionedThroughputExceeded'}
+REQUIRED_FIELDS_MESSAGE = "Required fields ('item_id', 'name', 'category', 'quantity', 'unit_price') cannot be empty."
+
+
+class RepositoryError(Exception):
+    """An operation failed; status_code is the HTTP status the Lambda adapters answer with."""
+    status_code = 500
+
+
+class InvalidRequest(RepositoryError):
+    status_code = 400
+
+
+class ItemNotFound(RepositoryError):
+    status_code = 404
+
+
+class ConflictError(RepositoryError):
+    """A conditional write lost to another writer, or an idempotency key was reused for a different request."""
+    status_code = 409
+
+
+class ConditionFailed(Exception):
+    """A write's condition did not hold; `item` is the stored item at the time, or None when there was none."""
+
+    def __init__(self, item):
+        super().__init__("The conditional request failed")
+        self.item = item
+
+
+class GroceryItem:
+    """Typed inventory record. Known attributes live in slots; anything else a caller stored is kept in `extra`."""
+
+    __slots__ = ('item_id', 'name', 'category', 'quantity', 'unit_price', 'expiration_date', 'version', 'extra')
+    REQUIRED_FIELDS = ('item_id', 'name', 'category', 'quantity', 'unit_price')
+
+    def __init__(self, item_id, name, category, quantity, unit_price, expiration_date=None, version=None, extra=None):
+        self.item_id = item_id
+        self.name = name
+        self.category = category
+        self.quantity = quantity
+        self.unit_price = unit_price
+        self.expiration_date = expiration_date
+        # Incremented by every write; None for items written before versioning
+        self.version = version
+        self.extra = extra or {}
+
+    @classmethod
+    def from_dict(cls, details):
+        """Validates caller-supplied item details; raises InvalidRequest when they are incomplete or malformed."""
+        if not isinstance(details, dict) or any(details.get(key) is None or details.get(key) == '' for key in cls.REQUIRED_FIELDS):
+            raise InvalidRequest(REQUIRED_FIELDS_MESSAGE)
+        try:
+            quantity = Decimal(str(details['quantity']))
+            unit_price = Decimal(str(details['unit_price']))
+        except ArithmeticError:
+            raise InvalidRequest("quantity and unit_price must be numbers.")
+        extra = {key: value for key, value in details.items() if key not in cls.__slots__ and key != 'expiry_partition'}
+        return cls(details['item_id'], details['name'], details['category'], quantity, unit_price,
+                   details.get('expiration_date') or None, extra=extra)
+
+    @classmethod
+    def from_record(cls, record):
+        """Wraps an item as stored in DynamoDB, without validation."""
+        extra = {key: value for key, value in record.items() if key not in cls.__slots__ and key != 'expiry_partition'}
+        return cls(record.get('item_id'), record.get('name'), record.get('category'), record.get('quantity'),
+                   record.get('unit_price'), record.get('expiration_date'), record.get('version'), extra)
+
+    def to_record(self):
+        """Returns the item as written to DynamoDB."""
+        record = dict(self.extra)
+        record.update(item_id=self.item_id, name=self.name, category=self.category,
+                      quantity=self.quantity, unit_price=self.unit_price)
+        # Items with an expiration date are indexed for expiring-before range lookups
+        if self.expiration_date:
+            record['expiration_date'] = self.expiration_date
+            record['expiry_partition'] = EXPIRY_PARTITION
+        if self.version is not None:
+            record['version'] = self.version
+        return record
+
+    def to_dict(self):
+        """Returns the item as shown to callers, known fields first."""
+        item = {'item_id': self.item_id, 'name': self.name, 'category': self.category,
+                'quantity': self.quantity, 'unit_price': self.unit_price}
+        if self.expiration_date:
+            item['expiration_date'] = self.expiration_date
+        if self.version is not None:
+            item['version'] = self.version
+        item.update(self.extra)
+        return item
+
+
+def operation(description):
+    """Reports unexpected failures of a repository operation as a RepositoryError naming the operation."""
+    def decorate(function):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            try:
+                return function(*args, **kwargs)
+            except RepositoryError:
+                raise
+            except ClientError as e:
+                # DynamoDB refused the request itself (wrong key types, an empty index key, ADD of a
+                # non-number...): that is the caller's input, not a server failure
+                if e.response.get('Error', {}).get('Code') == 'ValidationException':
+                    raise InvalidRequest(f"Invalid request {description}: {e.response['Error'].get('Message', str(e))}") from e
+                raise RepositoryError(f"Error {description}: {str(e)}") from e
+            except Exception as e:
+                raise RepositoryError(f"Error {description}: {str(e)}") from e
+        return wrapper
+    return decorate
+
+
+def render_records(records):
+    """Converts stored records into the item dicts shown to callers."""
+    return [GroceryItem.from_record(record).to_dict() for record in records]
+
+
+def encode_cursor(last_evaluated_key):
+    """Encodes a DynamoDB LastEvaluatedKey as an opaque continuation token."""
+    if not last_evaluated_key:
+        return None
+    raw = dumps(last_evaluated_key)
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor):
+    """Decodes a continuation token produced by encode_cursor back into an ExclusiveStartKey."""
+    raw = base64.urlsafe_b64decode(cursor.encode('ascii'))
+    key = json.loads(raw, parse_float=Decimal, parse_int=Decimal)
+    if not isinstance(key, dict):
+        raise ValueError("cursor does not encode a key")
+    return key
+
+
+def parse_limit(limit):
+    """Validates a page size, accepting ints or digit strings (as sent by API Gateway)."""
+    if limit is None:
+        return None
+    if isinstance(limit, bool):
+        raise ValueError("limit must be a positive integer")
+    limit = int(limit)
+    if limit < 1:
+        raise ValueError("limit must be a positive integer")
+    return limit
+
+
+def parse_json_details(details, what):
+    """Decodes a JSON object argument, accepting an already decoded dict as sent directly in the Lambda event."""
+    if isinstance(details, dict):
+        return details
+    try:
+        return json.loads(details)
+    except (TypeError, ValueError):
+        raise InvalidRequest(f"Invalid JSON format. Please provide {what} in JSON format.")
+
+
+def iter_pages(operation, request_kwargs, page_size=None, start_key=None):
+    """Lazily walks a scan or query one DynamoDB page at a time.
+
+    Yields ``(items, last_evaluated_key)`` tuples and only requests the next page
+    when the caller asks for it, so memory stays bounded by a single page.
+    """
+    request_kwargs = dict(request_kwargs)
+    if page_size:
+        request_kwargs['Limit'] = page_size
+    if start_key:
+        request_kwargs['ExclusiveStartKey'] = start_key
+
+    while True:
+        response = operation(**request_kwargs)
+        last_evaluated_key = response.get('LastEvaluatedKey')
+        yield response.get('Items', []), last_evaluated_key
+        if not last_evaluated_key:
+            return
+        request_kwargs['ExclusiveStartKey'] = last_evaluated_key
+
+
+def is_missing_index_error(error):
+    """Returns True when a ClientError reports that the requested secondary index does not exist."""
+    details = error.response.get('Error', {})
+    return (details.get('Code') in ('ValidationException', 'ResourceNotFoundException')
+            and 'index' in details.get('Message', '').lower())
+
+
+def is_condition_failure(error):
+    return error.response.get('Error', {}).get('Code') == 'ConditionalCheckFailedException'
+
+
+def iter_index_pages(index_name, query_kwargs, scan_filter, page_size=None, start_key=None):
+    """Queries a secondary index page by page, falling back to a filtered scan when the index is absent."""
+    if index_name not in missing_indexes:
+        try:
+            yield from iter_pages(table.query, dict(query_kwargs, IndexName=index_name), page_size, start_key)
+            return
+        except ClientError as e:
+            if not is_missing_index_error(e):
+                raise
+            missing_indexes.add(index_name)
+
+    # Index cursors also carry the index keys, which the base table rejects as an ExclusiveStartKey
+    if start_key and 'item_id' in start_key:
+        start_key = {'item_id': start_key['item_id']}
+    # A scan's Limit caps the items read rather than those that pass the filter, so it would take many
+    # round trips to fill a page; the scan reads full pages and they are cut to page_size instead
+    for items, last_evaluated_key in iter_pages(table.scan, {'FilterExpression': scan_filter}, start_key=start_key):
+        while page_size and len(items) > page_size:
+            yield items[:page_size], {'item_id': items[page_size - 1]['item_id']}
+            items = items[page_size:]
+        yield items, last_evaluated_key
+
+
+def iter_grocery_item_pages(category=None, page_size=None, start_key=None):
+    """Lazily walks the inventory page by page, using the category index when filtering by category."""
+    if not category:
+        return iter_pages(table.scan, {}, page_size, start_key)
+    return iter_index_pages(
+        category_index_name,
+        {'KeyConditionExpression': Key('category').eq(category)},
+        Attr('category').eq(category),
+        page_size,
+        start_key
+    )
+
+
+def iter_expiring_item_pages(expiring_before, category=None, page_size=None, start_key=None):
+    """Lazily walks items expiring strictly before the given ISO date via the expiration index (soonest first)."""
+    query_kwargs = {
+        'KeyConditionExpression': Key('expiry_partition').eq(EXPIRY_PARTITION) & Key('expiration_date').lt(expiring_before)
+    }
+    scan_filter = Attr('expiration_date').lt(expiring_before)
+    if category:
+        query_kwargs['FilterExpression'] = Attr('category').eq(category)
+        scan_filter = scan_filter & Attr('category').eq(category)
+    return iter_index_pages(expiration_index_name, query_kwargs, scan_filter, page_size, start_key)
+
+
+def render_item_listing(iter_item_pages, limit=None, cursor=None):
+    """Returns the full listing, or a single page with its next_cursor when a limit or cursor is given."""
+    try:
+        limit = parse_limit(limit)
+    except (ValueError, TypeError):
+        raise InvalidRequest("limit must be a positive integer.")
+
+    if limit is None and not cursor:
+        items = [item for page, _ in iter_item_pages() for item in render_records(page)]
+        if items:
+            return items
+        else:
+            return "No grocery items found."
+
+    try:
+        start_key = decode_cursor(cursor) if cursor else None
+    except (ValueError, TypeError):
+        raise InvalidRequest("Invalid cursor.")
+    items, last_evaluated_key = next(iter_item_pages(limit, start_key))
+    return {
+        'items': render_records(items),
+        'next_cursor': encode_cursor(last_evaluated_key)
+    }
+
+
+def log_change(item_id, new_image=None, removed=False):
+    """Appends a write to the local change log, when it stands in for the table's DynamoDB stream.
+
+    Writes that returned no new image (transactions, other ReturnValues) have the item read back.
+    """
+    if not change_log.enabled:
+        return
+    if new_image is None and not removed:
+        new_image = table.get_item(Key={'item_id': item_id}, ConsistentRead=True).get('Item')
+    change_log.append(item_id, new_image)
+
+
+def deserialize_item(item):
+    """Converts an item in the low-level wire format, as found in condition-failure errors."""
+    return {key: deserializer.deserialize(value) for key, value in item.items()}
+
+
+def recorded_result(idempotency_key, fingerprint):
+    """Returns the result of an earlier request made with this idempotency key, or None if there was none."""
+    recorded = idempotency_store.get(idempotency_key)
+    if recorded is None:
+        return None
+    if recorded[0] != fingerprint:
+        raise ConflictError(f"idempotency_key '{idempotency_key}' was already used for a different request.")
+    return recorded[1]
+
+
+def write_item(kind, request, describe, idempotency_key=None, fingerprint=None):
+    """Sends one conditional 'Put' or 'Update' (`request` holds the put_item/update_item arguments).
+
+    describe(attributes) builds the caller's result from the attributes the write returned (ALL_NEW unless
+    the request asks for other ReturnValues; None when it returns none).
+    With an idempotency key, a retry of an applied request gets the earlier result back without a second
+    write, and a first request records its result in the same transaction as the write when the dedup
+    store is a DynamoDB table. Returns (result, new image or None); raises ConditionFailed.
+    """
+    if idempotency_key:
+        replayed = recorded_result(idempotency_key, fingerprint)
+        if replayed is not None:
+            return replayed, None
+
+    request = dict(request, ReturnValuesOnConditionCheckFailure='ALL_OLD')
+    if idempotency_key and idempotency_store.transactional:
+        result = describe(None)
+        try:
+            # Transactions return no values, so ReturnValues is not sent
+            action = {key: value for key, value in request.items() if key != 'ReturnValues'}
+            dynamodb.meta.client.transact_write_items(TransactItems=[
+                {kind: dict(action, TableName=table_name)},
+                idempotency_store.transact_put(idempotency_key, fingerprint, result)
+            ])
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') != 'TransactionCanceledException':
+                raise
+            reasons = e.response.get('CancellationReasons', [])
+            if len(reasons) > 1 and reasons[1].get('Code') == 'ConditionalCheckFailed':
+                # A concurrent retry with the same key committed first
+                return recorded_result(idempotency_key, fingerprint), None
+            if reasons and reasons[0].get('Code') == 'ConditionalCheckFailed':
+                current = reasons[0].get('Item')
+                raise ConditionFailed(deserialize_item(current) if current else None)
+            raise
+        return result, request['Item'] if kind == 'Put' else None
+
+    try:
+        if kind == 'Put':
+            table.put_item(**request)
+            attributes = new_image = request['Item']
+        else:
+            return_values = request.get('ReturnValues', 'ALL_NEW')
+            attributes = table.update_item(**dict(request, ReturnValues=return_values)).get('Attributes')
+            new_image = attributes if return_values == 'ALL_NEW' else None
+    except ClientError as e:
+        if not is_condition_failure(e):
+            raise
+        current = e.response.get('Item')
+        raise ConditionFailed(deserialize_item(current) if current else None)
+    result = describe(attributes)
+    if idempotency_key:
+        idempotency_store.save(idempotency_key, fingerprint, result)
+    return result, new_image
+
+
+def require_version(expression, expected_version):
+    """Conditions an update on the item's version; items written before versioning count as version 0."""
+    if expected_version is None:
+        return
+    if isinstance(expected_version, bool) or not isinstance(expected_version, int) or expected_version < 0:
+        raise InvalidRequest("expected_version must be a non-negative integer.")
+    if expected_version == 0:
+        expression.condition('version', 'attribute_not_exists')
+    else:
+        expression.condition('version', '=', expected_version)
+
+
+def version_conflict(item_id, failure, expected_version):
+    """Maps a failed conditional write of an existing item onto the matching error."""
+    if failure.item is None:
+        return ItemNotFound(f"Grocery item with item_id '{item_id}' not found.")
+    current_version = failure.item.get('version', 0)
+    if expected_version is not None and current_version != expected_version:
+        return ConflictError(f"Grocery item with item_id '{item_id}' is at version {current_version}, "
+                             f"not the expected version {expected_version}.")
+    return ConflictError(f"The update's conditions do not hold for grocery item with item_id '{item_id}'.")
+
+
+def new_version_note(new_image, expected_version):
+    """Tells callers the version to pass as expected_version next time, when it is known."""
+    if new_image and 'version' in new_image:
+        return f" New version: {new_image['version']}."
+    if expected_version is not None:
+        return f" New version: {expected_version + 1}."
+    return ""
+
+
+@operation("adding grocery item")
+def add_grocery_item(item_details, idempotency_key: str = None) -> str:
+    """Adds a new grocery item to the inventory. Provide the item details in JSON format.
+    An item_id that already exists is refused; include an idempotency_key to make retries safe."""
+    details = parse_json_details(item_details, "item details")
+    if isinstance(details, dict):
+        details = dict(details)
+        idempotency_key = details.pop('idempotency_key', idempotency_key)
+    item = GroceryItem.from_dict(details)
+    item.version = 1
+
+    # Use the item_id as the primary key; adds never overwrite an existing item
+    try:
+        result, new_image = write_item(
+            'Put',
+            {'Item': item.to_record(), 'ConditionExpression': "attribute_not_exists(item_id)"},
+            lambda new_image: f"Successfully added grocery item: {item.name}",
+            idempotency_key,
+            request_fingerprint('add_grocery_item', details)
+        )
+    except ConditionFailed:
+        raise ConflictError(f"Grocery item with item_id '{item.item_id}' already exists.")
+    item_cache.written(item.item_id, new_image)
+    log_change(item.item_id, new_image)
+
+    return result
+
+
+# Keys of an item update that are not attribute values to SET
+UPDATE_OPERATIONS = ('$add', '$remove', '$if_not_exists', '$append', '$conditions', '$return_values')
+# Attributes only the repository writes
+PROTECTED_ATTRIBUTES = {'item_id', 'version', 'expiry_partition'}
+
+
+def build_item_update(update, expected_version):
+    """Turns an item update into UpdateItem arguments; raises InvalidRequest when it is malformed.
+
+    Plain fields are SET (dotted paths such as "nutrition.calories" update nested values). "$add" maps
+    paths to numbers to add, "$remove" lists paths to remove, "$if_not_exists" maps paths to values set
+    only when absent, "$append" maps list paths to values to append, and "$conditions" lists
+    [path, operator, value] requirements. Every update also bumps the item's version.
+    """
+    expression = UpdateExpression()
+    try:
+        for key, value in update.items():
+            # A falsy expiration_date clears the date (below): the index key cannot be NULL or empty
+            if key != 'item_id' and key not in UPDATE_OPERATIONS and not (key == 'expiration_date' and not value):
+                expression.set(key, value)
+        for path, value in dict(update.get('$add') or {}).items():
+            expression.add(path, value)
+        for path, value in dict(update.get('$if_not_exists') or {}).items():
+            expression.set_if_not_exists(path, value)
+        for path, values in dict(update.get('$append') or {}).items():
+            expression.append(path, values if isinstance(values, list) else [values])
+        for path in list(update.get('$remove') or []):
+            expression.remove(path)
+
+        if any(path.split('.')[0].split('[')[0] in PROTECTED_ATTRIBUTES for path in expression.paths):
+            raise InvalidRequest("item_id, version and expiry_partition are maintained by the inventory; "
+                                 "pass expected_version to update conditionally.")
+
+        # Keep the item in the sparse expiration index exactly while it has an expiration date
+        if 'expiration_date' in update:
+            if update['expiration_date']:
+                expression.set('expiry_partition', EXPIRY_PARTITION)
+            else:
+                expression.remove('expiration_date')
+                expression.remove('expiry_partition')
+        elif 'expiration_date' in expression.paths:
+            expression.remove('expiry_partition')
+        if not expression:
+            raise InvalidRequest("No updates provided for the item.")
+
+        # Every write bumps the version; updates never create items
+        expression.add('version', 1)
+        expression.condition('item_id', 'attribute_exists')
+        require_version(expression, expected_version)
+        for condition in list(update.get('$conditions') or []):
+            expression.condition(*condition)
+    except (TypeError, ValueError) as e:
+        raise InvalidRequest(f"Invalid item update: {str(e)}")
+
+    request = dict(expression.build(), Key={'item_id': update['item_id']})
+    return_values = update.get('$return_values')
+    if return_values is not None:
+        if return_values not in RETURN_VALUES:
+            raise InvalidRequest(f"$return_values must be one of {', '.join(sorted(RETURN_VALUES))}.")
+        request['ReturnValues'] = return_values
+    return request
+
+
+@operation("updating grocery item")
+def update_grocery_item(item_update, expected_version: int = None, idempotency_key: str = None):
+    """Updates the details of an existing grocery item in the inventory in one atomic call. Provide the item update in JSON format.
+    Fields are set; "$add", "$remove", "$if_not_exists", "$append" and "$conditions" express other changes and
+    requirements, and "$return_values" returns the item's attributes. Include expected_version to apply the
+    update only if nobody changed the item since, and an idempotency_key to make retries safe."""
+    update = parse_json_details(item_update, "the item update")
+    item_id = update.get('item_id') if isinstance(update, dict) else None
+
+    if not item_id:
+        raise InvalidRequest("item_id is required to update an item.")
+    update = dict(update)
+    expected_version = update.pop('expected_version', expected_version)
+    idempotency_key = update.pop('idempotency_key', idempotency_key)
+    request = build_item_update(update, expected_version)
+    return_values = update.get('$return_values')
+
+    def describe(attributes):
+        # Only *_NEW return values carry the new version
+        new_values = attributes if return_values in (None, 'ALL_NEW', 'UPDATED_NEW') else None
+        message = f"Successfully updated grocery item with item_id: {item_id}.{new_version_note(new_values, expected_version)}"
+        if return_values is None:
+            return message
+        returned = {key: value for key, value in (attributes or {}).items() if key != 'expiry_partition'}
+        return {'message': message, 'attributes': returned}
+
+    # Update the item in DynamoDB
+    try:
+        result, new_image = write_item(
+            'Update',
+            request,
+            describe,
+            idempotency_key,
+            request_fingerprint('update_grocery_item', [update, expected_version])
+        )
+    except ConditionFailed as failure:
+        raise version_conflict(item_id, failure, expected_version)
+    item_cache.written(item_id, new_image)
+    log_change(item_id, new_image)
+
+    return result
+
+
+@operation("removing grocery item")
+def remove_grocery_item(item_id: str) -> str:
+    """Removes a grocery item from the inventory based on its item_id."""
+    if not item_id:
+        raise InvalidRequest("item_id is required to remove an item.")
+
+    # Delete the item from DynamoDB
+    table.delete_item(Key={'item_id': item_id})
+    item_cache.invalidate(item_id)
+    log_change(item_id, removed=True)
+
+    return f"Successfully removed grocery item with item_id: {item_id}"
+
+
+def load_record(item_id):
+    return table.get_item(Key={'item_id': item_id}).get('Item')
+
+
+@operation("retrieving grocery item details")
+def get_grocery_item_details(item_id: str) -> dict:
+    """Retrieves the details of a specific grocery item from the inventory based on its item_id."""
+    if not item_id:
+        raise InvalidRequest("item_id is required to retrieve item details.")
+
+    # Retrieve the item from DynamoDB, or from this container's item cache when it is enabled
+    record = item_cache.load(item_id, load_record)
+
+    if record is None:
+        raise ItemNotFound(f"Grocery item with item_id '{item_id}' not found.")
+    return GroceryItem.from_record(record).to_dict()
+
+
+@operation("listing grocery items")
+def list_all_grocery_items(category: str = None, limit: int = None, cursor: str = None):
+    """Lists all grocery items in the inventory. Optionally, filter by category.
+    Pass a limit and/or the next_cursor of a previous page to list the inventory one page at a time."""
+    return render_item_listing(partial(iter_grocery_item_pages, category), limit, cursor)
+
+
+@operation("listing expiring grocery items")
+def list_expiring_grocery_items(expiring_before: str, category: str = None, limit: int = None, cursor: str = None):
+    """Lists grocery items expiring before a date (YYYY-MM-DD), soonest first. Optionally, filter by category.
+    Pass a limit and/or the next_cursor of a previous page to list the items one page at a time."""
+    try:
+        date.fromisoformat(str(expiring_before)[:10])
+    except ValueError:
+        raise InvalidRequest("expiring_before must be a date in YYYY-MM-DD format.")
+
+    return render_item_listing(partial(iter_expiring_item_pages, expiring_before, category), limit, cursor)
+
+
+@operation("listing items expiring soon")
+def items_expiring_within(days: int, limit: int = 10, today: str = None):
+    """Lists up to `limit` in-stock grocery items expiring within the next `days` days (already expired ones included), soonest first."""
+    try:
+        days = int(days)
+        limit = parse_limit(limit) or 10
+        today = date.fromisoformat(str(today)[:10]) if today else date.today()
+    except (ValueError, TypeError):
+        raise InvalidRequest("days and limit must be integers and today a date in YYYY-MM-DD format.")
+
+    cutoff = (today + timedelta(days=days)).isoformat()
+    # The expiration index returns items in date order, so reading stops after the first `limit` matches
+    pages = iter_index_pages(
+        expiration_index_name,
+        {
+            'KeyConditionExpression': Key('expiry_partition').eq(EXPIRY_PARTITION) & Key('expiration_date').lte(cutoff),
+            'FilterExpression': Attr('quantity').gt(0)
+        },
+        Attr('expiration_date').lte(cutoff) & Attr('quantity').gt(0),
+        page_size=limit
+    )
+    items = []
+    for page, _ in pages:
+        items.extend(page)
+        if len(items) >= limit and expiration_index_name not in missing_indexes:
+            break
+    # The scan fallback returns items in no particular order
+    items = heapq.nsmallest(limit, items, key=lambda item: item['expiration_date'])
+    if not items:
+        return f"No grocery items expire within {days} days."
+    return render_records(items)
+
+
+@operation("adjusting inventory quantity")
+def adjust_inventory_quantity(item_id: str, quantity_change: int, expected_version: int = None, idempotency_key: str = None) -> str:
+    """Adjusts the inventory quantity of a grocery item. Provide the item_id and the quantity_change (positive or negative).
+    Include expected_version to apply the change only if nobody changed the item since, and an idempotency_key
+    so a retried request is not applied twice."""
+    if not item_id or isinstance(quantity_change, bool) or not isinstance(quantity_change, int):
+        raise InvalidRequest("item_id and quantity_change (integer) are required.")
+
+    expression = UpdateExpression().add('quantity', quantity_change).add('version', 1).condition('item_id', 'attribute_exists')
+    require_version(expression, expected_version)
+
+    def describe(new_image):
+        if new_image is None:
+            return f"Successfully adjusted inventory quantity for item_id: {item_id} by {quantity_change}.{new_version_note(new_image, expected_version)}"
+        return (f"Successfully adjusted inventory quantity for item_id: {item_id}. New quantity: {new_image['quantity']}."
+                f"{new_version_note(new_image, expected_version)}")
+
+    # Update the item in DynamoDB
+    try:
+        result, new_image = write_item(
+            'Update',
+            dict(expression.build(), Key={'item_id': item_id}),
+            describe,
+            idempotency_key,
+            request_fingerprint('adjust_inventory_quantity', [item_id, quantity_change, expected_version])
+        )
+    except ConditionFailed as failure:
+        raise version_conflict(item_id, failure, expected_version)
+    item_cache.written(item_id, new_image)
+    log_change(item_id, new_image)
+
+    return result
+
+
+def backoff_sleep(attempt):
+    """Sleeps before retry number `attempt`, using capped exponential backoff with full jitter."""
+    time.sleep(random.uniform(0, min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * (2 ** attempt))))
+
+
+def chunked(values, size):
+    """Yields consecutive slices of at most `size` values."""
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def parse_batch_input(value, error_message):
+    """Accepts a JSON array string or an already decoded list, as sent directly in the Lambda event."""
+    try:
+        if isinstance(value, str):
+            value = json.loads(value)
+    except ValueError:
+        raise InvalidRequest(error_message)
+    if not isinstance(value, list):
+        raise InvalidRequest(error_message)
+    return value
+
+
+def batch_write(write_requests):
+    """Sends write requests in chunks of 25, retrying UnprocessedItems with backoff.
+
+    Returns the item_ids whose requests were still unprocessed after the last retry.
+    """
+    unprocessed_ids = set()
+    for chunk in chunked(write_requests, BATCH_WRITE_SIZE):
+        pending = chunk
+        for attempt in range(BATCH_MAX_RETRIES + 1):
+            if attempt:
+                backoff_sleep(attempt)
+            response = dynamodb.batch_write_item(RequestItems={table_name: pending})
+            pending = response.get('UnprocessedItems', {}).get(table_name, [])
+            if not pending:
+                break
+        for request in pending:
+            if 'PutRequest' in request:
+                unprocessed_ids.add(request['PutRequest']['Item']['item_id'])
+            else:
+                unprocessed_ids.add(request['DeleteRequest']['Key']['item_id'])
+    return unprocessed_ids
+
+
+def batch_get(item_ids):
+    """Reads items in chunks of 100 keys, retrying UnprocessedKeys with backoff.
+
+    Returns a dict of the items found by item_id, and the item_ids that were still unprocessed.
+    """
+    found = {}
+    unprocessed_ids = set()
+    for chunk in chunked(item_ids, BATCH_GET_SIZE):
+        pending = {'Keys': [{'item_id': item_id} for item_id in chunk]}
+        for attempt in range(BATCH_MAX_RETRIES + 1):
+            if attempt:
+                backoff_sleep(attempt)
+            response = dynamodb.batch_get_item(RequestItems={table_name: pending})
+            for item in response.get('Responses', {}).get(table_name, []):
+                found[item['item_id']] = item
+            pending = response.get('UnprocessedKeys', {}).get(table_name)
+            if not pending or not pending.get('Keys'):
+                pending = None
+                break
+        if pending:
+            unprocessed_ids.update(key['item_id'] for key in pending['Keys'])
+    return found, unprocessed_ids
+
+
+@operation("adding grocery items")
+def add_grocery_items(items_details) -> dict:
+    """Adds several grocery items in batched writes. Provide a JSON array of item details; returns a result per item.
+
+    As with add_grocery_item, an item_id that already exists is refused (status 'conflict'); use
+    update_grocery_item or adjust_inventory_quantity to change it. BatchWriteItem cannot be conditional,
+    so the ids are looked up with BatchGetItem first; an item created by another writer between the
+    read and the write can still be replaced.
+    """
+    items = parse_batch_input(items_details, "Invalid JSON format. Please provide a JSON array of item details.")
+
+    results = []
+    write_requests = {}
+    pending_positions = {}
+    for details in items:
+        item_id = details.get('item_id') if isinstance(details, dict) else None
+        try:
+            item = GroceryItem.from_dict(details)
+            item.version = 1
+        except InvalidRequest as e:
+            results.append({'item_id': item_id, 'status': 'invalid', 'error': str(e)})
+            continue
+        # A batch may not contain the same key twice; the last occurrence wins
+        if item_id in write_requests:
+            results[pending_positions[item_id]].update(status='skipped', error='Replaced by a later entry with the same item_id.')
+        write_requests[item_id] = {'PutRequest': {'Item': item.to_record()}}
+        pending_positions[item_id] = len(results)
+        results.append({'item_id': item_id, 'status': 'pending'})
+
+    # Only ids that are known not to exist are written, so an existing item's version never goes back to 1
+    existing, unchecked_ids = batch_get(list(write_requests))
+    for item_id in existing.keys() | unchecked_ids:
+        del write_requests[item_id]
+
+    unprocessed_ids = batch_write(list(write_requests.values()))
+    for result in results:
+        if result['status'] == 'pending':
+            if result['item_id'] in existing:
+                result.update(status='conflict', error=f"Grocery item with item_id '{result['item_id']}' already exists.")
+            elif result['item_id'] in unchecked_ids:
+                result.update(status='failed', error='Could not check for an existing item after retries.')
+            elif result['item_id'] in unprocessed_ids:
+                result.update(status='failed', error='Unprocessed after retries.')
+            else:
+                result['status'] = 'added'
+                item_cache.written(result['item_id'], write_requests[result['item_id']]['PutRequest']['Item'])
+                log_change(result['item_id'], write_requests[result['item_id']]['PutRequest']['Item'])
+
+    return {'results': results}
+
+
+@operation("removing grocery items")
+def remove_grocery_items(item_ids) -> dict:
+    """Removes several grocery items in batched deletes. Provide a list of item_ids; returns a result per item."""
+    item_ids = parse_batch_input(item_ids, "item_ids must be a list of item_id values.")
+
+    unique_ids = list(dict.fromkeys(item_id for item_id in item_ids if item_id))
+    unprocessed_ids = batch_write([{'DeleteRequest': {'Key': {'item_id': item_id}}} for item_id in unique_ids])
+    for item_id in unique_ids:
+        item_cache.invalidate(item_id)
+        if item_id not in unprocessed_ids:
+            log_change(item_id, removed=True)
+
+    results = []
+    for item_id in item_ids:
+        if not item_id:
+            results.append({'item_id': item_id, 'status': 'invalid', 'error': 'item_id is required.'})
+        elif item_id in unprocessed_ids:
+            results.append({'item_id': item_id, 'status': 'failed', 'error': 'Unprocessed after retries.'})
+        else:
+            results.append({'item_id': item_id, 'status': 'removed'})
+
+    return {'results': results}
+
+
+@operation("retrieving grocery items")
+def get_grocery_items(item_ids) -> dict:
+    """Retrieves several grocery items with batched reads. Provide a list of item_ids; returns a result per item."""
+    item_ids = parse_batch_input(item_ids, "item_ids must be a list of item_id values.")
+
+    # BatchGetItem rejects duplicate keys within one request
+    unique_ids = list(dict.fromkeys(item_id for item_id in item_ids if item_id))
+    found, unprocessed_ids = batch_get(unique_ids)
+
+    results = []
+    for item_id in item_ids:
+        if not item_id:
+            results.append({'item_id': item_id, 'status': 'invalid', 'error': 'item_id is required.'})
+        elif item_id in found:
+            results.append({'item_id': item_id, 'status': 'found', 'item': GroceryItem.from_record(found[item_id]).to_dict()})
+        elif item_id in unprocessed_ids:
+            results.append({'item_id': item_id, 'status': 'failed', 'error': 'Unprocessed after retries.'})
+        else:
+            results.append({'item_id': item_id, 'status': 'not_found'})
+
+    return {'results': results}
+
+
+def transact_adjust(deltas):
+    """Applies (item_id, delta) pairs in one TransactWriteItems call, retrying transient cancellations.
+
+    Every update is conditioned on the item existing and its quantity staying >= 0, so the chunk
+    either commits as a whole or not at all. Returns the list of conflicting items (empty on commit).
+    """
+    transact_items = [{
+        'Update': {
+            'TableName': table_name,
+            'Key': {'item_id': item_id},
+            'UpdateExpression': "SET quantity = quantity + :delta ADD version :version_increment",
+            'ConditionExpression': "attribute_exists(item_id) AND quantity >= :floor",
+            'ExpressionAttributeValues': {':delta': delta, ':floor': -delta, ':version_increment': 1},
+            'ReturnValuesOnConditionCheckFailure': 'ALL_OLD'
+        }
+    } for item_id, delta in deltas]
+
+    for attempt in range(BATCH_MAX_RETRIES + 1):
+        if attempt:
+            backoff_sleep(attempt)
+        try:
+            dynamodb.meta.client.transact_write_items(TransactItems=transact_items)
+            return []
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') != 'TransactionCanceledException':
+                raise
+            reasons = e.response.get('CancellationReasons', [])
+
+        conflicts = []
+        for (item_id, delta), reason in zip(deltas, reasons):
+            if reason.get('Code') == 'ConditionalCheckFailed':
+                current = reason.get('Item')
+                conflicts.append({
+                    'item_id': item_id,
+                    'delta': delta,
+                    'reason': 'insufficient_quantity' if current else 'not_found',
+                    'quantity': deserializer.deserialize(current['quantity']) if current and 'quantity' in current else None
+                })
+        if conflicts:
+            return conflicts
+        if not any(reason.get('Code') in RETRYABLE_CANCELLATION_CODES for reason in reasons):
+            raise RuntimeError(f"Transaction cancelled: {[reason.get('Code') for reason in reasons]}")
+    raise RuntimeError("Transaction still conflicting after retries.")
+
+
+@operation("adjusting inventory quantities")
+def adjust_inventory_quantities(adjustments) -> dict:
+    """Adjusts the quantities of several grocery items transactionally, never letting a quantity drop below 0.
+    Provide a JSON array of {"item_id": ..., "delta": ...} pairs; returns which items were applied or conflicted."""
+    adjustments = parse_batch_input(adjustments, "Invalid JSON format. Please provide a JSON array of {\"item_id\", \"delta\"} pairs.")
+
+    report = {'applied': [], 'conflicts': [], 'not_applied': [], 'invalid': []}
+
+    # A transaction may touch each item only once, so deltas for the same item are merged
+    deltas = {}
+    for adjustment in adjustments:
+        item_id = adjustment.get('item_id') if isinstance(adjustment, dict) else None
+        delta = adjustment.get('delta') if isinstance(adjustment, dict) else None
+        # NaN and infinity parse from JSON as floats but cannot be stored or reported
+        if not item_id or isinstance(delta, bool) or not isinstance(delta, (int, float)) or not math.isfinite(delta):
+            report['invalid'].append({'item_id': item_id, 'error': 'item_id and a finite numeric delta are required.'})
+            continue
+        deltas[item_id] = deltas.get(item_id, Decimal(0)) + Decimal(str(delta))
+
+    # Each chunk commits atomically; chunks are independent of each other
+    for chunk in chunked(list(deltas.items()), TRANSACT_MAX_ITEMS):
+        try:
+            conflicts = transact_adjust(chunk)
+        except Exception as e:
+            report['not_applied'].extend({'item_id': item_id, 'delta': delta, 'error': str(e)} for item_id, delta in chunk)
+            continue
+        finally:
+            # The transaction returns no new images, so cached entries are dropped whatever its outcome
+            for item_id, _ in chunk:
+                item_cache.invalidate(item_id)
+        if not conflicts:
+            report['applied'].extend({'item_id': item_id, 'delta': delta} for item_id, delta in chunk)
+            for item_id, _ in chunk:
+                log_change(item_id)
+            continue
+        report['conflicts'].extend(conflicts)
+        conflicting_ids = {conflict['item_id'] for conflict in conflicts}
+        report['not_applied'].extend(
+            {'item_id': item_id, 'delta': delta, 'error': 'Rolled back with conflicting items in the same transaction.'}
+            for item_id, delta in chunk if item_id not in conflicting_ids
+        )
+
+    return report
+
+
+# Lambda event fields passed to each action, in argument order
+ACTIONS = {
+    'add_grocery_item': (add_grocery_item, ('item_details', 'idempotency_key')),
+    'get_grocery_item_details': (get_grocery_item_details, ('item_id',)),
+    'update_grocery_item': (update_grocery_item, ('item_update', 'expected_version', 'idempotency_key')),
+    'remove_grocery_item': (remove_grocery_item, ('item_id',)),
+    'list_all_grocery_items': (list_all_grocery_items, ('category', 'limit', 'cursor')),
+    'list_expiring_grocery_items': (list_expiring_grocery_items, ('expiring_before', 'category', 'limit', 'cursor')),
+    'items_expiring_within': (items_expiring_within, ('days', 'limit', 'today')),
+    'add_grocery_items': (add_grocery_items, ('items_details',)),
+    'get_grocery_items': (get_grocery_items, ('item_ids',)),
+    'remove_grocery_items': (remove_grocery_items, ('item_ids',)),
+    'adjust_inventory_quantity': (adjust_inventory_quantity, ('item_id', 'quantity_change', 'expected_version', 'idempotency_key')),
+    'adjust_inventory_quantities': (adjust_inventory_quantities, ('adjustments',)),
+    'get_item_cache_stats': (item_cache.stats, ()),
+}
+
+
+def dispatch(event, actions=ACTIONS):
+    """Runs the action named in a Lambda event with the event's fields as arguments and returns its result,
+    either a message or data that json_encoding.dumps serializes. `actions` defaults to the repository's.
+
+    Raises InvalidRequest (400), ItemNotFound (404), ConflictError (409) or RepositoryError (500) on failure.
+    """
+    action = event.get('action')
+    if not action:
+        raise InvalidRequest("Missing action parameter")
+    if action not in actions:
+        raise InvalidRequest(f"Invalid action: {action}")
+    function, fields = actions[action]
+    return function(*(event.get(field) for field in fields))
+
+
+def error_response(error):
+    """Lambda response for a failed action; both Lambda entry points answer errors the same way."""
+    return {
+        'statusCode': error.status_code,
+        'body': dumps({'error': str(error)})
+    }
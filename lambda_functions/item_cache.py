@@ -0,0 +1,93 @@
+import os
+import threading
+import time
+import metrics
+from ttl_cache import LRUCache
+
+# "off" (default) reads every item from DynamoDB. "invalidate" caches reads and drops an entry whenever
+# the item is written. "refresh" caches reads and replaces an entry with the item's new image on writes.
+ITEM_CACHE_MODE = os.environ.get("ITEM_CACHE_MODE", "off").lower()
+ITEM_CACHE_MODES = ("off", "invalidate", "refresh")
+ITEM_CACHE_SIZE = int(os.environ.get("ITEM_CACHE_SIZE", "512"))
+# Bounds how stale an entry can get through writes made by other containers
+ITEM_CACHE_TTL_SECONDS = float(os.environ.get("ITEM_CACHE_TTL_SECONDS", "30"))
+
+
+class ItemCache:
+    """Read-through LRU of item records by item_id, TTL-bounded and kept coherent with this container's writes."""
+
+    def __init__(self, mode=ITEM_CACHE_MODE, max_size=ITEM_CACHE_SIZE, ttl_seconds=ITEM_CACHE_TTL_SECONDS):
+        self.mode = mode if mode in ITEM_CACHE_MODES else "off"
+        self.max_size = max_size
+        # Entries only live in this container, so they expire on the monotonic clock
+        self.entries = LRUCache(max_size, ttl_seconds, clock=time.monotonic)
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.miss_seconds = 0.0
+
+    @property
+    def enabled(self):
+        return self.mode != "off" and self.max_size > 0
+
+    def load(self, item_id, loader):
+        """Returns the record for item_id, calling loader(item_id) on a miss; None if the item does not exist."""
+        if not self.enabled:
+            return loader(item_id)
+
+        record = self.entries.get(item_id)
+        if record is not None:
+            with self.lock:
+                self.hits += 1
+                mean_miss_seconds = self.miss_seconds / self.misses if self.misses else 0.0
+            # Each hit is a GetItem not sent; the latency it saved is estimated at the mean miss latency
+            metrics.record('ItemCacheHits', 1)
+            metrics.record('ItemCacheLatencySavedMs', mean_miss_seconds * 1000)
+            return record
+
+        start = time.perf_counter()
+        record = loader(item_id)
+        elapsed = time.perf_counter() - start
+        with self.lock:
+            self.misses += 1
+            self.miss_seconds += elapsed
+        metrics.record('ItemCacheMisses', 1)
+        if record is not None:
+            self.entries.put(item_id, record)
+        return record
+
+    def written(self, item_id, record=None):
+        """Records a write of item_id; record is the item's full new image when the writer has it."""
+        if not self.enabled:
+            return
+        if self.mode == "refresh" and record is not None:
+            self.entries.put(item_id, record)
+        elif self.entries.pop(item_id):
+            with self.lock:
+                self.invalidations += 1
+            metrics.record('ItemCacheInvalidations', 1)
+
+    def invalidate(self, item_id):
+        self.written(item_id)
+
+    def stats(self):
+        """Returns hit/miss counters for this container, and the read latency hits saved (at the mean miss latency).
+        Each invocation also emits its share as the ItemCache* metrics."""
+        with self.lock:
+            lookups = self.hits + self.misses
+            mean_miss_seconds = self.miss_seconds / self.misses if self.misses else 0.0
+            return {
+                'mode': self.mode,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'invalidations': self.invalidations,
+                'size': len(self.entries),
+                'mean_miss_latency_ms': mean_miss_seconds * 1000,
+                'latency_saved_ms': self.hits * mean_miss_seconds * 1000
+            }
+
+
+# Shared by all invocations served by this container
+item_cache = ItemCache()
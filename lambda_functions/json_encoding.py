@@ -0,0 +1,22 @@
+import json
+from decimal import Decimal
+
+
+class DecimalEncoder(json.JSONEncoder):
+    """Encodes DynamoDB's Decimal numbers as JSON numbers during encoding, so results need no conversion pass."""
+
+    def default(self, obj):
+        if isinstance(obj, Decimal):
+            integer = int(obj)
+            return integer if integer == obj else float(obj)
+        return super().default(obj)
+
+
+# Compact output keeps the C encoder's fast path; indentation is only paid for when asked for
+compact_encoder = DecimalEncoder(separators=(',', ':'))
+pretty_encoder = DecimalEncoder(indent=2)
+
+
+def dumps(obj, pretty=False):
+    """Serializes a result, Decimals included, in a single pass. Compact unless pretty is set."""
+    return (pretty_encoder if pretty else compact_encoder).encode(obj)
@@ -0,0 +1,117 @@
+import hashlib
+import json
+import os
+import re
+import time
+import metrics
+from ttl_cache import DynamoDBStore, FileStore, TwoTierCache
+
+# "memory" (default) answers repeated prompts from this container only; "file" adds a JSON file in the
+# container's /tmp and "dynamodb" a table shared by every agent Lambda; "off" always calls the LLM
+LLM_CACHE_BACKEND = os.environ.get("LLM_CACHE_BACKEND", "memory").lower()
+LLM_CACHE_SIZE = int(os.environ.get("LLM_CACHE_SIZE", "256"))
+LLM_CACHE_TTL_SECONDS = int(os.environ.get("LLM_CACHE_TTL_SECONDS", str(24 * 3600)))
+LLM_CACHE_TABLE_NAME = os.environ.get("LLM_CACHE_TABLE_NAME")
+LLM_CACHE_PATH = os.environ.get("LLM_CACHE_PATH", "/tmp/llm_cache.json")
+# Comma-separated agent names (their Lambda module names) that never use the cache
+LLM_CACHE_OPT_OUT = {name.strip() for name in os.environ.get("LLM_CACHE_OPT_OUT", "").split(",") if name.strip()}
+# Answers larger than this are not persisted (DynamoDB items are limited to 400 KB)
+LLM_CACHE_MAX_ANSWER_BYTES = 350 * 1024
+# Every agent answers in JSON; an answer without any is not cached, so the prompt is retried next time
+JSON_ANSWER = re.compile(r"[\[{].*[\]}]", re.DOTALL)
+
+
+def normalize_text(text):
+    """Collapses whitespace, so prompts that differ only in layout share an entry."""
+    return " ".join(str(text or "").split())
+
+
+def model_name(agent):
+    llm = getattr(agent, 'llm', None)
+    return str(getattr(llm, 'model', None) or getattr(llm, 'model_name', None) or llm or "")
+
+
+def prompt_key(agent, task):
+    """Content address of a prompt: everything that shapes the answer, i.e. the agent's role, goal,
+    backstory, model and tools (the task's, or else the agent's), and the task's normalized text."""
+    tools = getattr(task, 'tools', None) or getattr(agent, 'tools', None) or []
+    raw = json.dumps([
+        normalize_text(agent.role),
+        normalize_text(agent.goal),
+        normalize_text(getattr(agent, 'backstory', "")),
+        model_name(agent),
+        sorted(str(getattr(tool, 'name', type(tool).__name__)) for tool in tools),
+        normalize_text(task.description),
+        normalize_text(getattr(task, 'expected_output', "")),
+    ], separators=(',', ':'))
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+def run_crew(agent, task):
+    """Runs a task on its agent through a one-agent Crew and returns the answer text."""
+    from crewai import Crew
+
+    with metrics.span('AgentKickoff'):
+        return str(Crew(agents=[agent], tasks=[task], verbose=False).kickoff())
+
+
+class LLMCache(TwoTierCache):
+    """Content-addressed cache of agent answers: a warm in-process LRU in front of an optional persistent
+    store, both TTL-bounded. Identical prompts (same agent, tools and normalized task) skip the LLM."""
+
+    def __init__(self, store=None, max_size=LLM_CACHE_SIZE, ttl_seconds=LLM_CACHE_TTL_SECONDS,
+                 enabled=True, opt_out=LLM_CACHE_OPT_OUT):
+        super().__init__(prompt_key, store, max_size, ttl_seconds, LLM_CACHE_MAX_ANSWER_BYTES)
+        self.enabled = enabled and max_size > 0
+        self.opt_out = set(opt_out)
+        self.miss_seconds = 0.0
+
+    def kickoff(self, name, agent, task, run=run_crew):
+        """Returns the agent's answer to the task, from the cache when the same prompt was answered before.
+
+        name identifies the calling agent for LLM_CACHE_OPT_OUT. run(agent, task) produces an answer on a
+        miss; the default runs a Crew, and a stub can stand in for the LLM to exercise the cache offline.
+        """
+        if not self.enabled or name in self.opt_out:
+            return run(agent, task)
+
+        key = prompt_key(agent, task)
+        answer = self.lookup(key)
+        if answer is not None:
+            metrics.record('LLMCacheHits', 1)
+            return answer
+
+        metrics.record('LLMCacheMisses', 1)
+        start = time.perf_counter()
+        answer = run(agent, task)
+        elapsed = time.perf_counter() - start
+        with self.lock:
+            self.miss_seconds += elapsed
+        if JSON_ANSWER.search(answer):
+            self.save(key, answer)
+        return answer
+
+    def stats(self):
+        """Returns hit/miss counters for this container, and the LLM latency hits saved (at the mean miss latency)."""
+        stats = super().stats()
+        with self.lock:
+            mean_miss_seconds = self.miss_seconds / self.misses if self.misses else 0.0
+        hits = stats['memory_hits'] + stats['persistent_hits']
+        return dict(
+            {'enabled': self.enabled, 'persistent_store': type(self.store).__name__ if self.store is not None else None},
+            **stats,
+            latency_saved_ms=hits * mean_miss_seconds * 1000
+        )
+
+
+def default_cache():
+    """Builds the cache LLM_CACHE_BACKEND selects."""
+    if LLM_CACHE_BACKEND == "dynamodb" and LLM_CACHE_TABLE_NAME:
+        return LLMCache(DynamoDBStore(LLM_CACHE_TABLE_NAME, 'answer'))
+    if LLM_CACHE_BACKEND == "file":
+        return LLMCache(FileStore(LLM_CACHE_PATH, LLM_CACHE_SIZE * 4))
+    return LLMCache(enabled=LLM_CACHE_BACKEND != "off")
+
+
+# Shared by all invocations served by this container
+llm_cache = default_cache()
@@ -0,0 +1,172 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+# Handler modules import this module first, so init time covers their own imports and setup
+INIT_STARTED = time.perf_counter()
+
+# "off" (default) records nothing and leaves handlers unwrapped. "emf" prints one CloudWatch Embedded
+# Metric Format line per invocation, which CloudWatch Logs turns into metrics without any API calls.
+METRICS_MODE = os.environ.get("METRICS_MODE", "off").lower()
+METRICS_NAMESPACE = os.environ.get("METRICS_NAMESPACE", "GroceryMan")
+enabled = METRICS_MODE == "emf"
+
+# DynamoDB operations that accept ReturnConsumedCapacity
+CAPACITY_OPERATIONS = {
+    'GetItem', 'PutItem', 'UpdateItem', 'DeleteItem', 'Query', 'Scan',
+    'BatchGetItem', 'BatchWriteItem', 'TransactGetItems', 'TransactWriteItems'
+}
+
+
+class Invocation:
+    """Metric values recorded during one handler invocation; stage threads may record concurrently."""
+
+    def __init__(self, service, action=None):
+        self.service = service
+        self.action = action
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def add(self, name, value):
+        with self.lock:
+            self.values[name] = self.values.get(name, 0) + value
+
+    def document(self):
+        """The invocation as an EMF log document: dimensions and values, plus the metric declarations."""
+        dimensions = {'Service': self.service}
+        if self.action:
+            dimensions['Action'] = self.action
+        with self.lock:
+            values = dict(self.values)
+        return dict({
+            '_aws': {
+                'Timestamp': int(time.time() * 1000),
+                'CloudWatchMetrics': [{
+                    'Namespace': METRICS_NAMESPACE,
+                    'Dimensions': [list(dimensions)],
+                    'Metrics': [{'Name': name, 'Unit': metric_unit(name)} for name in values]
+                }]
+            }
+        }, **dimensions, **values)
+
+
+def metric_unit(name):
+    if name.endswith('Ms'):
+        return 'Milliseconds'
+    if name.endswith('Bytes'):
+        return 'Bytes'
+    return 'Count'
+
+
+# The invocation being recorded. Lambda runs one invocation at a time per container, so a module
+# global (rather than a context variable) is also visible from the orchestrator's worker threads.
+current = None
+cold_start = True
+
+
+def record(name, value):
+    """Adds value to a metric of the current invocation; does nothing outside an instrumented invocation."""
+    invocation = current
+    if invocation is not None:
+        invocation.add(name, value)
+
+
+def set_action(action):
+    """Sets the Action dimension once a handler has resolved it (e.g. from an API route)."""
+    invocation = current
+    if invocation is not None:
+        invocation.action = action
+
+
+@contextmanager
+def span(name):
+    """Times the block as the metric <name>Ms (summed if the span repeats within the invocation)."""
+    invocation = current
+    if invocation is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        # Recorded on the invocation that started the span, even if a straggling thread ends it later
+        invocation.add(f"{name}Ms", (time.perf_counter() - start) * 1000)
+
+
+def payload_size(payload):
+    """Size in bytes of a request or response as it travels as JSON."""
+    if isinstance(payload, dict) and isinstance(payload.get('body'), str):
+        payload = payload['body']
+    if not isinstance(payload, (str, bytes)):
+        payload = json.dumps(payload, default=str)
+    return len(payload.encode('utf-8') if isinstance(payload, str) else payload)
+
+
+def instrumented(service, actions=None):
+    """Decorates a lambda_handler to emit its duration, payload sizes and cold-start/init markers.
+
+    With actions, the event's 'action' becomes a dimension when it is one of them (unknown actions are
+    grouped as "invalid" to keep metric cardinality bounded). When metrics are off the handler is
+    returned unchanged.
+    """
+    init_ms = (time.perf_counter() - INIT_STARTED) * 1000
+
+    def decorator(handler):
+        if not enabled:
+            return handler
+
+        @wraps(handler)
+        def wrapper(event, context):
+            global current, cold_start
+            action = None
+            if actions is not None:
+                action = event.get('action') if isinstance(event, dict) else None
+                action = action if action in actions else "invalid"
+            invocation = current = Invocation(service, action)
+            if cold_start:
+                cold_start = False
+                invocation.add('ColdStart', 1)
+                invocation.add('InitMs', init_ms)
+            else:
+                invocation.add('ColdStart', 0)
+            invocation.add('RequestBytes', payload_size(event))
+
+            start = time.perf_counter()
+            try:
+                response = handler(event, context)
+                invocation.add('ResponseBytes', payload_size(response))
+                return response
+            finally:
+                invocation.add('DurationMs', (time.perf_counter() - start) * 1000)
+                current = None
+                print(json.dumps(invocation.document(), default=str))
+
+        return wrapper
+
+    return decorator
+
+
+def add_consumed_capacity_request(params, model, **kwargs):
+    if model.name in CAPACITY_OPERATIONS:
+        params.setdefault('ReturnConsumedCapacity', 'TOTAL')
+
+
+def record_consumed_capacity(parsed, model, **kwargs):
+    record('DynamoDBCalls', 1)
+    consumed = parsed.get('ConsumedCapacity') if isinstance(parsed, dict) else None
+    if consumed is None:
+        return
+    # Single-table operations report one entry, batch and transaction operations one per table
+    entries = consumed if isinstance(consumed, list) else [consumed]
+    record('ConsumedCapacityUnits', sum(float(entry.get('CapacityUnits', 0)) for entry in entries))
+
+
+def instrument_dynamodb(client):
+    """Makes a DynamoDB client's calls report consumed capacity into the current invocation's metrics."""
+    if not enabled:
+        return
+    client.meta.events.register('before-parameter-build.dynamodb', add_consumed_capacity_request)
+    client.meta.events.register('after-call.dynamodb', record_consumed_capacity)
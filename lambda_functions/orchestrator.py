@@ -1,73 +1,269 @@
+import metrics
 import json
 import boto3
 import os
+import time
+from botocore.config import Config
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+# Per-invocation timeout and fan-out width
+INVOKE_TIMEOUT_SECONDS = float(os.environ.get("INVOKE_TIMEOUT_SECONDS", "60"))
+MAX_PARALLEL_INVOCATIONS = int(os.environ.get("MAX_PARALLEL_INVOCATIONS", "8"))
+# Time held back from the Lambda deadline to assemble and return the response
+DEADLINE_SAFETY_MARGIN_SECONDS = float(os.environ.get("DEADLINE_SAFETY_MARGIN_SECONDS", "1.0"))
 
 # Initialize AWS clients
-lambda_client = boto3.client('lambda', region_name=os.environ.get("AWS_REGION"))
+lambda_client = boto3.client(
+    'lambda',
+    region_name=os.environ.get("AWS_REGION"),
+    config=Config(
+        connect_timeout=5,
+        read_timeout=INVOKE_TIMEOUT_SECONDS,
+        retries={'max_attempts': 2},
+        max_pool_connections=MAX_PARALLEL_INVOCATIONS
+    )
+)
 openai_api_key = os.environ.get("OPENAI_API_KEY")
 dynamodb_table_name = os.environ.get("DYNAMODB_TABLE_NAME")
 
+# Shared across warm invocations so threads are not re-created per request. A stage that times out is
+# abandoned, not interrupted: its thread stays blocked in invoke until the client's read timeout, i.e.
+# for at most 3 attempts (the first and 2 retries) x (connect_timeout + INVOKE_TIMEOUT_SECONDS), before it
+# serves another request
+executor = ThreadPoolExecutor(max_workers=MAX_PARALLEL_INVOCATIONS)
+
+
+def invoke_lambda_function(function_name, payload, invocation_type='RequestResponse'):
+    """Invokes a Lambda function and returns the response. The payload may be a dict or an encoded JSON string.
 
-def invoke_lambda_function(function_name, payload):
-    """Invokes a Lambda function and returns the response."""
+    With invocation_type='Event' the call is fire-and-forget: it returns as soon as Lambda
+    has queued the event, without waiting for (or returning) the function's result.
+    """
     try:
         response = lambda_client.invoke(
             FunctionName=function_name,
-            InvocationType='RequestResponse',
-            Payload=json.dumps(payload)
+            InvocationType=invocation_type,
+            Payload=payload if isinstance(payload, str) else json.dumps(payload)
         )
+        if invocation_type == 'Event':
+            return {'status': 'accepted', 'statusCode': response['StatusCode']}
         response_payload = json.loads(response['Payload'].read().decode('utf-8'))
         return response_payload
     except Exception as e:
         return {'error': str(e)}
 
 
+def deadline_from_context(context):
+    """Returns the monotonic time by which all invocations must finish, or None outside of Lambda."""
+    if context is None or not hasattr(context, 'get_remaining_time_in_millis'):
+        return None
+    return time.monotonic() + context.get_remaining_time_in_millis() / 1000 - DEADLINE_SAFETY_MARGIN_SECONDS
+
+
+# Source name for pipeline inputs read from the orchestrator's own event
+EVENT = 'event'
+# Marks a pipeline input with no default: the stage is skipped when the value is absent
+REQUIRED = object()
+
+
+class Stage:
+    """One step of a pipeline: the Lambda to invoke and where each payload field comes from.
+
+    `inputs` maps a payload field to ``(source, key)`` or ``(source, key, default)``, where source is
+    another stage's name or EVENT and key is a field of that output (None passes the whole output).
+    """
+
+    def __init__(self, name, function_env, inputs=None, invocation_type='RequestResponse'):
+        self.name = name
+        self.function_env = function_env
+        self.inputs = {field: tuple(spec) + (REQUIRED,) * (3 - len(spec)) for field, spec in (inputs or {}).items()}
+        self.invocation_type = invocation_type
+
+    @property
+    def dependencies(self):
+        return {source for source, _, _ in self.inputs.values() if source != EVENT}
+
+
+class StageOutput:
+    """A stage's parsed response; each field is JSON-encoded at most once, however many stages consume it."""
+
+    def __init__(self, output):
+        self.output = output
+        self.fragments = {}
+
+    def has(self, key):
+        return key is None or (isinstance(self.output, dict) and key in self.output)
+
+    def fragment(self, key):
+        if key not in self.fragments:
+            self.fragments[key] = json.dumps(self.output if key is None else self.output[key])
+        return self.fragments[key]
+
+
+# receipt -> expiration -> tracker -> recipes, with agent and task setup as an independent branch
+GROCERY_PIPELINE = [
+    Stage('receipt_interpreter', 'RECEIPT_INTERPRETER_FUNCTION_NAME', {
+        'receipt_markdown': (EVENT, 'receipt_markdown'),
+        'today': (EVENT, 'today'),
+    }),
+    Stage('expiration_date_estimation', 'EXPIRATION_DATE_ESTIMATION_FUNCTION_NAME', {
+        'items': ('receipt_interpreter', 'items'),
+        'date_of_purchase': ('receipt_interpreter', 'date_of_purchase'),
+    }),
+    Stage('grocery_tracker', 'GROCERY_TRACKER_FUNCTION_NAME', {
+        'items': ('expiration_date_estimation', 'items'),
+        'consumed_items': (EVENT, 'consumed_items', []),
+        'today': (EVENT, 'today', None),
+    }),
+    Stage('recipe_recommendation', 'RECIPE_RECOMMENDATION_FUNCTION_NAME', {
+        'items': ('grocery_tracker', 'items'),
+        'today': (EVENT, 'today', None),
+    }),
+    Stage('grocery_manager', 'GROCERY_MANAGER_LAMBDA_NAME'),
+    Stage('demand_forecaster', 'DEMAND_FORECASTER_LAMBDA_NAME'),
+    Stage('waste_reduction_specialist', 'WASTE_REDUCTION_SPECIALIST_LAMBDA_NAME'),
+    Stage('inventory_optimization_analyst', 'INVENTORY_OPTIMIZATION_ANALYST_LAMBDA_NAME'),
+    Stage('tasks', 'TASKS_LAMBDA_NAME', {
+        'grocery_manager': ('grocery_manager', None),
+        'demand_forecaster': ('demand_forecaster', None),
+        'waste_reduction_specialist': ('waste_reduction_specialist', None),
+        'inventory_optimization_analyst': ('inventory_optimization_analyst', None),
+    }),
+]
+
+
+def validate_pipeline(stages):
+    """Raises ValueError when a stage name is reused, or a dependency is unknown or cyclic."""
+    by_name = {}
+    for stage in stages:
+        if stage.name in by_name or stage.name == EVENT:
+            raise ValueError(f"Duplicate or reserved stage name: {stage.name}")
+        by_name[stage.name] = stage
+
+    visiting, visited = set(), set()
+
+    def visit(name):
+        if name in visited:
+            return
+        if name in visiting:
+            raise ValueError(f"Pipeline has a dependency cycle through stage: {name}")
+        visiting.add(name)
+        for dependency in by_name[name].dependencies:
+            if dependency not in by_name:
+                raise ValueError(f"Stage {name} depends on unknown stage: {dependency}")
+            visit(dependency)
+        visiting.discard(name)
+        visited.add(name)
+
+    for name in by_name:
+        visit(name)
+
+
+def build_payload(stage, outputs):
+    """Splices already-encoded input fragments into the stage's JSON payload; None if a required input is missing."""
+    parts = []
+    for field, (source, key, default) in stage.inputs.items():
+        output = outputs[source]
+        if output.has(key):
+            fragment = output.fragment(key)
+        elif default is not REQUIRED:
+            fragment = json.dumps(default)
+        else:
+            return None
+        parts.append(f"{json.dumps(field)}: {fragment}")
+    return "{" + ", ".join(parts) + "}"
+
+
+def stage_failed(output):
+    """Agent Lambdas report failures as an 'error' field; wrapped responses by an HTTP status code."""
+    if not isinstance(output, dict):
+        return False
+    return 'error' in output or output.get('statusCode', 200) >= 400
+
+
+def invoke_stage(stage, function_name, payload):
+    with metrics.span(f"Stage.{stage.name}"):
+        return invoke_lambda_function(function_name, payload, stage.invocation_type)
+
+
+def run_pipeline(stages, event, deadline=None, timeout=INVOKE_TIMEOUT_SECONDS):
+    """Runs each stage as soon as its inputs are ready, so independent branches execute in parallel.
+
+    Returns ``{stage name: {'status': ..., 'output' or 'error': ...}}`` where status is 'succeeded',
+    'failed' or 'skipped' (its Lambda is not configured, a required input was missing or an upstream
+    stage did not succeed).
+    """
+    validate_pipeline(stages)
+    outputs = {EVENT: StageOutput(event)}
+    results = {}
+    pending = {stage.name: stage for stage in stages}
+    running = {}
+
+    while pending or running:
+        # Launch (or skip) every stage whose dependencies are settled; repeat until nothing changes
+        progressed = True
+        while progressed:
+            progressed = False
+            for name, stage in list(pending.items()):
+                dependencies = stage.dependencies
+                if not all(dependency in results for dependency in dependencies):
+                    continue
+                del pending[name]
+                progressed = True
+                if any(results[dependency]['status'] != 'succeeded' for dependency in dependencies):
+                    results[name] = {'status': 'skipped', 'error': 'An upstream stage did not succeed'}
+                    continue
+                # Stages whose Lambda is not deployed (e.g. the crew agents) are skipped, not invoked without a name
+                function_name = os.environ.get(stage.function_env)
+                if not function_name:
+                    results[name] = {'status': 'skipped', 'error': f'{stage.function_env} is not set'}
+                    continue
+                payload = build_payload(stage, outputs)
+                if payload is None:
+                    results[name] = {'status': 'skipped', 'error': 'A required input is missing'}
+                    continue
+                metrics.record('StagePayloadBytes', len(payload))
+                future = executor.submit(invoke_stage, stage, function_name, payload)
+                running[future] = (stage, time.monotonic() + timeout if deadline is None else min(time.monotonic() + timeout, deadline))
+
+        if not running:
+            break
+
+        done, _ = wait(running, timeout=max(0, min(stage_deadline for _, stage_deadline in running.values()) - time.monotonic()),
+                       return_when=FIRST_COMPLETED)
+        for future in done:
+            stage, _ = running.pop(future)
+            output = future.result()
+            if stage_failed(output):
+                results[stage.name] = {'status': 'failed', 'error': output.get('error', output)}
+            else:
+                results[stage.name] = {'status': 'succeeded', 'output': output}
+                outputs[stage.name] = StageOutput(output)
+
+        now = time.monotonic()
+        for future, (stage, stage_deadline) in list(running.items()):
+            if stage_deadline <= now:
+                # cancel() only stops a stage that has not started; a running one is left to its read timeout
+                future.cancel()
+                del running[future]
+                metrics.record('StageTimeouts', 1)
+                results[stage.name] = {'status': 'failed', 'error': f'Stage {stage.name} did not finish in time'}
+
+    return results
+
+
+@metrics.instrumented('orchestrator')
 def lambda_handler(event, context):
     """Main Lambda handler to orchestrate the grocery management system."""
     try:
-        # Define agent and task function names (assumes you've deployed them as separate Lambda functions)
-        agent_function_names = {
-            "grocery_manager": os.environ.get("GROCERY_MANAGER_LAMBDA_NAME"),
-            "demand_forecaster": os.environ.get("DEMAND_FORECASTER_LAMBDA_NAME"),
-            "waste_reduction_specialist": os.environ.get("WASTE_REDUCTION_SPECIALIST_LAMBDA_NAME"),
-            "inventory_optimization_analyst": os.environ.get("INVENTORY_OPTIMIZATION_ANALYST_LAMBDA_NAME")
-        }
-
-        # Tasks function
-        tasks_function_name = os.environ.get("TASKS_LAMBDA_NAME")
-        # database function
-        database_function_name = os.environ.get("DATABASE_LAMBDA_NAME")
-
-        # 1. Initialize Agents and Tasks
-        # This is a simplified example. You might need to pass specific configurations.
-        agents = {agent_name: invoke_lambda_function(agent_function_names[agent_name], {})
-                  for agent_name in agent_function_names}
-
-        tasks = invoke_lambda_function(tasks_function_name, {
-            "grocery_manager": agents["grocery_manager"],
-            "demand_forecaster": agents["demand_forecaster"],
-            "waste_reduction_specialist": agents["waste_reduction_specialist"],
-            "inventory_optimization_analyst": agents["inventory_optimization_analyst"]
-        })
-
-        # 2. Example Task: Add a new grocery item
-        item_details = {
-            "item_id": "601",
-            "name": "Coconut",
-            "category": "Fruit",
-            "quantity": 100,
-            "unit_price": 1.50
-        }
-        add_item_result = invoke_lambda_function(database_function_name, {
-            "action": "add_grocery_item",
-            "item_details": json.dumps(item_details)
-        })
+        # Stages run as soon as their inputs are ready; the receipt chain only runs when a receipt is given
+        stage_results = run_pipeline(GROCERY_PIPELINE, event or {}, deadline_from_context(context))
 
         return {
             'statusCode': 200,
             'body': json.dumps({
                 'message': 'Grocery Management System executed successfully!',
-                'add_item_result': add_item_result,
+                'stages': stage_results,
             })
         }
     except Exception as e:
@@ -0,0 +1,344 @@
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import metrics
+from inventory_repository import GroceryItem, InvalidRequest, RepositoryError, log_change, parse_json_details, table
+from item_cache import item_cache
+from json_encoding import dumps
+from update_expression import UpdateExpression
+
+# Receipts wait in this SQS queue, drained by dynamodb_lambda through its event source mapping (see
+# terraform/main.tf). Without it an in-process queue stands in, drained with flush_ingestion_queue.
+INGESTION_QUEUE_URL = os.environ.get("INGESTION_QUEUE_URL")
+# Receipts the in-process queue holds before it refuses more; SQS itself is unbounded
+INGESTION_QUEUE_MAX_DEPTH = int(os.environ.get("INGESTION_QUEUE_MAX_DEPTH", "1000"))
+# The local drain writes a batch once this many distinct items are pending or its first receipt has waited
+# this long; on AWS the event source mapping's batch size and batching window play these roles
+INGESTION_BATCH_MAX_ITEMS = int(os.environ.get("INGESTION_BATCH_MAX_ITEMS", "100"))
+INGESTION_BATCH_WINDOW_SECONDS = float(os.environ.get("INGESTION_BATCH_WINDOW_SECONDS", "5"))
+# Item writes in flight at once; keep within DYNAMODB_MAX_POOL_CONNECTIONS
+INGESTION_WRITE_CONCURRENCY = int(os.environ.get("INGESTION_WRITE_CONCURRENCY", "8"))
+# Lines whose write failed (e.g. throttled) are queued again this much later, giving the table room to
+# recover, and dead-lettered after INGESTION_MAX_ATTEMPTS deliveries
+INGESTION_RETRY_DELAY_SECONDS = int(os.environ.get("INGESTION_RETRY_DELAY_SECONDS", "30"))
+INGESTION_MAX_ATTEMPTS = int(os.environ.get("INGESTION_MAX_ATTEMPTS", "5"))
+# The SQS queue's dead-letter queue, which receives lines still failing after INGESTION_MAX_ATTEMPTS
+INGESTION_DEAD_LETTER_QUEUE_URL = os.environ.get("INGESTION_DEAD_LETTER_QUEUE_URL")
+# SQS caps DelaySeconds at 15 minutes
+SQS_MAX_DELAY_SECONDS = 900
+
+
+class QueueFull(RepositoryError):
+    """The ingestion queue is at capacity; the caller should retry later."""
+    status_code = 503
+
+
+class LocalQueue:
+    """In-process stand-in for the SQS queue: bounded, with per-message delays. Receiving removes a message."""
+
+    def __init__(self, max_depth=INGESTION_QUEUE_MAX_DEPTH):
+        self.max_depth = max_depth
+        self.messages = deque()
+        self.lock = threading.Lock()
+
+    def send(self, body, delay_seconds=0):
+        with self.lock:
+            if len(self.messages) >= self.max_depth:
+                raise QueueFull(f"The ingestion queue holds {self.max_depth} receipts; retry later.")
+            self.messages.append((time.monotonic() + delay_seconds, {'message_id': uuid.uuid4().hex, 'body': body}))
+
+    def receive(self, max_messages=10):
+        """Returns up to max_messages messages whose delay has passed, oldest first."""
+        now = time.monotonic()
+        received, waiting = [], deque()
+        with self.lock:
+            while self.messages and len(received) < max_messages:
+                entry = self.messages.popleft()
+                if entry[0] <= now:
+                    received.append(entry[1])
+                else:
+                    waiting.append(entry)
+            waiting.extend(self.messages)
+            self.messages = waiting
+        return received
+
+    def depth(self):
+        with self.lock:
+            return len(self.messages)
+
+    def dead_letter(self, body):
+        # Nothing outlives this container's queue, so the lines are left in the log for an operator
+        print(body)
+
+
+class SQSQueue:
+    """Producer side of the SQS queue; consuming is left to the Lambda event source mapping."""
+
+    def __init__(self, url=INGESTION_QUEUE_URL, dead_letter_url=INGESTION_DEAD_LETTER_QUEUE_URL):
+        self.url = url
+        self.dead_letter_url = dead_letter_url
+        self.client = None
+
+    def get_client(self):
+        # boto3's SQS client is only created once a receipt is actually enqueued
+        if self.client is None:
+            import boto3
+
+            self.client = boto3.client('sqs', region_name=os.environ.get("AWS_REGION"))
+        return self.client
+
+    def send(self, body, delay_seconds=0):
+        self.get_client().send_message(QueueUrl=self.url, MessageBody=body, DelaySeconds=min(int(delay_seconds), SQS_MAX_DELAY_SECONDS))
+
+    def dead_letter(self, body):
+        """Sends lines that kept failing to the dead-letter queue, where SQS redrive can return them later."""
+        if not self.dead_letter_url:
+            raise RuntimeError("INGESTION_DEAD_LETTER_QUEUE_URL is not set")
+        self.get_client().send_message(QueueUrl=self.dead_letter_url, MessageBody=body)
+
+
+def validate_receipt(receipt):
+    """Parses a receipt, {"receipt_id": ..., "items": [item details, ...]}, checking every line as add_grocery_item would."""
+    receipt = parse_json_details(receipt, "the receipt")
+    if not isinstance(receipt, dict) or not isinstance(receipt.get('items'), list) or not receipt['items']:
+        raise InvalidRequest("A receipt must be a JSON object with a non-empty items array.")
+    items = []
+    for position, details in enumerate(receipt['items'], 1):
+        try:
+            items.append(GroceryItem.from_dict(details))
+        except InvalidRequest as e:
+            raise InvalidRequest(f"Receipt line {position}: {e}")
+    return receipt, items
+
+
+class Coalescer:
+    """Receipt lines merged by item_id, so an item mentioned on many receipts is written once.
+
+    Quantities add up, the latest receipt's unit price wins and the earliest expiration date is kept.
+    """
+
+    def __init__(self):
+        self.items = {}
+        self.receipts = {}
+        self.lines = 0
+        self.rejected = 0
+
+    def add(self, message_id, body):
+        """Adds a queued receipt; returns False (and counts it as rejected) when it is not a valid receipt."""
+        try:
+            receipt, items = validate_receipt(body)
+        except InvalidRequest:
+            self.rejected += 1
+            return False
+        self.receipts[message_id] = receipt
+        self.lines += len(items)
+        for item in items:
+            merged = self.items.get(item.item_id)
+            if merged is None:
+                self.items[item.item_id] = item
+                continue
+            merged.quantity += item.quantity
+            merged.unit_price = item.unit_price
+            if item.expiration_date and (not merged.expiration_date or item.expiration_date < merged.expiration_date):
+                merged.expiration_date = item.expiration_date
+            merged.extra.update(item.extra)
+        return True
+
+
+def restock_update(item):
+    """One UpdateItem that adds a coalesced item's quantity, creating the item if it does not exist yet.
+
+    An existing item keeps its name, category, expiration date (its older stock expires first) and any
+    other attributes; only its unit price follows the latest receipt.
+    """
+    expression = UpdateExpression().add('quantity', item.quantity).add('version', 1).set('unit_price', item.unit_price)
+    expression.set_if_not_exists('name', item.name).set_if_not_exists('category', item.category)
+    if item.expiration_date:
+        record = item.to_record()
+        expression.set_if_not_exists('expiration_date', record['expiration_date'])
+        expression.set_if_not_exists('expiry_partition', record['expiry_partition'])
+    for attribute, value in item.extra.items():
+        expression.set_if_not_exists(attribute, value)
+    return expression
+
+
+def write_restock(item):
+    """Writes one coalesced item; returns the write capacity units it consumed."""
+    response = table.update_item(
+        Key={'item_id': item.item_id},
+        ReturnValues='ALL_NEW',
+        ReturnConsumedCapacity='TOTAL',
+        **restock_update(item).build()
+    )
+    item_cache.written(item.item_id, response['Attributes'])
+    log_change(item.item_id, response['Attributes'])
+    return float(response.get('ConsumedCapacity', {}).get('CapacityUnits', 0))
+
+
+class IngestionWorker:
+    """Writes batches of queued receipts as one update per distinct item, and keeps throughput counters."""
+
+    def __init__(self, queue):
+        self.queue = queue
+        self.executor = ThreadPoolExecutor(max_workers=INGESTION_WRITE_CONCURRENCY)
+        self.lock = threading.Lock()
+        self.receipts = 0
+        self.lines = 0
+        self.writes = 0
+        self.write_units = 0.0
+        self.failed_writes = 0
+        self.requeued_lines = 0
+        self.dead_lettered_lines = 0
+        self.rejected_receipts = 0
+        self.batches = 0
+        self.busy_seconds = 0.0
+
+    def write(self, item):
+        try:
+            return item.item_id, write_restock(item), None
+        except Exception as e:
+            return item.item_id, 0.0, e
+
+    def process(self, coalescer):
+        """Writes a coalesced batch, then queues again, after a delay, the lines whose item write failed;
+        after INGESTION_MAX_ATTEMPTS they go to the queue's dead-letter queue instead.
+
+        Returns the message_ids whose failed lines could be neither queued again nor dead-lettered; those
+        receipts must be redelivered whole, so lines already written would be applied twice (the only
+        case that is). SQS redrive moves them to the dead-letter queue once they keep failing.
+        """
+        start = time.perf_counter()
+        units = 0.0
+        failed = set()
+        with metrics.span('IngestionWrite'):
+            for item_id, consumed, error in self.executor.map(self.write, list(coalescer.items.values())):
+                units += consumed
+                if error is not None:
+                    failed.add(item_id)
+
+        redeliver = []
+        requeued = dead_lettered = 0
+        for message_id, receipt in coalescer.receipts.items():
+            failed_lines = [details for details in receipt['items'] if details['item_id'] in failed]
+            if not failed_lines:
+                continue
+            attempt = int(receipt.get('attempt', 1)) + 1
+            body = dumps({'receipt_id': receipt.get('receipt_id'), 'items': failed_lines, 'attempt': attempt})
+            try:
+                if attempt > INGESTION_MAX_ATTEMPTS:
+                    self.queue.dead_letter(body)
+                    dead_lettered += len(failed_lines)
+                else:
+                    self.queue.send(body, INGESTION_RETRY_DELAY_SECONDS)
+                    requeued += len(failed_lines)
+            except Exception:
+                redeliver.append(message_id)
+
+        metrics.record('IngestionLines', coalescer.lines)
+        metrics.record('IngestionWrites', len(coalescer.items))
+        with self.lock:
+            self.batches += 1
+            self.receipts += len(coalescer.receipts)
+            self.lines += coalescer.lines
+            self.writes += len(coalescer.items)
+            self.write_units += units
+            self.failed_writes += len(failed)
+            self.requeued_lines += requeued
+            self.dead_lettered_lines += dead_lettered
+            self.rejected_receipts += coalescer.rejected
+            self.busy_seconds += time.perf_counter() - start
+        return redeliver
+
+    def process_messages(self, messages):
+        """Coalesces and writes a batch of {'message_id', 'body'} messages; returns the message_ids to redeliver."""
+        coalescer = Coalescer()
+        for message in messages:
+            coalescer.add(message['message_id'], message['body'])
+        return self.process(coalescer)
+
+    def stats(self):
+        """Returns throughput counters, and how many writes coalescing saved against one write per receipt line."""
+        with self.lock:
+            return {
+                'backend': 'sqs' if isinstance(self.queue, SQSQueue) else 'local',
+                'queued': self.queue.depth() if isinstance(self.queue, LocalQueue) else None,
+                'batches': self.batches,
+                'receipts': self.receipts,
+                'lines': self.lines,
+                'writes': self.writes,
+                'writes_saved': self.lines - self.writes,
+                'write_units': self.write_units,
+                'failed_writes': self.failed_writes,
+                'requeued_lines': self.requeued_lines,
+                'dead_lettered_lines': self.dead_lettered_lines,
+                'rejected_receipts': self.rejected_receipts,
+                'lines_per_second': self.lines / self.busy_seconds if self.busy_seconds else 0.0
+            }
+
+
+def drain_local_queue(worker, queue, max_items=INGESTION_BATCH_MAX_ITEMS, window_seconds=INGESTION_BATCH_WINDOW_SECONDS):
+    """Drains an in-process queue the way the event source mapping feeds dynamodb_lambda on AWS.
+
+    Receipts are gathered until max_items distinct items are pending, or until none is waiting once
+    window_seconds have passed since the first one arrived, then written as one batch. Returns once a
+    batch comes up empty; retries that are still delayed stay queued for a later drain.
+    """
+    while True:
+        coalescer = Coalescer()
+        deadline = None
+        while len(coalescer.items) < max_items:
+            messages = queue.receive(10)
+            if messages:
+                for message in messages:
+                    coalescer.add(message['message_id'], message['body'])
+                if deadline is None:
+                    deadline = time.monotonic() + window_seconds
+                continue
+            if deadline is None or time.monotonic() >= deadline:
+                break
+            time.sleep(min(0.05, max(0.0, deadline - time.monotonic())))
+        if not coalescer.receipts and not coalescer.rejected:
+            return
+        worker.process(coalescer)
+
+
+def sqs_messages(event):
+    """The messages of an SQS event source mapping batch."""
+    return [{'message_id': record['messageId'], 'body': record['body']} for record in event['Records']]
+
+
+def is_sqs_event(event):
+    return isinstance(event, dict) and bool(event.get('Records')) and event['Records'][0].get('eventSource') == 'aws:sqs'
+
+
+# Shared by all invocations served by this container
+ingestion_queue = SQSQueue(INGESTION_QUEUE_URL) if INGESTION_QUEUE_URL else LocalQueue()
+ingestion_worker = IngestionWorker(ingestion_queue)
+
+
+def enqueue_receipt(receipt) -> dict:
+    """Queues a receipt for ingestion. Provide {"receipt_id": ..., "items": [item details, ...]} in JSON format.
+    Every line needs the fields add_grocery_item requires; quantities are added to items that already exist."""
+    receipt, items = validate_receipt(receipt)
+    receipt_id = receipt.get('receipt_id') or uuid.uuid4().hex
+    ingestion_queue.send(dumps({'receipt_id': receipt_id, 'items': receipt['items'], 'attempt': 1}))
+    return {'receipt_id': receipt_id, 'status': 'queued', 'items': len(items)}
+
+
+def flush_ingestion_queue() -> dict:
+    """Writes the receipts waiting in the in-process queue now, without waiting for the batching window."""
+    if not isinstance(ingestion_queue, LocalQueue):
+        raise InvalidRequest("The SQS ingestion queue is drained by its event source mapping.")
+    drain_local_queue(ingestion_worker, ingestion_queue, window_seconds=0)
+    return ingestion_worker.stats()
+
+
+# Lambda event fields passed to each action, in argument order
+INGESTION_ACTIONS = {
+    'enqueue_receipt': (enqueue_receipt, ('receipt',)),
+    'flush_ingestion_queue': (flush_ingestion_queue, ()),
+    'get_ingestion_stats': (ingestion_worker.stats, ()),
+}
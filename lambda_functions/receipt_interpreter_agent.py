@@ -1,11 +1,19 @@
-import os
-from crewai import Agent
+import metrics
+import json
+import re
+from receipt_parser import parse_receipt
+from llm_cache import llm_cache
 
-def lambda_handler(event, context):
-    receipt_markdown = event['receipt_markdown']
-    today = event['today']
+# Built on first use and reused by every warm invocation served by this container
+receipt_interpreter_agent = None
+
+
+def build_receipt_interpreter_agent():
+    """Creates the Receipt Markdown Interpreter agent."""
+    # Imported here so cold starts and requests that never reach the agent skip loading crewai
+    from crewai import Agent
 
-    receipt_interpreter_agent = Agent(
+    return Agent(
         role="Receipt Markdown Interpreter",
         goal=(
             "Accurately extract items, their counts, and weights with units from a given receipt in markdown format. "
@@ -24,12 +32,62 @@ def lambda_handler(event, context):
         verbose=False # Set to False for Lambda function
     )
 
-    # TODO: Implement the logic to extract item details from the receipt_markdown
-    # This is a placeholder, replace with actual implementation
+
+def get_receipt_interpreter_agent():
+    """Returns this container's agent, building it on first use. Per-request state belongs in Tasks, not here."""
+    global receipt_interpreter_agent
+    if receipt_interpreter_agent is None:
+        with metrics.span('AgentBuild'):
+            receipt_interpreter_agent = build_receipt_interpreter_agent()
+    return receipt_interpreter_agent
+
+
+def extract_items_with_agent(agent, receipt_lines):
+    """Asks the agent to extract items from receipt lines the deterministic parser could not read."""
+    from crewai import Task
+
+    task = Task(
+        description=(
+            "Extract the grocery items from these receipt lines, skipping anything that is not an item:\n"
+            + "\n".join(receipt_lines)
+            + "\nAnswer with only a JSON array of objects with item_name, count (a number) and unit fields."
+        ),
+        expected_output="A JSON array of {item_name, count, unit} objects.",
+        agent=agent
+    )
+    result = llm_cache.kickoff('receipt_interpreter_agent', agent, task)
+    match = re.search(r"\[.*\]", result, re.DOTALL)
+    try:
+        extracted = json.loads(match.group(0))
+    except (AttributeError, ValueError):
+        return []
+    return [
+        {"item_name": item['item_name'], "count": item['count'], "unit": item.get('unit') or "pcs"}
+        for item in extracted
+        if isinstance(item, dict) and item.get('item_name') and isinstance(item.get('count'), (int, float))
+    ]
+
+
+@metrics.instrumented('receipt_interpreter_agent')
+def lambda_handler(event, context):
+    # Reject malformed requests before any of the agent stack is loaded
+    missing = [field for field in ('receipt_markdown', 'today') if not event.get(field)]
+    if missing:
+        return {"error": f"Missing required fields: {', '.join(missing)}"}
+    if not isinstance(event['receipt_markdown'], str):
+        return {"error": "receipt_markdown must be a string"}
+
+    receipt_markdown = event['receipt_markdown']
+    today = event['today']
+
+    # Regular "NAME  QTY x PRICE" / "NAME  1.23 lb" lines and markdown table rows are parsed directly;
+    # only the lines the parser cannot read with confidence are sent to the agent
+    items, unparsed_lines = parse_receipt(receipt_markdown)
+    if unparsed_lines:
+        items.extend(extract_items_with_agent(get_receipt_interpreter_agent(), unparsed_lines))
+
     extracted_items = {
-        "items": [
-            {"item_name": "Placeholder Item", "count": 1, "unit": "pcs"}
-        ],
+        "items": items,
         "date_of_purchase": today
     }
 
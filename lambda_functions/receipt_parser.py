@@ -0,0 +1,116 @@
+import io
+import re
+
+# "NAME  QTY x PRICE", e.g. "BANANAS  3 x 0.25" or "GREEK YOGURT  2 @ $1.99  3.98"
+QUANTITY_AT_PRICE = re.compile(
+    r"^(?P<name>[^\d\s].*?)(?:\s{2,}|\t+)(?P<count>\d+(?:\.\d+)?)\s*(?:x|@|\*)\s*\$?\d+\.\d{2}(?:\s+\$?\d+\.\d{2})?$",
+    re.IGNORECASE
+)
+# "NAME  1.23 lb", optionally followed by a unit price and/or line total, e.g. "APPLES  1.23 lb @ 1.99/lb  2.45"
+WEIGHED = re.compile(
+    r"^(?P<name>[^\d\s].*?)(?:\s{2,}|\t+)(?P<count>\d+(?:\.\d+)?)\s*(?P<unit>lbs?|oz|kg|g|l|ml)\.?"
+    r"(?:\s*(?:@|x)\s*\$?\d+\.\d{2}(?:\s*/\s*[a-z]+)?)?(?:\s+\$?\d+\.\d{2})?$",
+    re.IGNORECASE
+)
+# Lines that are part of every receipt but never describe an item
+NON_ITEM = re.compile(
+    r"^(?:#|-{3,}|={3,}|\*{3,}|(?:sub\s*)?total\b|tax\b|change\b|cash\b|visa\b|mastercard\b|amex\b|debit\b|credit\b"
+    r"|balance\b|amount due\b|you saved\b|savings\b|thank you\b|items sold\b)",
+    re.IGNORECASE
+)
+TABLE_SEPARATOR = re.compile(r"^\|?\s*:?-{3,}:?\s*(?:\|\s*:?-{3,}:?\s*)*\|?$")
+NUMBER = re.compile(r"^\d+(?:\.\d+)?$")
+
+# Markdown table header names, mapped to the fields they hold
+TABLE_COLUMNS = {
+    'item': 'item_name', 'item name': 'item_name', 'name': 'item_name', 'description': 'item_name', 'product': 'item_name',
+    'qty': 'count', 'quantity': 'count', 'count': 'count', 'weight': 'count',
+    'unit': 'unit', 'units': 'unit', 'uom': 'unit',
+}
+UNIT_ALIASES = {'lbs': 'lb', 'ea': 'pcs', 'each': 'pcs', 'pc': 'pcs', 'ct': 'pcs'}
+
+
+def to_number(text):
+    value = float(text)
+    return int(value) if value.is_integer() else value
+
+
+def normalize_unit(unit):
+    unit = unit.strip().rstrip('.').lower()
+    return UNIT_ALIASES.get(unit, unit) or 'pcs'
+
+
+def clean_name(name):
+    return " ".join(name.strip(" |*").split())
+
+
+def split_table_row(line):
+    return [cell.strip() for cell in line.strip().strip('|').split('|')]
+
+
+def parse_receipt_lines(lines):
+    """Classifies receipt lines one at a time, holding only the current table header in memory.
+
+    Yields ``('item', {'item_name', 'count', 'unit'})`` for lines recognized with confidence,
+    ``('ignored', line)`` for blank and structural lines (headings, totals, payment), and
+    ``('unparsed', line)`` for everything else.
+    """
+    columns = None
+    for raw_line in lines:
+        line = raw_line.strip()
+        if not line:
+            columns = None
+            yield 'ignored', raw_line
+            continue
+
+        if line.startswith('|'):
+            cells = split_table_row(line)
+            if TABLE_SEPARATOR.match(line):
+                yield 'ignored', raw_line
+                continue
+            header = [TABLE_COLUMNS.get(cell.lower()) for cell in cells]
+            if 'item_name' in header and 'count' in header:
+                columns = header
+                yield 'ignored', raw_line
+                continue
+            if columns is not None and len(cells) == len(columns):
+                row = {field: cell for field, cell in zip(columns, cells) if field}
+                if NON_ITEM.match(row['item_name']):
+                    yield 'ignored', raw_line
+                    continue
+                count = row['count'].split()
+                # "1.23 lb" in a quantity column carries its own unit
+                if row['item_name'] and count and NUMBER.match(count[0]) and len(count) <= 2:
+                    unit = row.get('unit') or (count[1] if len(count) == 2 else 'pcs')
+                    yield 'item', {'item_name': clean_name(row['item_name']), 'count': to_number(count[0]), 'unit': normalize_unit(unit)}
+                    continue
+            yield 'unparsed', raw_line
+            continue
+
+        columns = None
+        if NON_ITEM.match(line.lstrip('*_ ')):
+            yield 'ignored', raw_line
+            continue
+
+        line = line.lstrip('-*+ ').strip()
+        match = WEIGHED.match(line)
+        if match:
+            yield 'item', {'item_name': clean_name(match['name']), 'count': to_number(match['count']), 'unit': normalize_unit(match['unit'])}
+            continue
+        match = QUANTITY_AT_PRICE.match(line)
+        if match:
+            yield 'item', {'item_name': clean_name(match['name']), 'count': to_number(match['count']), 'unit': 'pcs'}
+            continue
+        yield 'unparsed', raw_line
+
+
+def parse_receipt(receipt_markdown):
+    """Splits a receipt into confidently parsed items and the unparsed lines left for the agent."""
+    items = []
+    unparsed_lines = []
+    for kind, value in parse_receipt_lines(io.StringIO(receipt_markdown)):
+        if kind == 'item':
+            items.append(value)
+        elif kind == 'unparsed':
+            unparsed_lines.append(value.rstrip('\n'))
+    return items, unparsed_lines
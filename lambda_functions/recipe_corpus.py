@@ -0,0 +1,144 @@
+import heapq
+import json
+import math
+import os
+from collections import defaultdict
+from inventory_reconciliation import normalize_name
+
+# Recipes bundled with the Lambda; point this at a larger corpus without changing code
+RECIPE_CORPUS_PATH = os.environ.get(
+    "RECIPE_CORPUS_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "recipes.json")
+)
+# Extra weight of an ingredient the pantry covers with an item that expires soon (a fresh one weighs 1)
+EXPIRING_SOON_WEIGHT = float(os.environ.get("EXPIRING_SOON_WEIGHT", "1.0"))
+# Assumed to be in every kitchen: they neither count toward coverage nor get restocked
+STAPLES = {"salt", "pepper", "black pepper", "water"}
+
+
+def in_stock(item):
+    """Items with a count (or quantity) of 0 or less are not in the pantry."""
+    remaining = item.get('count', item.get('quantity', 1))
+    return remaining is None or remaining > 0
+
+
+class RecipeCorpus:
+    """Recipes with an inverted index from normalized ingredient name to the recipes that use it.
+
+    Ranking a pantry only touches the recipes that share an ingredient with it, so it costs a few
+    dictionary lookups per pantry item plus work proportional to those candidates, not to the corpus.
+    """
+
+    def __init__(self, recipes):
+        self.recipes = recipes
+        self.ingredient_keys = []
+        self.index = defaultdict(set)
+        # Longest ingredient name in words, bounding the pantry-name phrases worth looking up
+        self.max_words = 1
+        for position, recipe in enumerate(recipes):
+            keys = {normalize_name(ingredient['item_name']) for ingredient in recipe.get('ingredients', [])} - STAPLES
+            self.ingredient_keys.append(keys)
+            for key in keys:
+                self.index[key].add(position)
+                self.max_words = max(self.max_words, len(key.split()))
+
+    @classmethod
+    def load(cls, path=RECIPE_CORPUS_PATH):
+        with open(path, encoding='utf-8') as corpus_file:
+            return cls(json.load(corpus_file)['recipes'])
+
+    def ingredient_key(self, item_name):
+        """The indexed ingredient a pantry item provides, or None.
+
+        "Whole Milk" provides "milk" and "red bell peppers" provides "bell pepper": the item's full name
+        wins, then its longest phrase that some recipe uses.
+        """
+        words = normalize_name(item_name).split()
+        for length in range(min(len(words), self.max_words), 0, -1):
+            for start in range(len(words) - length + 1):
+                phrase = " ".join(words[start:start + length])
+                if phrase in self.index:
+                    return phrase
+        return None
+
+    def rank(self, items, expiring_items=(), limit=5):
+        """Returns up to `limit` recipes best covered by the pantry, best first.
+
+        Items with a count of 0 or less are not in the pantry. A recipe scores the covered share of its
+        ingredients, each covered ingredient weighing 1 plus EXPIRING_SOON_WEIGHT when an expiring item
+        covers it, so recipes that use up soon-to-expire food rank higher. Each result carries its
+        coverage, the expiring items it uses and its missing ingredients.
+        """
+        pantry = {}
+        for item in filter(in_stock, items):
+            key = self.ingredient_key(item.get('item_name', ''))
+            if key is not None:
+                pantry.setdefault(key, item['item_name'])
+        expiring = {}
+        for item in expiring_items:
+            key = self.ingredient_key(item.get('item_name', ''))
+            if key in pantry:
+                expiring.setdefault(key, item['item_name'])
+
+        candidates = set()
+        for key in pantry:
+            candidates |= self.index[key]
+
+        def score(position):
+            keys = self.ingredient_keys[position]
+            covered = keys & pantry.keys()
+            weight = len(covered) + EXPIRING_SOON_WEIGHT * len(covered & expiring.keys())
+            # Ties go to recipes with fewer missing ingredients, then to corpus order
+            return weight / len(keys), -len(keys - covered), -position
+
+        ranked = []
+        for position in heapq.nlargest(limit, candidates, key=score):
+            recipe = self.recipes[position]
+            keys = self.ingredient_keys[position]
+            covered = keys & pantry.keys()
+            ranked.append(dict(
+                recipe,
+                coverage=round(len(covered) / len(keys), 3),
+                uses_expiring=sorted(expiring[key] for key in covered & expiring.keys()),
+                missing_ingredients=[
+                    ingredient for ingredient in recipe['ingredients']
+                    if normalize_name(ingredient['item_name']) in keys - covered
+                ]
+            ))
+        return ranked
+
+
+def restock_recommendations(recipes):
+    """What to buy to cook the given ranked recipes: the union of their missing ingredients.
+
+    Ingredients missing from more of the recipes come first; each is recommended once, rounded up to a
+    whole quantity in the units of the best-ranked recipe that needs it (1 when it is not numeric).
+    """
+    needed = {}
+    needed_by = defaultdict(int)
+    for recipe in recipes:
+        for ingredient in recipe['missing_ingredients']:
+            key = normalize_name(ingredient['item_name'])
+            needed_by[key] += 1
+            if key in needed:
+                continue
+            try:
+                quantity = max(1, math.ceil(float(ingredient.get('quantity', 1))))
+            except (TypeError, ValueError):
+                quantity = 1
+            needed[key] = {
+                "item_name": ingredient['item_name'],
+                "quantity_needed": quantity,
+                "unit": ingredient.get('unit', 'pcs')
+            }
+    return [needed[key] for key in sorted(needed, key=lambda key: (-needed_by[key], key))]
+
+
+# Loaded on first use and reused by every warm invocation served by this container
+recipe_corpus = None
+
+
+def get_recipe_corpus():
+    global recipe_corpus
+    if recipe_corpus is None:
+        recipe_corpus = RecipeCorpus.load()
+    return recipe_corpus
@@ -1,14 +1,33 @@
+import metrics
 import os
-from crewai import Agent
-from crewai_tools import WebsiteSearchTool
+import json
+import re
+from datetime import date
+from expiry_index import items_expiring_within
+from recipe_corpus import get_recipe_corpus, in_stock, restock_recommendations
+from llm_cache import llm_cache
+
+# How many locally ranked candidates the agent chooses from, and how many recipes it returns
+RECIPE_CANDIDATES = int(os.environ.get("RECIPE_CANDIDATES", "5"))
+RECIPE_COUNT = int(os.environ.get("RECIPE_COUNT", "3"))
+# "false" returns the local ranking as is, without consulting the agent at all
+RECIPE_AGENT_RERANK = os.environ.get("RECIPE_AGENT_RERANK", "true").lower() == "true"
+# Items expiring within this many days weigh more in the ranking
+USE_SOON_DAYS = int(os.environ.get("USE_SOON_DAYS", "3"))
+
+# Built on first use and reused by every warm invocation served by this container
+recipe_recommendation_agent = None
+# Only built when the local corpus has nothing for the pantry, so its index is not rebuilt per request
+recipe_web_tool = None
 
-def lambda_handler(event, context):
-    items = event['items']
 
-    recipe_web_tool = WebsiteSearchTool(website='https://www.americastestkitchen.com/recipes')
+def build_recipe_recommendation_agent():
+    """Creates the Grocery Recipe Recommendation agent."""
+    # Imported here so cold starts and requests that never reach the agent skip loading crewai
+    from crewai import Agent
 
     # Optimized Grocery Recipe Recommendation Agent
-    rest_grocery_recipe_agent = Agent(
+    return Agent(
         role="Grocery Recipe Recommendation Specialist",
         goal=(
             "Provide recipe recommendations using the remaining groceries in the inventory. "
@@ -17,7 +36,7 @@ def lambda_handler(event, context):
         ),
         backstory=(
             "As a Grocery Recipe Recommendation Specialist, your mission is to help the household make the most out of their remaining groceries. "
-            "Your role is to search the web for easy, delicious recipes that utilize available ingredients while minimizing waste. "
+            "Your role is to pick easy, delicious recipes that utilize available ingredients while minimizing waste. "
             "Ensure that the recipes are simple to follow and use as many of the remaining ingredients as possible."
         ),
         personality=(
@@ -25,35 +44,115 @@ def lambda_handler(event, context):
         ),
         allow_delegation=False,
         verbose=False, # Set to False for Lambda function
-        tools=[recipe_web_tool],
         human_input=False # Set to False for Lambda function
     )
 
-    # TODO: Implement the logic to recommend recipes based on available ingredients
-    # This is a placeholder, replace with actual implementation
-    recipes = [
-        {
-            "recipe_name": "Placeholder Recipe",
-            "ingredients": [
-                {"item_name": "Placeholder Item", "quantity": "1", "unit": "pcs"}
-            ],
-            "steps": [
-                "Step 1: Do something",
-                "Step 2: Do something else"
-            ],
-            "source": "https://www.example.com"
-        }
-    ]
 
-    restock_recommendations = [
-        {
-            "item_name": "Placeholder Item",
-            "quantity_needed": 1,
-            "unit": "pcs"
+def get_recipe_recommendation_agent():
+    """Returns this container's agent, building it on first use. Per-request state belongs in Tasks, not here."""
+    global recipe_recommendation_agent
+    if recipe_recommendation_agent is None:
+        with metrics.span('AgentBuild'):
+            recipe_recommendation_agent = build_recipe_recommendation_agent()
+    return recipe_recommendation_agent
+
+
+def get_recipe_web_tool():
+    global recipe_web_tool
+    if recipe_web_tool is None:
+        from crewai_tools import WebsiteSearchTool
+
+        recipe_web_tool = WebsiteSearchTool(website='https://www.americastestkitchen.com/recipes')
+    return recipe_web_tool
+
+
+def choose_with_agent(agent, candidates, count):
+    """Asks the agent to pick and order up to `count` of the ranked candidates; None if its answer is unusable."""
+    from crewai import Task
+
+    summaries = [{
+        "recipe_name": candidate['recipe_name'],
+        "coverage": candidate['coverage'],
+        "uses_expiring": candidate['uses_expiring'],
+        "missing": [ingredient['item_name'] for ingredient in candidate['missing_ingredients']]
+    } for candidate in candidates]
+    task = Task(
+        description=(
+            f"These recipes were pre-selected for the household's pantry: {json.dumps(summaries)}. "
+            "coverage is the share of ingredients on hand and uses_expiring lists items that must be used soon. "
+            f"Choose the {count} best recipes to cook, preferring ones that use expiring items and need little shopping. "
+            "Answer with only a JSON array of the chosen recipe names, best first."
+        ),
+        expected_output="A JSON array of recipe names.",
+        agent=agent
+    )
+    result = llm_cache.kickoff('recipe_recommendation_agent', agent, task)
+    match = re.search(r"\[.*\]", result, re.DOTALL)
+    try:
+        names = json.loads(match.group(0))
+    except (AttributeError, ValueError):
+        return None
+    by_name = {candidate['recipe_name']: candidate for candidate in candidates}
+    chosen = [by_name[name] for name in dict.fromkeys(names) if isinstance(name, str) and name in by_name]
+    return chosen[:count] or None
+
+
+def search_with_agent(agent, items):
+    """Falls back to the agent's web search when no local recipe uses the pantry; [] if its answer is unusable."""
+    from crewai import Task
+
+    task = Task(
+        description=(
+            f"The household has these groceries: {json.dumps([item['item_name'] for item in items])}. "
+            "Search online for recipes that utilize the available ingredients. "
+            "Answer with only a JSON array of recipes, each with recipe_name, ingredients "
+            "(item_name, quantity, unit), steps and the source website."
+        ),
+        expected_output="A JSON array of recipes.",
+        agent=agent,
+        tools=[get_recipe_web_tool()]
+    )
+    result = llm_cache.kickoff('recipe_recommendation_agent', agent, task)
+    match = re.search(r"\[.*\]", result, re.DOTALL)
+    try:
+        recipes = json.loads(match.group(0))
+    except (AttributeError, ValueError):
+        return []
+    return [recipe for recipe in recipes if isinstance(recipe, dict) and recipe.get('recipe_name')]
+
+
+@metrics.instrumented('recipe_recommendation_agent')
+def lambda_handler(event, context):
+    # Reject malformed requests before any of the agent stack is loaded
+    if not isinstance(event.get('items'), list) or not all(
+            isinstance(item, dict) and item.get('item_name') for item in event['items']):
+        return {"error": "items must be a list of objects with an item_name"}
+    try:
+        today = date.fromisoformat(str(event['today'])[:10]) if event.get('today') else date.today()
+    except ValueError:
+        return {"error": "today must be a date in YYYY-MM-DD format"}
+
+    items = [item for item in event['items'] if in_stock(item)]
+
+    # Candidates come from the local corpus's ingredient index in milliseconds; the agent only sees the
+    # top few, and searches the web only when the corpus has nothing that uses the pantry
+    with metrics.span('Rank'):
+        expiring = items_expiring_within(items, USE_SOON_DAYS, today=today)
+        candidates = get_recipe_corpus().rank(items, expiring, RECIPE_CANDIDATES)
+
+    if not candidates:
+        recipes = search_with_agent(get_recipe_recommendation_agent(), items) if items else []
+        return {
+            "recipes": recipes[:RECIPE_COUNT],
+            "restock_recommendations": []
         }
-    ]
+
+    recipes = None
+    if RECIPE_AGENT_RERANK and len(candidates) > 1:
+        recipes = choose_with_agent(get_recipe_recommendation_agent(), candidates, RECIPE_COUNT)
+    recipes = recipes or candidates[:RECIPE_COUNT]
 
     return {
         "recipes": recipes,
-        "restock_recommendations": restock_recommendations
+        "restock_recommendations": restock_recommendations(recipes)
     }
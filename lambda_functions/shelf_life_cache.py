@@ -0,0 +1,34 @@
+import os
+import re
+from ttl_cache import DynamoDBStore, FileStore, TwoTierCache
+
+# In-process tier size, and how long an estimate stays valid in either tier
+SHELF_LIFE_CACHE_SIZE = int(os.environ.get("SHELF_LIFE_CACHE_SIZE", "1024"))
+SHELF_LIFE_CACHE_TTL_SECONDS = int(os.environ.get("SHELF_LIFE_CACHE_TTL_SECONDS", str(30 * 24 * 3600)))
+# Persistent tier: a DynamoDB table when configured, otherwise a JSON file in the container's /tmp
+SHELF_LIFE_CACHE_TABLE_NAME = os.environ.get("SHELF_LIFE_CACHE_TABLE_NAME")
+SHELF_LIFE_CACHE_PATH = os.environ.get("SHELF_LIFE_CACHE_PATH", "/tmp/shelf_life_cache.json")
+# The file is rewritten on every put, so it keeps a bounded number of estimates
+SHELF_LIFE_CACHE_FILE_SIZE = int(os.environ.get("SHELF_LIFE_CACHE_FILE_SIZE", str(SHELF_LIFE_CACHE_SIZE * 4)))
+
+
+def normalize_item_name(item_name):
+    """Lower-cases an item name and collapses punctuation and whitespace, so "Milk, 2%" and "milk 2%" match."""
+    return " ".join(re.sub(r"[^\w%]+", " ", str(item_name).lower()).split())
+
+
+def cache_key(item_name, storage):
+    """Builds the cache key for an item name and storage type (e.g. refrigerated, frozen, pantry)."""
+    return f"{normalize_item_name(item_name)}|{normalize_item_name(storage)}"
+
+
+def default_store():
+    """Picks the DynamoDB tier when a table is configured, otherwise the local file tier."""
+    if SHELF_LIFE_CACHE_TABLE_NAME:
+        return DynamoDBStore(SHELF_LIFE_CACHE_TABLE_NAME, 'shelf_life_days', decode=int)
+    return FileStore(SHELF_LIFE_CACHE_PATH, SHELF_LIFE_CACHE_FILE_SIZE)
+
+
+# Shared by all invocations served by this container: get(item_name, storage) and
+# put(item_name, storage, shelf_life_days)
+shelf_life_cache = TwoTierCache(cache_key, default_store(), SHELF_LIFE_CACHE_SIZE, SHELF_LIFE_CACHE_TTL_SECONDS)
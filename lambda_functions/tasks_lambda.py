@@ -1,3 +1,4 @@
+import metrics
 from crewai import Task
 import json
 
@@ -45,6 +46,7 @@ def define_tasks(grocery_manager, demand_forecaster, waste_reduction_specialist,
     )
     return manage_inventory_task, forecast_demand_task, reduce_waste_task, optimize_inventory_task
 
+@metrics.instrumented('tasks_lambda')
 def lambda_handler(event, context):
     """
     Handles requests to the tasks Lambda function.
@@ -0,0 +1,203 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+import metrics
+
+
+class LRUCache:
+    """Thread-safe in-process LRU whose entries expire ttl_seconds after they are stored.
+
+    clock is time.time when expiry times are shared with a persistent tier, or time.monotonic for
+    entries that only live in this container.
+    """
+
+    def __init__(self, max_size, ttl_seconds, clock=time.time):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.clock = clock
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        """Returns the value stored for key, or None when it is missing or expired."""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if entry[1] <= self.clock():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, key, value, expires_at=None):
+        with self.lock:
+            self.entries[key] = (value, self.clock() + self.ttl_seconds if expires_at is None else expires_at)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def pop(self, key):
+        """Drops key; returns whether it was cached."""
+        with self.lock:
+            return self.entries.pop(key, None) is not None
+
+    def __len__(self):
+        return len(self.entries)
+
+
+class FileStore:
+    """Persistent tier backed by a JSON file; survives for as long as the container's /tmp does.
+
+    Every put rewrites the file, so it keeps at most max_size entries, dropping the oldest first.
+    """
+
+    def __init__(self, path, max_size=4096):
+        self.path = path
+        self.max_size = max_size
+        self.entries = None
+        # Executor threads share the store; the lock keeps them from rewriting the file at once
+        self.lock = threading.Lock()
+
+    def load(self):
+        if self.entries is None:
+            try:
+                with open(self.path) as f:
+                    entries = json.load(f)
+            except (OSError, ValueError):
+                entries = {}
+            now = time.time()
+            self.entries = {key: entry for key, entry in entries.items() if entry[1] > now}
+        return self.entries
+
+    def get(self, key):
+        with self.lock:
+            entry = self.load().get(key)
+            if entry is None:
+                return None
+            if entry[1] <= time.time():
+                del self.entries[key]
+                return None
+            return entry[0]
+
+    def put(self, key, value, expires_at):
+        with self.lock:
+            entries = self.load()
+            # Entries share one TTL, so keeping them in write order keeps the soonest to expire first
+            entries.pop(key, None)
+            entries[key] = [value, expires_at]
+            while len(entries) > self.max_size:
+                del entries[next(iter(entries))]
+            # Write to a temporary file first so a crash never leaves a truncated cache behind
+            temporary_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(temporary_path, "w") as f:
+                json.dump(entries, f)
+            os.replace(temporary_path, self.path)
+
+
+class DynamoDBStore:
+    """Persistent tier shared by all containers: one item per cache_key holding value_attribute.
+    Expired records are removed by the table's TTL on expires_at."""
+
+    def __init__(self, table_name, value_attribute, decode=None):
+        self.table_name = table_name
+        self.value_attribute = value_attribute
+        # Turns the stored attribute back into the cached value (e.g. int for numbers read as Decimal)
+        self.decode = decode
+        self.table = None
+
+    def get_table(self):
+        # boto3 is only loaded once the persistent tier is actually consulted
+        if self.table is None:
+            import boto3
+
+            dynamodb = boto3.resource('dynamodb', region_name=os.environ.get("AWS_REGION"))
+            metrics.instrument_dynamodb(dynamodb.meta.client)
+            self.table = dynamodb.Table(self.table_name)
+        return self.table
+
+    def get(self, key):
+        item = self.get_table().get_item(Key={'cache_key': key}).get('Item')
+        # TTL deletion can lag, so expiry is checked on read as well
+        if item is None or item['expires_at'] <= time.time():
+            return None
+        value = item[self.value_attribute]
+        return self.decode(value) if self.decode is not None else value
+
+    def put(self, key, value, expires_at):
+        self.get_table().put_item(Item={'cache_key': key, self.value_attribute: value, 'expires_at': expires_at})
+
+
+class TwoTierCache:
+    """A warm in-process LRU in front of an optional persistent store (FileStore or DynamoDBStore), both
+    TTL-bounded. key(*args) turns what callers look values up by into the cache key."""
+
+    def __init__(self, key, store=None, max_size=1024, ttl_seconds=24 * 3600, max_persisted_bytes=None):
+        self.key = key
+        self.store = store
+        self.ttl_seconds = ttl_seconds
+        # Values larger than this stay in memory only (DynamoDB items are limited to 400 KB)
+        self.max_persisted_bytes = max_persisted_bytes
+        self.memory = LRUCache(max_size, ttl_seconds)
+        self.lock = threading.Lock()
+        self.memory_hits = 0
+        self.persistent_hits = 0
+        self.misses = 0
+
+    def get(self, *args):
+        """Returns the cached value for key(*args), or None on a miss."""
+        return self.lookup(self.key(*args))
+
+    def put(self, *args):
+        """put(*key_args, value): stores a value in both tiers."""
+        self.save(self.key(*args[:-1]), args[-1])
+
+    def lookup(self, key):
+        """get() by an already computed cache key."""
+        value = self.memory.get(key)
+        if value is not None:
+            with self.lock:
+                self.memory_hits += 1
+            return value
+
+        if self.store is not None:
+            try:
+                value = self.store.get(key)
+            except Exception:
+                # The persistent tier is an optimization; treat its failures as misses
+                value = None
+
+        with self.lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.persistent_hits += 1
+        self.memory.put(key, value)
+        return value
+
+    def save(self, key, value):
+        """put() by an already computed cache key."""
+        expires_at = int(time.time() + self.ttl_seconds)
+        self.memory.put(key, value, expires_at)
+        if self.store is None:
+            return
+        if self.max_persisted_bytes is not None and len(str(value).encode('utf-8')) > self.max_persisted_bytes:
+            return
+        try:
+            self.store.put(key, value, expires_at)
+        except Exception:
+            pass
+
+    def stats(self):
+        """Returns hit/miss counters for this container."""
+        with self.lock:
+            lookups = self.memory_hits + self.persistent_hits + self.misses
+            return {
+                'memory_hits': self.memory_hits,
+                'persistent_hits': self.persistent_hits,
+                'misses': self.misses,
+                'hit_rate': (self.memory_hits + self.persistent_hits) / lookups if lookups else 0.0,
+                'size': len(self.memory)
+            }
@@ -0,0 +1,119 @@
+import re
+from decimal import Decimal
+
+# A document path such as "nutrition.calories" or "tags[0]": attribute names separated by dots, each
+# optionally followed by list indexes
+PATH_SEGMENT = re.compile(r"^([^.\[\]]+)((?:\[\d+\])*)$")
+COMPARATORS = {'=', '<>', '<', '<=', '>', '>='}
+FUNCTIONS = {'attribute_exists', 'attribute_not_exists', 'begins_with', 'contains'}
+RETURN_VALUES = {'NONE', 'ALL_OLD', 'UPDATED_OLD', 'ALL_NEW', 'UPDATED_NEW'}
+
+
+def to_dynamodb(value):
+    """Converts floats (also inside lists and maps) to Decimal, the only number type DynamoDB accepts."""
+    if isinstance(value, float):
+        return Decimal(str(value))
+    if isinstance(value, list):
+        return [to_dynamodb(element) for element in value]
+    if isinstance(value, dict):
+        return {key: to_dynamodb(element) for key, element in value.items()}
+    return value
+
+
+class UpdateExpression:
+    """Builds an UpdateExpression, and optionally a ConditionExpression, for a single UpdateItem call.
+
+    Every attribute name goes through ExpressionAttributeNames, so reserved words ("name", "count") and
+    nested paths work, and every value through ExpressionAttributeValues. Placeholders use the #u/:u
+    prefixes so they never collide with those boto3 generates for Key()/Attr() conditions.
+    """
+
+    def __init__(self):
+        self.names = {}
+        self.placeholders = {}
+        self.values = {}
+        self.actions = {'SET': [], 'REMOVE': [], 'ADD': [], 'DELETE': []}
+        self.conditions = []
+        self.paths = set()
+
+    def name(self, path):
+        """Escapes a document path, reusing the placeholder of a name seen before."""
+        escaped = []
+        for segment in str(path).split('.'):
+            match = PATH_SEGMENT.match(segment)
+            if not match:
+                raise ValueError(f"Invalid attribute path: {path}")
+            attribute, indexes = match.groups()
+            placeholder = self.placeholders.get(attribute)
+            if placeholder is None:
+                placeholder = self.placeholders[attribute] = f"#u{len(self.names)}"
+                self.names[placeholder] = attribute
+            escaped.append(placeholder + indexes)
+        return ".".join(escaped)
+
+    def value(self, value):
+        placeholder = f":u{len(self.values)}"
+        self.values[placeholder] = to_dynamodb(value)
+        return placeholder
+
+    def target(self, path):
+        # DynamoDB rejects an update that touches the same path twice
+        if path in self.paths:
+            raise ValueError(f"Attribute path updated twice: {path}")
+        self.paths.add(path)
+        return self.name(path)
+
+    def set(self, path, value):
+        self.actions['SET'].append(f"{self.target(path)} = {self.value(value)}")
+        return self
+
+    def set_if_not_exists(self, path, value):
+        """Sets the attribute only if it has no value yet."""
+        name = self.target(path)
+        self.actions['SET'].append(f"{name} = if_not_exists({name}, {self.value(value)})")
+        return self
+
+    def append(self, path, values):
+        """Appends to a list attribute, creating it if it does not exist."""
+        name = self.target(path)
+        self.actions['SET'].append(f"{name} = list_append(if_not_exists({name}, {self.value([])}), {self.value(list(values))})")
+        return self
+
+    def add(self, path, value):
+        """Adds to a number (starting from 0 if absent), or adds elements to a set."""
+        self.actions['ADD'].append(f"{self.target(path)} {self.value(value)}")
+        return self
+
+    def remove(self, path):
+        self.actions['REMOVE'].append(self.target(path))
+        return self
+
+    def condition(self, path, operator, value=None):
+        """Requires `path <operator> value`, or attribute_exists/attribute_not_exists/begins_with/contains."""
+        name = self.name(path)
+        if operator in COMPARATORS:
+            self.conditions.append(f"{name} {operator} {self.value(value)}")
+        elif operator in ('attribute_exists', 'attribute_not_exists'):
+            self.conditions.append(f"{operator}({name})")
+        elif operator in FUNCTIONS:
+            self.conditions.append(f"{operator}({name}, {self.value(value)})")
+        else:
+            raise ValueError(f"Unsupported condition operator: {operator}")
+        return self
+
+    def __bool__(self):
+        return any(self.actions.values())
+
+    def build(self):
+        """Returns the UpdateItem arguments for the accumulated actions and conditions."""
+        request = {
+            'UpdateExpression': " ".join(
+                f"{action} {', '.join(clauses)}" for action, clauses in self.actions.items() if clauses
+            ),
+            'ExpressionAttributeNames': self.names
+        }
+        if self.values:
+            request['ExpressionAttributeValues'] = self.values
+        if self.conditions:
+            request['ConditionExpression'] = " AND ".join(self.conditions)
+        return request
@@ -31,6 +31,69 @@ resource "aws_iam_policy" "lambda_policy" {
         ],
         Resource = "arn:aws:logs:*:*:*",
         Effect   = "Allow"
+      },
+      {
+        Action = [
+          "dynamodb:GetItem",
+          "dynamodb:PutItem",
+          "dynamodb:UpdateItem",
+          "dynamodb:DeleteItem",
+          "dynamodb:Scan",
+          "dynamodb:Query",
+          "dynamodb:ConditionCheckItem"
+        ],
+        Resource = [
+          aws_dynamodb_table.grocery_items.arn,
+          "${aws_dynamodb_table.grocery_items.arn}/index/*",
+          aws_dynamodb_table.shelf_life_cache.arn,
+          aws_dynamodb_table.llm_cache.arn,
+          aws_dynamodb_table.idempotency_keys.arn,
+          aws_dynamodb_table.inventory_aggregates.arn
+        ],
+        Effect   = "Allow"
+      },
+      # Batched actions: add_grocery_items, get_grocery_items and remove_grocery_items on the inventory,
+      # and rebuild_inventory_aggregates rewriting the aggregate records
+      {
+        Action = [
+          "dynamodb:BatchGetItem",
+          "dynamodb:BatchWriteItem"
+        ],
+        Resource = [
+          aws_dynamodb_table.grocery_items.arn,
+          aws_dynamodb_table.inventory_aggregates.arn
+        ],
+        Effect   = "Allow"
+      },
+      {
+        Action = [
+          "sqs:SendMessage",
+          "sqs:ReceiveMessage",
+          "sqs:DeleteMessage",
+          "sqs:GetQueueAttributes"
+        ],
+        Resource = aws_sqs_queue.receipt_ingestion.arn,
+        Effect   = "Allow"
+      },
+      {
+        Action = [
+          "sqs:SendMessage"
+        ],
+        Resource = [
+          aws_sqs_queue.inventory_aggregates_failures.arn,
+          aws_sqs_queue.receipt_ingestion_dlq.arn
+        ],
+        Effect   = "Allow"
+      },
+      {
+        Action = [
+          "dynamodb:GetRecords",
+          "dynamodb:GetShardIterator",
+          "dynamodb:DescribeStream",
+          "dynamodb:ListStreams"
+        ],
+        Resource = "${aws_dynamodb_table.grocery_items.arn}/stream/*",
+        Effect   = "Allow"
       }
     ]
   })
@@ -1,6 +1,8 @@
 resource "aws_api_gateway_rest_api" "grocery_api" {
   name        = "GroceryAPI"
   description = "API Gateway for Grocery Management System"
+  # Lets dynamodb_lambda return gzip-compressed (base64-encoded) bodies; request bodies then arrive base64-encoded
+  binary_media_types = ["*/*"]
 }
 
 resource "aws_api_gateway_resource" "add_item_resource" {
@@ -76,6 +78,8 @@ resource "aws_api_gateway_deployment" "grocery_api_deployment" {
     aws_api_gateway_integration.update_item_integration,
     aws_api_gateway_integration.remove_item_integration,
     aws_api_gateway_integration.list_items_integration,
+    aws_api_gateway_integration.get_item_get_integration,
+    aws_api_gateway_integration.list_items_get_integration,
   ]
 }
 
@@ -85,14 +89,30 @@ resource "aws_api_gateway_stage" "dev" {
   stage_name    = "dev"
 }
 
+# Every Lambda ships the whole lambda_functions directory: the handlers import shared modules
+# (inventory_repository, metrics, llm_cache, ...) and data files such as recipes.json
+data "archive_file" "lambda_functions" {
+  type        = "zip"
+  source_dir  = "${path.module}/../lambda_functions"
+  output_path = "${path.module}/build/lambda_functions.zip"
+  excludes    = ["__pycache__"]
+}
+
 # Create Lambda functions
 resource "aws_lambda_function" "receipt_interpreter_agent" {
   function_name = "receipt-interpreter-agent"
   runtime       = "python3.9"
   role          = aws_iam_role.lambda_role.arn
   handler       = "receipt_interpreter_agent.lambda_handler"
-  filename      = "../lambda_functions/receipt_interpreter_agent.zip"
-  source_code_hash = filebase64sha256("../lambda_functions/receipt_interpreter_agent.zip")
+  filename      = data.archive_file.lambda_functions.output_path
+  source_code_hash = data.archive_file.lambda_functions.output_base64sha256
+  environment {
+    variables = {
+      LLM_CACHE_BACKEND    = "dynamodb"
+      LLM_CACHE_TABLE_NAME = aws_dynamodb_table.llm_cache.name
+      METRICS_MODE         = var.metrics_mode
+    }
+  }
   depends_on = [aws_iam_policy_attachment.lambda_policy_attachment]
 }
 
@@ -118,6 +138,23 @@ resource "aws_api_gateway_integration" "get_item_integration" {
   uri                     = aws_lambda_function.dynamodb_lambda.invoke_arn
 }
 
+# GET serves polling clients: responses carry an ETag and If-None-Match answers 304
+resource "aws_api_gateway_method" "get_item_get_method" {
+  rest_api_id   = aws_api_gateway_rest_api.grocery_api.id
+  resource_id   = aws_api_gateway_resource.get_item_resource.id
+  http_method   = "GET"
+  authorization = "NONE"
+}
+
+resource "aws_api_gateway_integration" "get_item_get_integration" {
+  rest_api_id             = aws_api_gateway_rest_api.grocery_api.id
+  resource_id             = aws_api_gateway_resource.get_item_resource.id
+  http_method             = aws_api_gateway_method.get_item_get_method.http_method
+  integration_http_method = "POST"
+  type                    = "AWS_PROXY"
+  uri                     = aws_lambda_function.dynamodb_lambda.invoke_arn
+}
+
 resource "aws_api_gateway_resource" "update_item_resource" {
   rest_api_id = aws_api_gateway_rest_api.grocery_api.id
   parent_id   = aws_api_gateway_rest_api.grocery_api.root_resource_id
@@ -184,13 +221,87 @@ resource "aws_api_gateway_integration" "list_items_integration" {
   uri                     = aws_lambda_function.dynamodb_lambda.invoke_arn
 }
 
+# GET serves polling clients: responses carry an ETag and If-None-Match answers 304
+resource "aws_api_gateway_method" "list_items_get_method" {
+  rest_api_id   = aws_api_gateway_rest_api.grocery_api.id
+  resource_id   = aws_api_gateway_resource.list_items_resource.id
+  http_method   = "GET"
+  authorization = "NONE"
+}
+
+resource "aws_api_gateway_integration" "list_items_get_integration" {
+  rest_api_id             = aws_api_gateway_rest_api.grocery_api.id
+  resource_id             = aws_api_gateway_resource.list_items_resource.id
+  http_method             = aws_api_gateway_method.list_items_get_method.http_method
+  integration_http_method = "POST"
+  type                    = "AWS_PROXY"
+  uri                     = aws_lambda_function.dynamodb_lambda.invoke_arn
+}
+
+resource "aws_dynamodb_table" "shelf_life_cache" {
+  name         = "shelf-life-cache"
+  billing_mode = "PAY_PER_REQUEST"
+  hash_key     = "cache_key"
+
+  attribute {
+    name = "cache_key"
+    type = "S"
+  }
+
+  ttl {
+    attribute_name = "expires_at"
+    enabled        = true
+  }
+}
+
+# Agent answers keyed by a hash of the prompt, shared by every agent Lambda (see llm_cache.py)
+resource "aws_dynamodb_table" "llm_cache" {
+  name         = "llm-response-cache"
+  billing_mode = "PAY_PER_REQUEST"
+  hash_key     = "cache_key"
+
+  attribute {
+    name = "cache_key"
+    type = "S"
+  }
+
+  ttl {
+    attribute_name = "expires_at"
+    enabled        = true
+  }
+}
+
+resource "aws_dynamodb_table" "idempotency_keys" {
+  name         = "grocery-idempotency-keys"
+  billing_mode = "PAY_PER_REQUEST"
+  hash_key     = "idempotency_key"
+
+  attribute {
+    name = "idempotency_key"
+    type = "S"
+  }
+
+  ttl {
+    attribute_name = "expires_at"
+    enabled        = true
+  }
+}
+
 resource "aws_lambda_function" "expiration_date_estimation_agent" {
   function_name = "expiration-date-estimation-agent"
   runtime       = "python3.9"
   role          = aws_iam_role.lambda_role.arn
   handler       = "expiration_date_estimation_agent.lambda_handler"
-  filename      = "../lambda_functions/expiration_date_estimation_agent.zip"
-  source_code_hash = filebase64sha256("../lambda_functions/expiration_date_estimation_agent.zip")
+  filename      = data.archive_file.lambda_functions.output_path
+  source_code_hash = data.archive_file.lambda_functions.output_base64sha256
+  environment {
+    variables = {
+      SHELF_LIFE_CACHE_TABLE_NAME = aws_dynamodb_table.shelf_life_cache.name
+      LLM_CACHE_BACKEND           = "dynamodb"
+      LLM_CACHE_TABLE_NAME        = aws_dynamodb_table.llm_cache.name
+      METRICS_MODE                = var.metrics_mode
+    }
+  }
   depends_on = [aws_iam_policy_attachment.lambda_policy_attachment]
 }
 
@@ -199,8 +310,15 @@ resource "aws_lambda_function" "grocery_tracker_agent" {
   runtime       = "python3.9"
   role          = aws_iam_role.lambda_role.arn
   handler       = "grocery_tracker_agent.lambda_handler"
-  filename      = "../lambda_functions/grocery_tracker_agent.zip"
-  source_code_hash = filebase64sha256("../lambda_functions/grocery_tracker_agent.zip")
+  filename      = data.archive_file.lambda_functions.output_path
+  source_code_hash = data.archive_file.lambda_functions.output_base64sha256
+  environment {
+    variables = {
+      LLM_CACHE_BACKEND    = "dynamodb"
+      LLM_CACHE_TABLE_NAME = aws_dynamodb_table.llm_cache.name
+      METRICS_MODE         = var.metrics_mode
+    }
+  }
   depends_on = [aws_iam_policy_attachment.lambda_policy_attachment]
 }
 
@@ -209,8 +327,15 @@ resource "aws_lambda_function" "recipe_recommendation_agent" {
   runtime       = "python3.9"
   role          = aws_iam_role.lambda_role.arn
   handler       = "recipe_recommendation_agent.lambda_handler"
-  filename      = "../lambda_functions/recipe_recommendation_agent.zip"
-  source_code_hash = filebase64sha256("../lambda_functions/recipe_recommendation_agent.zip")
+  filename      = data.archive_file.lambda_functions.output_path
+  source_code_hash = data.archive_file.lambda_functions.output_base64sha256
+  environment {
+    variables = {
+      LLM_CACHE_BACKEND    = "dynamodb"
+      LLM_CACHE_TABLE_NAME = aws_dynamodb_table.llm_cache.name
+      METRICS_MODE         = var.metrics_mode
+    }
+  }
   depends_on = [aws_iam_policy_attachment.lambda_policy_attachment]
 }
 
@@ -219,8 +344,17 @@ resource "aws_lambda_function" "database_tools_lambda" {
   runtime       = "python3.9"
   role          = aws_iam_role.lambda_role.arn
   handler       = "database_tools_lambda.lambda_handler"
-  filename      = "../lambda_functions/database_tools_lambda.zip"
-  source_code_hash = filebase64sha256("../lambda_functions/database_tools_lambda.zip")
+  filename      = data.archive_file.lambda_functions.output_path
+  source_code_hash = data.archive_file.lambda_functions.output_base64sha256
+  environment {
+    variables = {
+      DYNAMODB_TABLE_NAME    = aws_dynamodb_table.grocery_items.name
+      CATEGORY_INDEX_NAME    = "category-index"
+      EXPIRATION_INDEX_NAME  = "expiration-index"
+      IDEMPOTENCY_TABLE_NAME = aws_dynamodb_table.idempotency_keys.name
+      METRICS_MODE           = var.metrics_mode
+    }
+  }
   depends_on = [aws_iam_policy_attachment.lambda_policy_attachment]
 }
 
@@ -229,8 +363,8 @@ resource "aws_lambda_function" "orchestrator" {
   runtime       = "python3.9"
   role          = aws_iam_role.lambda_role.arn
   handler       = "orchestrator.lambda_handler"
-  filename      = "../lambda_functions/orchestrator.zip"
-  source_code_hash = filebase64sha256("../lambda_functions/orchestrator.zip")
+  filename      = data.archive_file.lambda_functions.output_path
+  source_code_hash = data.archive_file.lambda_functions.output_base64sha256
   environment {
     variables = {
       RECEIPT_INTERPRETER_FUNCTION_NAME = aws_lambda_function.receipt_interpreter_agent.function_name
@@ -240,6 +374,10 @@ resource "aws_lambda_function" "orchestrator" {
       DATABASE_TOOLS_LAMBDA_NAME = aws_lambda_function.database_tools_lambda.function_name
       TASKS_LAMBDA_NAME = aws_lambda_function.tasks_lambda.function_name
       DATABASE_LAMBDA_NAME = aws_lambda_function.dynamodb_lambda.function_name
+      METRICS_MODE = var.metrics_mode
+      # The crew agent stages (GROCERY_MANAGER_LAMBDA_NAME, DEMAND_FORECASTER_LAMBDA_NAME,
+      # WASTE_REDUCTION_SPECIALIST_LAMBDA_NAME, INVENTORY_OPTIMIZATION_ANALYST_LAMBDA_NAME) have no
+      # Lambda here yet; the orchestrator skips them, and the tasks stage after them, until they are set
     }
   }
   depends_on = [aws_lambda_function.receipt_interpreter_agent, aws_lambda_function.expiration_date_estimation_agent, aws_lambda_function.grocery_tracker_agent, aws_lambda_function.recipe_recommendation_agent, aws_lambda_function.database_tools_lambda, aws_lambda_function.tasks_lambda, aws_lambda_function.dynamodb_lambda, aws_iam_policy_attachment.lambda_policy_attachment]
@@ -250,22 +388,161 @@ resource "aws_lambda_function" "tasks_lambda" {
   runtime       = "python3.9"
   role          = aws_iam_role.lambda_role.arn
   handler       = "tasks_lambda.lambda_handler"
-  filename      = "../lambda_functions/tasks_lambda.zip"
-  source_code_hash = filebase64sha256("../lambda_functions/tasks_lambda.zip")
+  filename      = data.archive_file.lambda_functions.output_path
+  source_code_hash = data.archive_file.lambda_functions.output_base64sha256
+  environment {
+    variables = {
+      METRICS_MODE = var.metrics_mode
+    }
+  }
   depends_on = [aws_iam_policy_attachment.lambda_policy_attachment]
 }
 
+resource "aws_dynamodb_table" "grocery_items" {
+  name         = "grocery-items"
+  billing_mode = "PAY_PER_REQUEST"
+  hash_key     = "item_id"
+
+  # Feeds the inventory aggregates (see inventory_aggregates.py); old and new images give each change's delta
+  stream_enabled   = true
+  stream_view_type = "NEW_AND_OLD_IMAGES"
+
+  attribute {
+    name = "item_id"
+    type = "S"
+  }
+
+  attribute {
+    name = "category"
+    type = "S"
+  }
+
+  attribute {
+    name = "expiry_partition"
+    type = "S"
+  }
+
+  attribute {
+    name = "expiration_date"
+    type = "S"
+  }
+
+  # Category filters are served by Query instead of a full-table Scan
+  global_secondary_index {
+    name            = "category-index"
+    hash_key        = "category"
+    projection_type = "ALL"
+  }
+
+  # Sparse index: only items written with an expiration_date (and expiry_partition) appear here,
+  # ordered by date for "expiring before X" range lookups
+  global_secondary_index {
+    name            = "expiration-index"
+    hash_key        = "expiry_partition"
+    range_key       = "expiration_date"
+    projection_type = "ALL"
+  }
+}
+
 resource "aws_lambda_function" "dynamodb_lambda" {
   function_name = "dynamodb-lambda"
   runtime       = "python3.9"
   role          = aws_iam_role.lambda_role.arn
   handler       = "dynamodb_lambda.lambda_handler"
-  filename      = "../lambda_functions/dynamodb_lambda.zip"
-  source_code_hash = filebase64sha256("../lambda_functions/dynamodb_lambda.zip")
+  filename      = data.archive_file.lambda_functions.output_path
+  source_code_hash = data.archive_file.lambda_functions.output_base64sha256
   environment {
     variables = {
-      DYNAMODB_TABLE_NAME = "grocery-items"
+      DYNAMODB_TABLE_NAME             = aws_dynamodb_table.grocery_items.name
+      CATEGORY_INDEX_NAME             = "category-index"
+      EXPIRATION_INDEX_NAME           = "expiration-index"
+      IDEMPOTENCY_TABLE_NAME          = aws_dynamodb_table.idempotency_keys.name
+      INGESTION_QUEUE_URL             = aws_sqs_queue.receipt_ingestion.url
+      INGESTION_DEAD_LETTER_QUEUE_URL = aws_sqs_queue.receipt_ingestion_dlq.url
+      AGGREGATES_TABLE_NAME           = aws_dynamodb_table.inventory_aggregates.name
+      METRICS_MODE                    = var.metrics_mode
     }
   }
+  # Long enough to write a full ingestion batch; the queue's visibility timeout must exceed it
+  timeout    = 30
   depends_on = [aws_iam_policy_attachment.lambda_policy_attachment]
+}
+
+# Receipts queued by enqueue_receipt, written in coalesced batches by dynamodb_lambda (see receipt_ingestion.py)
+resource "aws_sqs_queue" "receipt_ingestion_dlq" {
+  name                      = "receipt-ingestion-dlq"
+  message_retention_seconds = 1209600
+}
+
+resource "aws_sqs_queue" "receipt_ingestion" {
+  name                       = "receipt-ingestion"
+  visibility_timeout_seconds = 180
+  redrive_policy = jsonencode({
+    deadLetterTargetArn = aws_sqs_queue.receipt_ingestion_dlq.arn
+    maxReceiveCount     = 5
+  })
+}
+
+# Up to 100 receipts or 5 seconds per batch, with at most 2 batches writing at once so a burst of
+# uploads waits in the queue instead of throttling the table
+resource "aws_lambda_event_source_mapping" "receipt_ingestion" {
+  event_source_arn                   = aws_sqs_queue.receipt_ingestion.arn
+  function_name                      = aws_lambda_function.dynamodb_lambda.arn
+  batch_size                         = 100
+  maximum_batching_window_in_seconds = 5
+  function_response_types            = ["ReportBatchItemFailures"]
+
+  scaling_config {
+    maximum_concurrency = 2
+  }
+}
+
+# Category and inventory totals and the low-stock set, maintained from the grocery-items stream
+# record_type "aggregate" holds the aggregates themselves; "applied" holds each item's last applied
+# stream sequence number, which makes replays idempotent and expires once the stream cannot redeliver
+resource "aws_dynamodb_table" "inventory_aggregates" {
+  name         = "inventory-aggregates"
+  billing_mode = "PAY_PER_REQUEST"
+  hash_key     = "record_type"
+  range_key    = "aggregate_key"
+
+  attribute {
+    name = "record_type"
+    type = "S"
+  }
+
+  attribute {
+    name = "aggregate_key"
+    type = "S"
+  }
+
+  ttl {
+    attribute_name = "expires_at"
+    enabled        = true
+  }
+}
+
+# Stream batches that still fail after the retries are described here (shard and sequence range), so the
+# drift is visible and can be corrected with rebuild_inventory_aggregates
+resource "aws_sqs_queue" "inventory_aggregates_failures" {
+  name                      = "inventory-aggregates-failures"
+  message_retention_seconds = 1209600
+}
+
+# Records are applied in order; a failed record is retried from there, and bisecting isolates one
+# that keeps failing so it is sent to the failure queue after the retries instead of blocking the shard
+resource "aws_lambda_event_source_mapping" "inventory_aggregates" {
+  event_source_arn               = aws_dynamodb_table.grocery_items.stream_arn
+  function_name                  = aws_lambda_function.dynamodb_lambda.arn
+  starting_position              = "LATEST"
+  batch_size                     = 100
+  function_response_types        = ["ReportBatchItemFailures"]
+  bisect_batch_on_function_error = true
+  maximum_retry_attempts         = 10
+
+  destination_config {
+    on_failure {
+      destination_arn = aws_sqs_queue.inventory_aggregates_failures.arn
+    }
+  }
 }
\ No newline at end of file
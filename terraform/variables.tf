@@ -3,3 +3,9 @@ variable "region" {
   type        = string
   default     = "us-east-1"
 }
+
+variable "metrics_mode" {
+  description = "Lambda instrumentation: \"off\", or \"emf\" to log CloudWatch Embedded Metric Format lines"
+  type        = string
+  default     = "off"
+}